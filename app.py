@@ -1,44 +1,245 @@
 # Import necessary modules
 import os
 import json
-import requests
+import hashlib
+import math
 import sys  # Updated import statement
-from flask import Flask, render_template_string, jsonify, request
-from resorts import resorts
+import time
+import threading
+import concurrent.futures
+from flask import Flask, Response, g, render_template_string, jsonify, request, stream_with_context
+from resorts import resorts, aliases
 
 # Import functions from other files
-from main import fetch_resort_data_sequentially, process_resort_data, sort_resorts
+from main import fetch_resort_data_concurrently, get_settings, parse_conditions
+from ranking import IncrementalRanking
 from save_data import save_resort_data  # Updated import statement
+from cache import TTLCache, normalize_key, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL
+from scheduler import RefreshScheduler, REFRESH_INTERVAL, REFRESH_LOCK_PATH
+from assets import ASSET_FILES, AssetManifest
+from snapshot import Body
+from stream import KEEPALIVE_FRAME, RETRY_FRAME, RankingStream
+from suggest import ResortIndex
+from store import PayloadStore, STORE_PATH, FRESHNESS_BUDGET
+from history import HistoryStore, HISTORY_PATH
+from crawlqueue import CrawlQueue, SHARD_SIZE, run_crawl
+from journal import CrawlJournal, JOURNAL_PATH
+from planner import CallCounter, RefreshPlanner, SearchCounter
+from upstream import UpstreamError, UpstreamNotFound, get_client, set_call_hook
+import metrics
+from metrics import REQUEST_LATENCY, STAGE_DURATION
+from profiling import RequestProfiler, profile_refresh
 
-# Create Flask app
-app = Flask(__name__, static_url_path='', static_folder='.')
+# Create Flask app; static assets are served from the asset manifest, never straight from the repo directory
+app = Flask(__name__, static_folder=None)
+
+# Name index used for autocomplete and to resolve searches before calling the API, built on first use
+resort_index = None
+resort_index_lock = threading.Lock()
+
+# Helper function to build the resort name index once per process
+def get_resort_index():
+    global resort_index
+    if resort_index is None:
+        with resort_index_lock:
+            if resort_index is None:
+                resort_index = ResortIndex(resorts, aliases)
+    return resort_index
+
+# Cache of upstream search responses keyed on the normalized resort name
+search_cache = TTLCache(
+    maxsize=int(os.environ.get("SEARCH_CACHE_SIZE", SEARCH_CACHE_SIZE)),
+    ttl=float(os.environ.get("SEARCH_CACHE_TTL", SEARCH_CACHE_TTL)),
+)
+
+# Per-resort search counts, saved to the payload store for the refresh planner
+search_counter = SearchCounter(lambda counts: get_payload_store().add_searches(counts))
+
+# Upstream calls made by this process, saved to the payload store so the planner can subtract them from the daily budget
+api_call_counter = CallCounter(lambda count: get_payload_store().add_api_calls(count))
+set_call_hook(api_call_counter.record)
+
+# Largest number of resorts accepted by one batch search
+BATCH_SEARCH_LIMIT = 25
+
+# Worker threads for batch searches; they share the upstream client's connection pool
+search_executor = concurrent.futures.ThreadPoolExecutor(max_workers=BATCH_SEARCH_LIMIT, thread_name_prefix="search")
+
+# Record the latency of every request by route
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    # Profile a sampled fraction of requests when PROFILE_REQUEST_RATE is set
+    g.profiler = RequestProfiler.maybe_start()
+
+@app.after_request
+def record_request_latency(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        RequestProfiler.finish(profiler, route)
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_LATENCY.observe(time.perf_counter() - started, route=route, method=request.method,
+                                status=str(response.status_code))
+    return response
+
+# Prometheus metrics route
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 # Home route
 @app.route('/')
 def home():
-    with open('index.html', 'r') as file:
-        html_content = file.read()
-    return render_template_string(html_content)
+    # Served from memory; browsers may reuse it briefly and then revalidate with the ETag
+    page = get_index_page()
+    headers = {
+        "ETag": page.etag,
+        "Cache-Control": f"public, max-age={INDEX_MAX_AGE}",
+        "Vary": "Accept-Encoding",
+    }
+    if request.if_none_match.contains_weak(page.etag.strip('"')):
+        return Response(status=304, headers=headers)
+    body, encoding = page.body_for(request.headers.get("Accept-Encoding"))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, mimetype="text/html", headers=headers)
+
+# Seconds browsers may reuse the home page without revalidating
+INDEX_MAX_AGE = int(os.environ.get("INDEX_MAX_AGE", 300))
+
+# Rendered home page with its compressed variants, built on first request
+index_page = None
+index_page_lock = threading.Lock()
+
+# Helper function to read and render index.html once per process
+def get_index_page():
+    global index_page
+    if index_page is None:
+        with index_page_lock:
+            if index_page is None:
+                with open('index.html', 'r') as file:
+                    html_content = file.read()
+                body = render_template_string(html_content, asset_url=get_asset_manifest().url).encode('utf-8')
+                index_page = Body(body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+    return index_page
+
+# Fingerprinted, precompressed static assets, built on first use
+asset_manifest = None
+asset_manifest_lock = threading.Lock()
+
+# Helper function to fingerprint and compress the page's assets once per process
+def get_asset_manifest():
+    global asset_manifest
+    if asset_manifest is None:
+        with asset_manifest_lock:
+            if asset_manifest is None:
+                asset_manifest = AssetManifest()
+    return asset_manifest
+
+# Static asset routes: fingerprinted names are cached for good, plain names are revalidated
+@app.route('/static/<filename>')
+@app.route('/<any({}):filename>'.format(', '.join(f'"{name}"' for name in ASSET_FILES)))
+def static_asset(filename):
+    asset, cache_control = get_asset_manifest().lookup(filename)
+    if asset is None:
+        return jsonify({"error": "Not found"}), 404
+    headers = {"ETag": asset.body.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains_weak(asset.body.etag.strip('"')):
+        return Response(status=304, headers=headers)
+    body, encoding = asset.body.body_for(request.headers.get("Accept-Encoding"))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, mimetype=asset.content_type, headers=headers)
 
 # Resorts API route
 @app.route('/api/resorts')
 def resorts_api():
-    # Load resort data
-    resort_data = load_resort_data()
+    # Load the current resort data snapshot
+    snapshot = load_resort_data()
     print("Loading resort data...")
 
-    # Check if resort data is None
-    if resort_data is None:
-        print("Unable to load resort data")
-        return jsonify({"error": "Unable to load resort data"}), 500
+    # Check if snapshot is None (the first background refresh is still running)
+    if snapshot is None:
+        print("Resort data not available yet")
+        return jsonify({"error": "Resort data is being refreshed, try again shortly"}), 503, {"Retry-After": "30"}
 
     # Check if resort data is empty
-    if not resort_data:
+    if not snapshot.data:
         print("No resort data available")
         return jsonify({"error": "No resort data available"}), 404
 
-    # Return the resort data as JSON
-    return jsonify(resort_data)
+    # Parse optional paging and filtering parameters
+    try:
+        limit = optional_arg('limit', int)
+        offset = optional_arg('offset', int) or 0
+        min_score = optional_arg('min_score', float)
+    except ValueError:
+        return jsonify({"error": "limit and offset must be non-negative integers and min_score a finite, non-negative number"}), 400
+    region = request.args.get('region') or None
+
+    # Return the precomputed JSON, or 304 if the client's copy is current
+    page, total = snapshot.page(limit, offset, region, min_score)
+    return snapshot_response(snapshot, page, {"X-Total-Count": str(total)})
+
+# Helper function to read an optional, non-negative query parameter
+def optional_arg(name, type):
+    return parse_optional_arg(request.args.get(name), name, type)
+
+# Helper function to parse an optional query parameter that must be a finite, non-negative number
+def parse_optional_arg(value, name, type):
+    if value is None or value == '':
+        return None
+    value = type(value)
+    # float() accepts "nan" and "inf", which would slip past the range check and each get a page cache entry
+    if not math.isfinite(value) or value < 0:
+        raise ValueError(name)
+    return value
+
+# Helper function to serve a snapshot body with validators and precompressed variants
+def snapshot_response(snapshot, page, extra_headers=None):
+    headers = {
+        "ETag": page.etag,
+        "Last-Modified": snapshot.last_modified,
+        "Cache-Control": "no-cache",  # Always revalidate, which is cheap with a 304
+        "Vary": "Accept-Encoding",
+    }
+    headers.update(extra_headers or {})
+    if snapshot.not_modified(page.etag, request.if_none_match, request.if_modified_since):
+        return Response(status=304, headers=headers)
+
+    body, encoding = page.body_for(request.headers.get("Accept-Encoding"))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, mimetype="application/json", headers=headers)
+
+# Live ranking updates as Server-Sent Events
+@app.route('/api/resorts/stream')
+def resorts_stream():
+    # Start the background refresh if this is the first request
+    load_resort_data()
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+
+    # Only the top `limit` resorts are sent when given, as the page shows just those
+    try:
+        limit = optional_arg('limit', int)
+    except ValueError:
+        return jsonify({"error": "limit must be a non-negative integer"}), 400
+
+    # The ranking first (unless the client is reconnecting), then one diff per new snapshot
+    def generate():
+        last = last_id
+        with ranking_stream.subscribed():
+            yield RETRY_FRAME
+            while True:
+                frames, last = ranking_stream.wait(last, limit=limit)
+                yield b''.join(frames) if frames else KEEPALIVE_FRAME
+
+    # Each subscriber holds a thread here; asgi.py holds thousands on one event loop
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 # Search Resort API route
 @app.route('/api/search', methods=['GET'])
@@ -47,94 +248,383 @@ def search_resort():
     resort = request.args.get('resort', default='Jackson Hole', type=str)
     print(f"Searching for resort: {resort}")
 
-    # Replace spaces with '%20' in the resort name
-    resort = resort.replace(' ', '%20')
+    # Resolve the query to a known resort so typos never reach the API
+    name = get_resort_index().resolve(resort)
+    if name is None:
+        return jsonify({"error": f"No resort found matching '{resort}'",
+                        "suggestions": get_resort_index().suggest(resort, limit=5)}), 404
+    search_counter.record(name)
 
-    # Create the URL for the API request
-    url = f"https://ski-resort-forecast.p.rapidapi.com/{resort}/snowConditions"
+    try:
+        # Serve from cache, coalescing concurrent misses into one upstream call
+        data = cached_resort_conditions(name)
 
-    # Set the querystring parameters
-    querystring = {"units": "i"}
+        # Return the API response as JSON
+        return jsonify(data)
+    except UpstreamError as e:
+        # Fall back to the last known conditions while the upstream is struggling
+        stale = stale_resort_conditions(name, e)
+        if stale is not None:
+            return jsonify(stale), 200, {"Warning": '110 - "Response is Stale"'}
+        # Return an error message as JSON with the mapped status
+        return jsonify({"error": str(e)}), e.http_status, retry_after_header(e)
 
-    # Set the headers for the API request
-    headers = {
-        "X-RapidAPI-Key": "e4644d7644mshcb7e90e40cf6593p18d651jsnaf7a44aec097",
-        "X-RapidAPI-Host": "ski-resort-forecast.p.rapidapi.com"
-    }
+# Helper function to read a batch search's names from ?resort=A&resort=B and ?resorts=A,B
+def batch_queries_from_args(resort_args, resorts_args):
+    return batch_queries(resort_args + [name for value in resorts_args for name in value.split(',')])
 
-    try:
-        # Send the API request
-        response = requests.get(url, headers=headers, params=querystring)
-        response.raise_for_status()
+# Helper function to read a batch search's names from a JSON body {"resorts": [...]}
+def batch_queries_from_body(body):
+    names = body.get('resorts') if isinstance(body, dict) else None
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return None, 'Expected a JSON body {"resorts": ["Resort", ...]}'
+    return batch_queries(names)
 
-        # Return the API response as JSON
-        return jsonify(response.json())
-    except requests.exceptions.RequestException as e:
-        # Return an error message as JSON
-        return jsonify({"error": str(e)}), 500
+# Helper function to validate a batch search's names; returns (queries, error message)
+def batch_queries(names):
+    queries = [name.strip() for name in names if name.strip()]
+    if not queries:
+        return None, "No resorts given"
+    if len(queries) > BATCH_SEARCH_LIMIT:
+        return None, f"At most {BATCH_SEARCH_LIMIT} resorts per batch"
+    return queries, None
+
+# Batch Search API route
+@app.route('/api/search/batch', methods=['GET', 'POST'])
+def search_resorts_batch():
+    if request.method == 'POST':
+        queries, error = batch_queries_from_body(request.get_json(silent=True))
+    else:
+        queries, error = batch_queries_from_args(request.args.getlist('resort'), request.args.getlist('resorts'))
+    if error is not None:
+        return jsonify({"error": error}), 400
+    print(f"Batch searching for {len(queries)} resorts")
+
+    # Resolve and dedupe, answering cached resorts without touching the pool
+    resolved = {query: get_resort_index().resolve(query) for query in queries}
+    results = {}
+    futures = {}
+    for name in dict.fromkeys(name for name in resolved.values() if name is not None):
+        search_counter.record(name)
+        # A miss is counted once, by cached_resort_conditions
+        cached = search_cache.get(normalize_key(name), count_miss=False)
+        if cached is not None:
+            results[name] = {"data": cached}
+        else:
+            futures[search_executor.submit(cached_resort_conditions, name)] = name
+
+    def result_for(query):
+        name = resolved[query]
+        if name is None:
+            return {"query": query, "error": f"No resort found matching '{query}'"}
+        return {"query": query, "resort": name, **results[name]}
+
+    def completed():
+        # Yields resort names as their lookups finish, cached ones first
+        yield from list(results)
+        for future in concurrent.futures.as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = {"data": future.result()}
+            except UpstreamError as e:
+                stale = stale_resort_conditions(name, e)
+                if stale is not None:
+                    results[name] = {"data": stale, "stale": True}
+                else:
+                    results[name] = {"error": str(e), "status": e.http_status}
+            yield name
+
+    if request.args.get('stream') == '1' or 'application/x-ndjson' in request.headers.get('Accept', ''):
+        # Stream one JSON line per query as soon as its resort is available
+        def generate():
+            for query in queries:
+                if resolved[query] is None:
+                    yield json.dumps(result_for(query)) + "\n"
+            for name in completed():
+                for query in queries:
+                    if resolved[query] == name:
+                        yield json.dumps(result_for(query)) + "\n"
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    for _ in completed():
+        pass
+    return jsonify([result_for(query) for query in queries])
+
+# Helper function to look up one resort through the search cache
+def cached_resort_conditions(name):
+    return search_cache.get_or_load(normalize_key(name), lambda: fetch_resort_conditions(name))
+
+# Resort history API route
+@app.route('/api/resorts/<name>/history')
+def resort_history(name):
+    resort = get_resort_index().resolve(name)
+    if resort is None:
+        return jsonify({"error": f"No resort found matching '{name}'"}), 404
+
+    # Window length in days and whether to include the individual samples
+    days = request.args.get('days', default=7, type=float)
+    if not 0 < days <= 366:
+        return jsonify({"error": "days must be between 0 and 366"}), 400
+    include_points = request.args.get('points', default='1') != '0'
+
+    return jsonify(get_history_store().summary(resort, days, include_points=include_points))
+
+# Resort name autocomplete API route
+@app.route('/api/suggest', methods=['GET'])
+def suggest_resorts():
+    query = request.args.get('q', default='', type=str)
+    limit = min(request.args.get('limit', default=10, type=int), 50)
+    return jsonify(get_resort_index().suggest(query, limit=limit))
+
+# Helper function to find stale conditions for a resort when the upstream call failed
+def stale_resort_conditions(name, error):
+    if isinstance(error, UpstreamNotFound):
+        return None
+    return search_cache.get_stale(normalize_key(name))
+
+# Helper function to tell clients when to retry after a throttled or shed call
+def retry_after_header(error):
+    if error.retry_after is None:
+        return {}
+    return {"Retry-After": str(int(error.retry_after) + 1)}
+
+# Helper function to fetch a single resort's snow conditions from the API
+def fetch_resort_conditions(resort):
+    return get_client().snow_conditions(resort, units="i")
 
 # Helper function to load resort data
 def load_resort_data():
-    # Check if resort data already exists to avoid redundant fetching
-    try:
-        with open('resort_data.json', 'r') as file:
-            resort_data = json.load(file)
-            print("Resort data loaded from file.")
-            return resort_data
-    except FileNotFoundError:
-        print("Resort data file not found. Fetching and processing resort data...")
-        resort_data = fetch_and_process_resort_data()
-        return resort_data
+    # Serve the last good snapshot; refreshes happen on the scheduler thread, never in the request
+    refresh_scheduler.start()
+    return refresh_scheduler.current()
+
+# Raw payload store, opened on first use
+payload_store = None
+payload_store_lock = threading.Lock()
+
+# Helper function to open the raw payload store once per process
+def get_payload_store():
+    global payload_store
+    with payload_store_lock:
+        if payload_store is None:
+            payload_store = PayloadStore(os.environ.get("PAYLOAD_DB", STORE_PATH))
+        return payload_store
+
+# Snow conditions history, opened on first use
+history_store = None
+
+# Helper function to open the history store once per process
+def get_history_store():
+    global history_store
+    with payload_store_lock:
+        if history_store is None:
+            history_store = HistoryStore(os.environ.get("HISTORY_PATH", HISTORY_PATH))
+        return history_store
 
 # Helper function to fetch and process resort data
 def fetch_and_process_resort_data():
-    # Fetch resort data concurrently
-    resort_data = fetch_resort_data_sequentially(resorts)
+    # Profile the whole refresh, scoring and saving included, even when nothing needs fetching
+    with profile_refresh() as trace:
+        # Keep what an interrupted crawl already fetched, so only the remaining resorts are stale
+        recover_crawl_journal()
 
-    # Check if resort data is None
-    if resort_data is None:
-        return None
+        # Bring the ranking up to date with the store, so crawl results can be applied to it one by one
+        sync_live_ranking(get_payload_store())
 
-    # Process the resort data
-    processed_data = process_resort_data(resort_data)
+        # Refetch only resorts whose stored payload is older than its freshness budget
+        refetch = plan_refresh()
+        print(f"{len(refetch)} of {len(resorts)} resorts need refetching.")
 
-    # Check if processed data is None
-    if processed_data is None:
-        return None
+        if refetch:
+            queue_path = os.environ.get("CRAWL_QUEUE")
+            if queue_path:
+                # Split the crawl into shards that crawlqueue.py workers in other processes can help with
+                shard_size = int(os.environ.get("CRAWL_SHARD_SIZE", SHARD_SIZE))
+                run_crawl(CrawlQueue(queue_path), refetch,
+                          lambda shard: fetch_and_store_resorts(shard, trace=trace), shard_size)
+            else:
+                # Checkpoint each result as it arrives so a restarted crawl can resume
+                journal = CrawlJournal(os.environ.get("CRAWL_JOURNAL", JOURNAL_PATH))
+                fetch_and_store_resorts(refetch, on_result=journal.append, trace=trace)
+                journal.clear()
 
-    # Sort the resorts
-    sorted_resorts = sort_resorts(processed_data)
+        return rescore_resort_data()
 
-    # Check if sorted resorts is None
-    if sorted_resorts is None:
-        return None
+# Helper function to choose the resorts this refresh fetches
+def plan_refresh():
+    budget = os.environ.get("DAILY_API_BUDGET")
+    if not budget:
+        # Every resort shares FRESHNESS_BUDGET; drop any budgets a planner set earlier
+        get_payload_store().set_budgets(dict.fromkeys(resorts))
+        return stale_resorts()
+    # Spend the daily API budget on the resorts whose conditions move and that people search for
+    search_counter.flush()
+    api_call_counter.flush()
+    planner = RefreshPlanner(float(budget), min_interval=refresh_scheduler.interval)
+    return planner.plan(resorts, get_payload_store(), get_history_store())
+
+# Helper function to list resorts whose stored payload has outlived its freshness budget
+def stale_resorts():
+    return get_payload_store().stale(resorts, float(os.environ.get("FRESHNESS_BUDGET", FRESHNESS_BUDGET)))
+
+# Helper function to fetch resorts concurrently and keep their raw payloads and history
+def fetch_and_store_resorts(resort_names, on_result=None, trace=None):
+    # Re-rank each resort as its result arrives rather than re-sorting every resort after the crawl
+    def apply_result(resort, data):
+        update_live_ranking(resort, data)
+        if on_result is not None:
+            on_result(resort, data)
+
+    with STAGE_DURATION.time(stage='fetch'):
+        fetched_data = fetch_resort_data_concurrently(resort_names, trace=trace, on_result=apply_result)
+    fetched_at = time.time()
+    store_fetched_data(fetched_data, fetched_at)
+    mark_live_ranking(fetched_data, fetched_at)
+    return fetched_data
+
+# Helper function to crawl one shard for a crawlqueue.py worker, profiled on its own
+def crawl_queued_shard(resort_names):
+    with profile_refresh("shard") as trace:
+        return fetch_and_store_resorts(resort_names, trace=trace)
+
+# Helper function to keep fetched payloads and record their conditions in the history
+def store_fetched_data(fetched_data, fetched_at=None):
+    with STAGE_DURATION.time(stage='store'):
+        get_payload_store().put_many(fetched_data, fetched_at)
+        conditions = {resort: parse_conditions(data) for resort, data in fetched_data.items()}
+        get_history_store().append({resort: c for resort, c in conditions.items() if c is not None}, fetched_at)
+
+# Helper function to store the results of a crawl that died before storing them
+def recover_crawl_journal():
+    journal = CrawlJournal(os.environ.get("CRAWL_JOURNAL", JOURNAL_PATH))
+    recovered = journal.entries()
+    if recovered:
+        print(f"Recovered {len(recovered)} resorts from an interrupted crawl.")
+        store_fetched_data(recovered, journal.last_written())
+    journal.clear()
+
+# Ranking kept current one resort at a time, built from the payload store on the first refresh
+live_ranking = None
+live_ranking_lock = threading.Lock()
+
+# Fetch time of the stored payload behind each resort's place in live_ranking
+live_ranking_versions = {}
+
+# Helper function to apply one fetched payload to the ranking; crawlqueue.py workers have none and skip it
+def update_live_ranking(resort, data):
+    with live_ranking_lock:
+        if live_ranking is None:
+            return
+        conditions = parse_conditions(data)
+        if conditions is None:
+            live_ranking.remove(resort)
+        else:
+            live_ranking.update(resort, conditions)
 
-    # Convert the sorted resorts to a list of dictionaries including the region
-    resort_data_list = [{'name': name, 'score': score, 'region': processed_data[name]['region']} for name, score in sorted_resorts]
+# Helper function to note which stored payloads the ranking already reflects
+def mark_live_ranking(fetched_data, fetched_at):
+    with live_ranking_lock:
+        if live_ranking is None:
+            return
+        for resort, data in fetched_data.items():
+            if data is not None:
+                live_ranking_versions[resort] = fetched_at
 
-    # Ensure each resort data is correctly added to the list
-    if not all(resort['name'] for resort in resort_data_list):
-        return None  # Return None if any resort data is missing or incorrect
+# Helper function to apply payloads this process did not fetch itself: the first load, shards crawled by other workers
+def sync_live_ranking(store):
+    global live_ranking
+    fetched_at = store.fetched_at()
+    with live_ranking_lock:
+        if live_ranking is None:
+            payloads = store.load_all(resorts)
+            conditions = {resort: parse_conditions(data) for resort, data in payloads.items()}
+            live_ranking = IncrementalRanking.from_conditions(
+                {resort: c for resort, c in conditions.items() if c is not None},
+                get_settings()["score_weights"], catalog=resorts)
+            live_ranking_versions.clear()
+            live_ranking_versions.update({resort: fetched_at[resort] for resort in resorts if resort in fetched_at})
+            return live_ranking
+        for resort in resorts:
+            if resort in fetched_at and live_ranking_versions.get(resort) != fetched_at[resort]:
+                conditions = parse_conditions(store.get(resort))
+                if conditions is None:
+                    live_ranking.remove(resort)
+                else:
+                    live_ranking.update(resort, conditions)
+                live_ranking_versions[resort] = fetched_at[resort]
+        return live_ranking
 
-    # Save resort data to resort_data.json
-    save_resort_data(resort_data_list)
+# Helper function to save the current ranking without any network calls
+def rescore_resort_data(store=None):
+    # Apply any stored payloads the ranking has not seen yet
+    with STAGE_DURATION.time(stage='process'):
+        ranking = sync_live_ranking(store or get_payload_store())
+
+    # Read the ranking out in order; it is kept sorted as resorts are updated
+    with STAGE_DURATION.time(stage='sort'):
+        resort_data_list = ranking.to_list()
+
+    # Save the binary snapshot the servers load, and resort_data.json as an export
+    with STAGE_DURATION.time(stage='save'):
+        save_resort_data(resort_data_list)
 
     return resort_data_list
 
+# Subscribers to /api/resorts/stream, sent a diff whenever a new snapshot is published
+ranking_stream = RankingStream()
+
+# Background scheduler that keeps the ranking fresh without blocking requests
+refresh_scheduler = RefreshScheduler(
+    fetch_and_process_resort_data,
+    interval=float(os.environ.get("REFRESH_INTERVAL", REFRESH_INTERVAL)),
+    lock_path=os.environ.get("REFRESH_LOCK_PATH", REFRESH_LOCK_PATH),
+    on_publish=ranking_stream.publish,
+)
+
+# Gauges computed when /metrics is scraped
+metrics.gauge('resort_snapshot_age_seconds', 'Seconds since the served ranking was computed.',
+              function=lambda: refresh_scheduler.age())
+metrics.gauge('resort_snapshot_version', 'Version of the served ranking snapshot.',
+              function=lambda: refresh_scheduler.version)
+metrics.gauge('resort_stream_subscribers', 'Open /api/resorts/stream connections.',
+              function=lambda: ranking_stream.subscribers)
+metrics.gauge('search_cache_entries', 'Entries in the search response cache.',
+              function=lambda: len(search_cache))
+metrics.gauge('upstream_circuit_open', 'Whether the upstream circuit breaker is refusing calls.',
+              function=lambda: int(get_client().breaker.state != 'closed'))
+metrics.gauge('upstream_concurrency_limit', 'Current adaptive limit on concurrent upstream calls.',
+              function=lambda: get_client().limiter.limit)
+
 def fetch_and_process_resort_data_cli():
     """
     CLI wrapper for fetch_and_process_resort_data to be called from the command line.
     """
     print("Starting to fetch and process resort data...")
-    result = fetch_and_process_resort_data()
+    # Waits for any worker process that is crawling right now instead of racing it
+    with refresh_scheduler.lock_file:
+        result = fetch_and_process_resort_data()
     if result is not None:
         print("Data fetched and processed successfully.")
     else:
         print("Failed to fetch and process data.")
 
+def rescore_resort_data_cli():
+    """
+    CLI wrapper for rescore_resort_data, e.g. after changing SCORE_WEIGHTS.
+    """
+    print("Rescoring resort data from stored payloads...")
+    with refresh_scheduler.lock_file:
+        result = rescore_resort_data()
+    if result is not None:
+        print("Data rescored successfully.")
+    else:
+        print("Failed to rescore data.")
+
 if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == 'fetch_data':
         fetch_and_process_resort_data_cli()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'rescore':
+        rescore_resort_data_cli()
     else:
         port = int(os.environ.get("PORT", 5000))  # Use port provided by Heroku or default to 5000
         app.run(host="0.0.0.0", port=port)
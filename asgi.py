@@ -0,0 +1,403 @@
+# Asyncio serving mode for the public routes, as a plain ASGI application.
+#
+# Serves /, /api/resorts, /api/resorts/stream, /api/resorts/<name>/history,
+# /api/search, /api/search/batch and /api/suggest (plus /metrics and the
+# page's static files) from one event loop. Searches, batches included, await
+# the upstream API through a shared aiohttp pool instead of blocking a thread
+# each, so a single process can hold thousands of them in flight, and
+# an idle ranking stream subscriber is just a suspended coroutine. The ranking
+# is still refreshed by the threaded RefreshScheduler, exactly as in app.py.
+#
+# Usage:
+#   pip install aiohttp uvicorn
+#   python asgi.py
+#   uvicorn asgi:application --host 0.0.0.0 --port 5000
+import asyncio
+import json
+import os
+import time
+from urllib.parse import parse_qsl
+
+from werkzeug.http import parse_date, parse_etags
+
+from app import (
+    INDEX_MAX_AGE,
+    app as flask_app,
+    batch_queries_from_args,
+    batch_queries_from_body,
+    get_asset_manifest,
+    get_history_store,
+    get_index_page,
+    get_resort_index,
+    load_resort_data,
+    parse_optional_arg,
+    ranking_stream,
+    retry_after_header,
+    search_cache,
+    search_counter,
+    stale_resort_conditions,
+)
+from assets import ASSET_FILES, ASSET_PREFIX
+from cache import normalize_key
+import metrics
+from metrics import REQUEST_LATENCY
+from stream import KEEPALIVE_FRAME, RETRY_FRAME
+from upstream import UpstreamError, close_async_client, get_async_client
+
+class Request:
+    # The parts of an ASGI HTTP scope the handlers need
+
+    def __init__(self, scope):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = {}
+        self.arg_lists = {}  # Every value of repeated parameters
+        for key, value in parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True):
+            self.args.setdefault(key, value)
+            self.arg_lists.setdefault(key, []).append(value)
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        self.body = b''
+
+    def getlist(self, name):
+        return self.arg_lists.get(name, [])
+
+    def json(self):
+        # The parsed JSON body, or None if it is missing or malformed
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+def json_response(data, status=200, headers=None):
+    return status, json.dumps(data).encode('utf-8'), {"Content-Type": "application/json", **(headers or {})}
+
+
+def body_response(request, page, content_type, headers):
+    # Serves a precomputed Body, honouring If-None-Match and Accept-Encoding
+    headers = {"ETag": page.etag, "Vary": "Accept-Encoding", **headers}
+    if parse_etags(request.headers.get('if-none-match')).contains_weak(page.etag.strip('"')):
+        return 304, b'', headers
+    body, encoding = page.body_for(request.headers.get('accept-encoding'))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return 200, body, {"Content-Type": content_type, **headers}
+
+
+async def home(request):
+    with flask_app.app_context():  # Rendering needs it, but only happens once
+        page = get_index_page()
+    return body_response(request, page, "text/html; charset=utf-8", {"Cache-Control": f"public, max-age={INDEX_MAX_AGE}"})
+
+
+async def resorts_api(request):
+    snapshot = load_resort_data()
+    if snapshot is None:
+        return json_response({"error": "Resort data is being refreshed, try again shortly"}, 503, {"Retry-After": "30"})
+    if not snapshot.data:
+        return json_response({"error": "No resort data available"}, 404)
+
+    # Parse optional paging and filtering parameters
+    try:
+        limit = optional_arg(request, 'limit', int)
+        offset = optional_arg(request, 'offset', int) or 0
+        min_score = optional_arg(request, 'min_score', float)
+    except ValueError:
+        return json_response({"error": "limit and offset must be non-negative integers and min_score a finite, non-negative number"}, 400)
+    region = request.args.get('region') or None
+
+    page, total = snapshot.page(limit, offset, region, min_score)
+    headers = {
+        "ETag": page.etag,
+        "Last-Modified": snapshot.last_modified,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+        "X-Total-Count": str(total),
+    }
+    if_none_match = parse_etags(request.headers.get('if-none-match'))
+    if snapshot.not_modified(page.etag, if_none_match, parse_date(request.headers.get('if-modified-since'))):
+        return 304, b'', headers
+    body, encoding = page.body_for(request.headers.get('accept-encoding'))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return 200, body, {"Content-Type": "application/json", **headers}
+
+
+async def resorts_stream(request):
+    load_resort_data()  # Starts the background refresh if this is the first request
+    try:
+        limit = optional_arg(request, 'limit', int)
+    except ValueError:
+        return json_response({"error": "limit must be a non-negative integer"}, 400)
+    headers = {"Content-Type": "text/event-stream", "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return 200, ranking_events(request.headers.get('last-event-id') or request.args.get('since'), limit), headers
+
+
+async def ranking_events(last_id, limit):
+    # The ranking's top `limit` first (unless the client is reconnecting), then one diff per new snapshot
+    with ranking_stream.subscribed():
+        yield RETRY_FRAME
+        while True:
+            frames, last_id = await ranking_stream.wait_async(last_id, limit=limit)
+            yield b''.join(frames) if frames else KEEPALIVE_FRAME
+
+
+def optional_arg(request, name, type):
+    # Reads an optional, finite, non-negative query parameter
+    return parse_optional_arg(request.args.get(name), name, type)
+
+
+async def search_resort(request):
+    resort = request.args.get('resort') or 'Jackson Hole'
+    print(f"Searching for resort: {resort}")
+
+    # Resolve the query to a known resort so typos never reach the API
+    name = get_resort_index().resolve(resort)
+    if name is None:
+        return json_response({"error": f"No resort found matching '{resort}'",
+                              "suggestions": get_resort_index().suggest(resort, limit=5)}, 404)
+    search_counter.record(name)
+
+    try:
+        # Shares the search cache with app.py; concurrent misses await one upstream call
+        data = await search_cache.get_or_load_async(
+            normalize_key(name), lambda: get_async_client().snow_conditions(name, units="i"))
+        return json_response(data)
+    except UpstreamError as e:
+        stale = stale_resort_conditions(name, e)
+        if stale is not None:
+            return json_response(stale, 200, {"Warning": '110 - "Response is Stale"'})
+        return json_response({"error": str(e)}, e.http_status, retry_after_header(e))
+
+
+async def search_resorts_batch(request):
+    if request.method == 'POST':
+        queries, error = batch_queries_from_body(request.json())
+    else:
+        queries, error = batch_queries_from_args(request.getlist('resort'), request.getlist('resorts'))
+    if error is not None:
+        return json_response({"error": error}, 400)
+    print(f"Batch searching for {len(queries)} resorts")
+
+    # Resolve and dedupe, answering cached resorts without awaiting anything
+    resolved = {query: get_resort_index().resolve(query) for query in queries}
+    results = {}
+    pending = {}
+    for name in dict.fromkeys(name for name in resolved.values() if name is not None):
+        search_counter.record(name)
+        # A miss is counted once, by get_or_load_async
+        cached = search_cache.get(normalize_key(name), count_miss=False)
+        if cached is not None:
+            results[name] = {"data": cached}
+        else:
+            pending[name] = asyncio.ensure_future(batch_lookup(name))
+
+    def result_for(query):
+        name = resolved[query]
+        if name is None:
+            return {"query": query, "error": f"No resort found matching '{query}'"}
+        return {"query": query, "resort": name, **results[name]}
+
+    if request.args.get('stream') == '1' or 'application/x-ndjson' in request.headers.get('accept', ''):
+        # Stream one JSON line per query as soon as its resort is available
+        def ndjson(matching):
+            return b''.join(json.dumps(result_for(query)).encode('utf-8') + b'\n' for query in queries if matching(query))
+
+        async def generate():
+            try:
+                # Unknown and cached resorts first, then each lookup as it finishes
+                ready = ndjson(lambda query: resolved[query] is None or resolved[query] in results)
+                if ready:
+                    yield ready
+                for task in asyncio.as_completed(list(pending.values())):
+                    name, result = await task
+                    results[name] = result
+                    yield ndjson(lambda query: resolved[query] == name)
+            finally:
+                for task in pending.values():
+                    task.cancel()
+        return 200, generate(), {"Content-Type": "application/x-ndjson"}
+
+    for name, result in await asyncio.gather(*pending.values()):
+        results[name] = result
+    return json_response([result_for(query) for query in queries])
+
+
+async def batch_lookup(name):
+    # One batch entry: (name, {"data": ...} or {"error": ..., "status": ...})
+    try:
+        data = await search_cache.get_or_load_async(
+            normalize_key(name), lambda: get_async_client().snow_conditions(name, units="i"))
+        return name, {"data": data}
+    except UpstreamError as e:
+        stale = stale_resort_conditions(name, e)
+        if stale is not None:
+            return name, {"data": stale, "stale": True}
+        return name, {"error": str(e), "status": e.http_status}
+
+
+async def resort_history(request, name):
+    resort = get_resort_index().resolve(name)
+    if resort is None:
+        return json_response({"error": f"No resort found matching '{name}'"}, 404)
+
+    # Window length in days and whether to include the individual samples
+    try:
+        days = float(request.args.get('days', 7))
+    except ValueError:
+        days = 7.0
+    if not 0 < days <= 366:
+        return json_response({"error": "days must be between 0 and 366"}, 400)
+    include_points = request.args.get('points', '1') != '0'
+
+    # Reading the history file is blocking I/O, so it runs off the event loop
+    summary = await asyncio.to_thread(get_history_store().summary, resort, days, include_points=include_points)
+    return json_response(summary)
+
+
+async def suggest_resorts(request):
+    try:
+        limit = min(int(request.args.get('limit', 10)), 50)
+    except ValueError:
+        limit = 10
+    return json_response(get_resort_index().suggest(request.args.get('q', ''), limit=limit))
+
+
+async def metrics_endpoint(request):
+    return 200, metrics.registry.render().encode('utf-8'), {"Content-Type": "text/plain; version=0.0.4"}
+
+
+async def static_file(request):
+    prefix = ASSET_PREFIX if request.path.startswith(ASSET_PREFIX) else '/'
+    asset, cache_control = get_asset_manifest().lookup(request.path[len(prefix):])
+    if asset is None:
+        return json_response({"error": "Not found"}, 404)
+    return body_response(request, asset.body, asset.content_type, {"Cache-Control": cache_control})
+
+
+ROUTES = {
+    '/': home,
+    '/api/resorts': resorts_api,
+    '/api/resorts/stream': resorts_stream,
+    '/api/search': search_resort,
+    '/api/search/batch': search_resorts_batch,
+    '/api/suggest': suggest_resorts,
+    '/metrics': metrics_endpoint,
+}
+ROUTES.update({'/' + name: static_file for name in ASSET_FILES})
+# Routes that also accept a POST body
+POST_ROUTES = {'/api/search/batch'}
+# /api/resorts/<name>/history
+HISTORY_PREFIX, HISTORY_SUFFIX = '/api/resorts/', '/history'
+
+
+def route_for(path):
+    # Returns (handler, route label, path arguments), or (None, 'unmatched', ()) when nothing matches
+    handler = ROUTES.get(path)
+    if handler is not None:
+        return handler, path if handler is not static_file else 'static', ()
+    if path.startswith(ASSET_PREFIX):
+        return static_file, 'static', ()
+    if path.startswith(HISTORY_PREFIX) and path.endswith(HISTORY_SUFFIX):
+        name = path[len(HISTORY_PREFIX):-len(HISTORY_SUFFIX)]
+        if name and '/' not in name:
+            return resort_history, HISTORY_PREFIX + '<name>' + HISTORY_SUFFIX, (name,)
+    return None, 'unmatched', ()
+
+
+async def startup():
+    # Build everything the first request would otherwise wait for
+    with flask_app.app_context():
+        get_index_page()  # Builds the asset manifest too
+    get_resort_index()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await startup()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    started = time.perf_counter()
+    request = Request(scope)
+    handler, route, path_args = route_for(request.path)
+    methods = ('GET', 'HEAD', 'POST') if request.path in POST_ROUTES else ('GET', 'HEAD')
+    if handler is None:
+        status, body, headers = json_response({"error": "Not found"}, 404)
+    elif request.method not in methods:
+        status, body, headers = json_response({"error": "Method not allowed"}, 405, {"Allow": ", ".join(methods)})
+    else:
+        if request.method == 'POST':
+            request.body = await read_body(receive)
+        status, body, headers = await handler(request, *path_args)
+
+    streamed = not isinstance(body, bytes)
+    if streamed and request.method == 'HEAD':
+        await body.aclose()
+        body = b''
+        streamed = False
+    if not streamed:
+        headers["Content-Length"] = str(len(body))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()],
+    })
+    if not streamed:
+        await send({'type': 'http.response.body', 'body': body if request.method != 'HEAD' else b''})
+    # Streams are timed to their headers; they stay open for as long as the client listens
+    REQUEST_LATENCY.observe(time.perf_counter() - started, route=route, method=request.method, status=str(status))
+    if streamed:
+        await stream_body(body, receive, send)
+
+
+async def stream_body(chunks, receive, send):
+    # Sends chunks as they are produced until the generator ends or the client goes away
+    async def pump():
+        async for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(disconnected())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await chunks.aclose()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(os.environ.get("PORT", 5000))  # Use port provided by Heroku or default to 5000
+    uvicorn.run(application, host="0.0.0.0", port=port)
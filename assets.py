@@ -0,0 +1,77 @@
+import hashlib
+import mimetypes
+import os
+import re
+
+from snapshot import Body
+
+# The page's own static files; nothing else on disk is ever served
+ASSET_FILES = ('background-image.jpg', 'styles.css', 'main.js')  # Referenced files before the ones referencing them
+# URL prefix of fingerprinted assets
+ASSET_PREFIX = '/static/'
+# Content types worth precompressing; images are compressed already
+COMPRESSIBLE_TYPES = ('text/css', 'text/javascript', 'application/javascript', 'image/svg+xml')
+# Fingerprinted names never change content, so browsers may keep them for a year without asking
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Plain names are still answered for pages rendered before a deploy, but always revalidated
+PLAIN_CACHE_CONTROL = "no-cache"
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")\s]+)\1\s*\)""")
+
+
+class Asset:
+    # One static file, with its fingerprinted name and precompressed variants
+
+    def __init__(self, name, content):
+        self.name = name
+        self.content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        digest = hashlib.sha256(content).hexdigest()
+        root, extension = os.path.splitext(name)
+        self.fingerprinted_name = f"{root}.{digest[:10]}{extension}"
+        self.url = ASSET_PREFIX + self.fingerprinted_name
+        self.body = Body(content, '"' + digest[:32] + '"', compress=self.content_type in COMPRESSIBLE_TYPES)
+
+
+class AssetManifest:
+    """
+    The page's static assets, fingerprinted and precompressed once at startup.
+
+    Each file is served under a name that includes a hash of its content
+    (`/static/main.<hash>.js`) with an immutable Cache-Control, so returning
+    visitors never ask for it again until it changes. Text assets get gzip
+    and brotli variants, or gzip alone if `brotli` is not installed.
+    Stylesheets have their url(...) references rewritten to the other
+    assets' fingerprinted names before they are hashed themselves.
+    """
+
+    def __init__(self, directory='.', files=ASSET_FILES):
+        self.assets = {}
+        self.fingerprinted = {}
+        for name in files:
+            with open(os.path.join(directory, name), 'rb') as file:
+                content = file.read()
+            if name.endswith('.css'):
+                content = self._rewrite_css(content.decode('utf-8')).encode('utf-8')
+            asset = Asset(name, content)
+            self.assets[name] = asset
+            self.fingerprinted[asset.fingerprinted_name] = asset
+
+    def _rewrite_css(self, css):
+        def replace(match):
+            asset = self.assets.get(match.group(2))
+            return f'url("{asset.url}")' if asset is not None else match.group(0)
+        return CSS_URL.sub(replace, css)
+
+    def url(self, name):
+        # Fingerprinted URL of an asset, for templates
+        return self.assets[name].url
+
+    def lookup(self, filename):
+        # Returns (Asset, Cache-Control) for a fingerprinted or plain file name, or (None, None)
+        asset = self.fingerprinted.get(filename)
+        if asset is not None:
+            return asset, IMMUTABLE_CACHE_CONTROL
+        asset = self.assets.get(filename)
+        if asset is not None:
+            return asset, PLAIN_CACHE_CONTROL
+        return None, None
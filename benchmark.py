@@ -0,0 +1,365 @@
+# Benchmarks the fetch pipeline against the local upstream simulator.
+#
+# Starts simulator.py in-process, points every upstream call at it and
+# reports end-to-end refresh time, throughput and per-request tail latency.
+#
+# Usage:
+#   python benchmark.py --latency 0.1 --jitter 0.05 --error-rate 0.01 --quota 50
+#   python benchmark.py --output baseline.json
+#   python benchmark.py --compare baseline.json --tolerance 0.2
+#   python benchmark.py --startup
+#   python benchmark.py --load --latency 0.2 --load-concurrency 1000
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import concurrent.futures
+
+from simulator import load_recordings, start_simulator
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, elapsed, latencies, count):
+    return {
+        "name": name,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_per_s": round(count / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "count": count,
+    }
+
+
+class LatencyRecorder:
+    # Wraps a callable and records how long each call takes
+
+    def __init__(self, func):
+        self.func = func
+        self.samples = []
+        self.lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.samples.append(elapsed)
+
+
+def bench_refresh(resort_names, workers, rps):
+    import main
+    from upstream import get_client
+    session = get_client().session
+    recorder = LatencyRecorder(session.get)
+    session.get = recorder
+    try:
+        start = time.perf_counter()
+        resort_data = main.fetch_resort_data_concurrently(resort_names, max_workers=workers, requests_per_second=rps)
+        processed = main.process_resort_data(resort_data)
+        main.sort_resorts(processed)
+        elapsed = time.perf_counter() - start
+    finally:
+        session.get = recorder.func
+    result = summarize("refresh", elapsed, recorder.samples, len(resort_names))
+    result["failed"] = sum(1 for data in resort_data.values() if data is None)
+    return result
+
+
+def bench_app_search(resort_names, requests_count, concurrency):
+    from app import app
+    client = app.test_client()
+    names = [resort_names[i % len(resort_names)] for i in range(requests_count)]
+
+    def search(name):
+        start = time.perf_counter()
+        client.get("/api/search", query_string={"resort": name})
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(search, names))
+    return summarize("app.search_resort", time.perf_counter() - start, latencies, requests_count)
+
+
+def bench_search_module(resort_names, requests_count, concurrency):
+    import search
+    names = [resort_names[i % len(resort_names)] for i in range(requests_count)]
+    recorder = LatencyRecorder(search.search_resort)
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(recorder, names))
+    return summarize("search.search_resort", time.perf_counter() - start, recorder.samples, requests_count)
+
+
+# Run in a fresh interpreter: time `import app`, then the first and later requests for /
+STARTUP_SCRIPT = """
+import contextlib, io, json, time
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    from app import app
+    imported = time.perf_counter()
+    client = app.test_client()
+    client.get("/")
+    first = time.perf_counter()
+print(json.dumps({"import": imported - start, "first": first - imported}))
+"""
+
+
+def bench_startup(runs):
+    # Cold starts in separate processes, so nothing is already imported or cached
+    imports, firsts, totals = [], [], []
+    start = time.perf_counter()
+    for _ in range(runs):
+        launched = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        totals.append(time.perf_counter() - launched)
+        timings = json.loads(output.strip().splitlines()[-1])
+        imports.append(timings["import"])
+        firsts.append(timings["first"])
+    results = [
+        summarize("startup.process", time.perf_counter() - start, totals, runs),
+        summarize("startup.import_app", sum(imports), imports, runs),
+        summarize("startup.first_home", sum(firsts), firsts, runs),
+    ]
+    return results
+
+
+def bench_home(requests_count):
+    # Warm per-request cost of the home page
+    from app import app
+    client = app.test_client()
+    client.get("/")
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(requests_count):
+        started = time.perf_counter()
+        client.get("/")
+        latencies.append(time.perf_counter() - started)
+    return summarize("app.home", time.perf_counter() - start, latencies, requests_count)
+
+
+# Serving modes compared by --load: (name, script started with PORT set)
+SERVERS = (("threaded", "app.py"), ("asgi", "asgi.py"))
+
+
+@contextlib.contextmanager
+def run_process(args, port, env=None):
+    # Runs a script in its own process until the block exits; yields its URL once it answers HTTP
+    directory = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.Popen([sys.executable] + args, cwd=directory, env=dict(os.environ, **(env or {})),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                urllib.request.urlopen(url + "/", timeout=1).read()
+                break
+            except urllib.error.HTTPError:
+                break  # Any HTTP answer means it is listening
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"{args[0]} did not start")
+                time.sleep(0.1)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def http_get(connection, host, path):
+    # One GET over a raw keep-alive connection; returns (status, keep_alive)
+    reader, writer = connection
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('latin-1'))
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed")
+    version, status = status_line.split()[:2]
+    length = 0
+    keep_alive = version == b"HTTP/1.1"
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "connection":
+            keep_alive = value.strip().lower() == "keep-alive" or (keep_alive and value.strip().lower() != "close")
+    await reader.readexactly(length)
+    return int(status), keep_alive
+
+
+async def load_test(url, resort_names, requests_count, concurrency):
+    """
+    Closed-loop load: `concurrency` clients each send searches back to back.
+
+    A bare asyncio HTTP/1.1 client keeps the generator itself cheap, so the
+    server under test stays the bottleneck at high concurrency.
+    """
+    parts = urllib.parse.urlsplit(url)
+    names = iter([resort_names[i % len(resort_names)] for i in range(requests_count)])
+    latencies = []
+    statuses = {}
+
+    async def worker():
+        connection = None
+        for name in names:
+            path = "/api/search?" + urllib.parse.urlencode({"resort": name})
+            start = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = await asyncio.open_connection(parts.hostname, parts.port)
+                status, keep_alive = await http_get(connection, parts.netloc, path)
+            except (OSError, ValueError, asyncio.IncompleteReadError):
+                status, keep_alive = "error", False
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            if not keep_alive and connection is not None:
+                connection[1].close()
+                connection = None
+        if connection is not None:
+            connection[1].close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, statuses
+
+
+def bench_serving_modes(simulator_args, resort_names, requests_count, concurrency, base_port=8790):
+    # The simulator and each server get their own process so none of them shares a GIL with the load
+    results = []
+    with run_process(["simulator.py", "serve", "--port", str(base_port)] + simulator_args, base_port) as upstream_url:
+        for offset, (name, script) in enumerate(SERVERS, start=1):
+            port = base_port + offset
+            env = {"PORT": str(port), "UPSTREAM_URL": upstream_url,
+                   "SEARCH_CACHE_TTL": "0"}  # Every search reaches the upstream; only concurrent ones are coalesced
+            with run_process([script], port, env) as url:
+                elapsed, latencies, statuses = asyncio.run(load_test(url, resort_names, requests_count, concurrency))
+            result = summarize(f"load.{name}", elapsed, latencies, requests_count)
+            result["failed"] = requests_count - statuses.get(200, 0)
+            results.append(result)
+    return results
+
+
+def compare(results, baseline_path, tolerance):
+    # Flags any benchmark whose elapsed time or p95 regressed beyond the tolerance
+    with open(baseline_path, 'r') as file:
+        baseline = {entry["name"]: entry for entry in json.load(file)}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result["name"])
+        if not previous:
+            continue
+        for key in ("elapsed_s", "p95_ms"):
+            if previous[key] and result[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{result['name']} {key}: {previous[key]} -> {result[key]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fetch pipeline against the local simulator")
+    parser.add_argument("--resorts", type=int, help="Number of resorts to crawl (default: full catalog)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rps", type=float, default=50, help="Crawler rate limit in requests per second")
+    parser.add_argument("--searches", type=int, default=200, help="Number of /api/search calls")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent search clients")
+    parser.add_argument("--recordings", help="Replay payloads recorded by simulator.py record")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--quota", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Fail if results regress against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--startup", action="store_true", help="Only benchmark cold start and the home page")
+    parser.add_argument("--startup-runs", type=int, default=5, help="Fresh processes to start with --startup")
+    parser.add_argument("--load", action="store_true",
+                        help="Only load-test /api/search on the threaded and asgi serving modes")
+    parser.add_argument("--load-requests", type=int, default=5000)
+    parser.add_argument("--load-concurrency", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.startup:
+        results = bench_startup(args.startup_runs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.append(bench_home(args.searches))
+        report(results, args)
+        return
+
+    if args.load:
+        simulator_args = ["--latency", str(args.latency), "--jitter", str(args.jitter),
+                          "--error-rate", str(args.error_rate), "--throttle-rate", str(args.throttle_rate),
+                          "--seed", str(args.seed)]
+        if args.recordings:
+            simulator_args += ["--recordings", args.recordings]
+        if args.quota:
+            simulator_args += ["--quota", str(args.quota)]
+        from resorts import resorts
+        resort_names = list(dict.fromkeys(resorts))[:args.resorts] if args.resorts else list(dict.fromkeys(resorts))
+        report(bench_serving_modes(simulator_args, resort_names, args.load_requests, args.load_concurrency), args)
+        return
+
+    server = start_simulator(recordings=load_recordings(args.recordings), latency=args.latency,
+                             jitter=args.jitter, error_rate=args.error_rate,
+                             throttle_rate=args.throttle_rate, quota=args.quota, seed=args.seed)
+    # Must be set before the pipeline modules are imported
+    os.environ["UPSTREAM_URL"] = server.url
+
+    from resorts import resorts
+    resort_names = list(dict.fromkeys(resorts))[:args.resorts] if args.resorts else list(dict.fromkeys(resorts))
+
+    results = []
+    # The pipeline prints per resort; keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        results.append(bench_refresh(resort_names, args.workers, args.rps))
+        results.append(bench_app_search(resort_names, args.searches, args.concurrency))
+        results.append(bench_search_module(resort_names, args.searches, args.concurrency))
+    server.shutdown()
+    report(results, args)
+
+
+def report(results, args):
+    print(f"{'benchmark':<22}{'elapsed s':>11}{'per s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'failed':>8}")
+    for result in results:
+        print(f"{result['name']:<22}{result['elapsed_s']:>11}{result['throughput_per_s']:>10}"
+              f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}{result.get('failed', ''):>8}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
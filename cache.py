@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import CACHE_REQUESTS
+
+# Defaults for the /api/search response cache
+SEARCH_CACHE_TTL = 300
+SEARCH_CACHE_SIZE = 1024
+
+
+def normalize_key(name):
+    # Case- and whitespace-insensitive cache key for a resort name
+    return " ".join(name.split()).casefold()
+
+
+class _Flight:
+    # A single in-progress load that concurrent callers wait on
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after `ttl` seconds.
+
+    `get_or_load` coalesces concurrent misses for the same key so only one
+    caller runs the loader; the others wait for and share its result.
+
+    Expired entries are kept until LRU eviction so `get_stale` can still
+    serve them while the upstream is unavailable.
+    """
+
+    def __init__(self, maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL, name='search'):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value), oldest first
+        self.flights = {}
+        self.async_flights = {}  # key -> asyncio.Task, for get_or_load_async
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, count_miss=True):
+        # Returns the cached value, or None if it is missing or expired; pass count_miss=False
+        # when a miss goes on to get_or_load, which counts it itself
+        with self.lock:
+            value = self._get(key, time.monotonic())
+        if value is not None:
+            CACHE_REQUESTS.inc(cache=self.name, result='hit')
+        elif count_miss:
+            CACHE_REQUESTS.inc(cache=self.name, result='miss')
+        return value
+
+    def _get(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= now:
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def get_stale(self, key):
+        # Returns the cached value even if it has expired, or None if it was never cached
+        with self.lock:
+            entry = self.entries.get(key)
+        CACHE_REQUESTS.inc(cache=self.name, result='stale' if entry is not None else 'stale_miss')
+        return entry[1] if entry is not None else None
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self._set(key, value, ttl)
+
+    def _set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def get_or_load(self, key, loader, should_cache=lambda value: value is not None):
+        """
+        Returns the cached value for `key`, calling `loader()` on a miss.
+
+        Exceptions raised by the loader propagate to every waiting caller.
+        Results rejected by `should_cache` are returned but not stored.
+        """
+        with self.lock:
+            value = self._get(key, time.monotonic())
+            if value is not None:
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache=self.name, result='hit')
+                return value
+            self.misses += 1
+            CACHE_REQUESTS.inc(cache=self.name, result='miss')
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                if flight.error is None and should_cache(flight.value):
+                    self._set(key, flight.value)
+                del self.flights[key]
+            flight.done.set()
+        return flight.value
+
+    async def get_or_load_async(self, key, loader, should_cache=lambda value: value is not None):
+        """
+        Coroutine version of `get_or_load`; `loader` is a coroutine function.
+
+        Concurrent misses await one shared task instead of blocking threads.
+        The task is shielded, so a caller that disconnects does not cancel
+        the load for everyone else. Use from a single event loop.
+        """
+        with self.lock:
+            value = self._get(key, time.monotonic())
+            if value is not None:
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache=self.name, result='hit')
+                return value
+            self.misses += 1
+            CACHE_REQUESTS.inc(cache=self.name, result='miss')
+            task = self.async_flights.get(key)
+            if task is None:
+                task = self.async_flights[key] = asyncio.ensure_future(self._load_async(key, loader, should_cache))
+        return await asyncio.shield(task)
+
+    async def _load_async(self, key, loader, should_cache):
+        try:
+            value = await loader()
+            if should_cache(value):
+                self.set(key, value)
+            return value
+        finally:
+            with self.lock:
+                del self.async_flights[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
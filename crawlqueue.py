@@ -0,0 +1,277 @@
+# Sharded crawl: a SQLite work queue that any number of worker processes share.
+#
+# A crawl is split into shards of resorts. Workers claim shards under a
+# lease, fetch them and write the payloads to the PayloadStore, which is
+# where the shards are merged back into one ranking. A worker that dies
+# simply lets its lease run out and another worker picks the shard up.
+#
+# Usage:
+#   python crawlqueue.py plan --shard-size 50      # queue a crawl of the resorts due for a refresh
+#   python crawlqueue.py work [--follow]            # run on as many processes as you like
+#   python crawlqueue.py merge                      # wait for the crawl, then rescore and save
+#   python crawlqueue.py status
+#
+# With CRAWL_QUEUE set, app.py's background refresh queues each crawl here
+# itself, works on it and merges it, and `work --follow` processes help out.
+# The queue and the payload store are SQLite files in WAL mode, so every worker
+# must run on the same host: WAL and file locks are not safe on network filesystems.
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Default location of the crawl work queue
+QUEUE_PATH = 'crawl_queue.db'
+# Resorts per shard
+SHARD_SIZE = 50
+# Seconds a worker may hold a shard before another worker may take it over
+LEASE_SECONDS = 300
+# Claims per shard before it is given up on, so a poisoned shard cannot stall a crawl
+MAX_ATTEMPTS = 3
+# Seconds between looks at the queue while waiting on other workers
+POLL_INTERVAL = 1.0
+
+
+class CrawlQueue:
+    """
+    SQLite work queue of crawl shards with leases.
+
+    Claims run in an IMMEDIATE transaction, so two workers never hold the
+    same live shard. A lease that runs out makes the shard claimable again;
+    after MAX_ATTEMPTS claims it is abandoned and no longer holds the crawl
+    open. Queuing a crawl supersedes any earlier one still unfinished, e.g.
+    because its coordinator died: its free shards are never claimed again,
+    since the new crawl plans every resort that is still stale. Shards only
+    record progress; the fetched payloads live in the PayloadStore.
+    """
+
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        self.local = threading.local()
+        with self.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS crawls (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS shards (
+                    crawl_id INTEGER NOT NULL,
+                    shard INTEGER NOT NULL,
+                    resorts TEXT NOT NULL,
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    done_at REAL,
+                    PRIMARY KEY (crawl_id, shard)
+                )
+            """)
+
+    def connection(self):
+        # One connection per thread, in autocommit mode so transactions are explicit
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        # Takes the write lock up front so a read-then-update cannot race another process
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def create(self, resorts, shard_size=SHARD_SIZE, now=None):
+        # Queues a crawl of `resorts` split into shards, superseding unfinished crawls; returns the crawl id
+        now = now if now is not None else time.time()
+        resorts = list(dict.fromkeys(resorts))
+        with self.transaction() as conn:
+            superseded = conn.execute("UPDATE crawls SET finished_at = ? WHERE finished_at IS NULL", (now,)).rowcount
+            if superseded:
+                print(f"Superseded {superseded} unfinished crawls.")
+            crawl_id = conn.execute("INSERT INTO crawls (created_at) VALUES (?)", (now,)).lastrowid
+            conn.executemany("INSERT INTO shards (crawl_id, shard, resorts) VALUES (?, ?, ?)", [
+                (crawl_id, i // shard_size, json.dumps(resorts[i:i + shard_size]))
+                for i in range(0, len(resorts), shard_size)
+            ])
+            if not resorts:
+                conn.execute("UPDATE crawls SET finished_at = ? WHERE id = ?", (now, crawl_id))
+        return crawl_id
+
+    def claim(self, worker, crawl_id=None, lease=LEASE_SECONDS, now=None):
+        # Leases the next free shard, oldest crawl first; returns (crawl_id, shard, resorts) or None
+        now = now if now is not None else time.time()
+        with self.transaction() as conn:
+            row = conn.execute("""
+                SELECT crawl_id, shard, resorts FROM shards
+                WHERE done_at IS NULL AND attempts < ? AND (lease_expires IS NULL OR lease_expires < ?)
+                  AND (? IS NULL OR crawl_id = ?)
+                  AND crawl_id IN (SELECT id FROM crawls WHERE finished_at IS NULL)
+                ORDER BY crawl_id, shard LIMIT 1
+            """, (MAX_ATTEMPTS, now, crawl_id, crawl_id)).fetchone()
+            if row is None:
+                return None
+            conn.execute("""
+                UPDATE shards SET worker = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE crawl_id = ? AND shard = ?
+            """, (worker, now + lease, row[0], row[1]))
+        return row[0], row[1], json.loads(row[2])
+
+    def complete(self, crawl_id, shard, now=None):
+        # Marks a shard done, and the crawl finished once no shard is outstanding
+        now = now if now is not None else time.time()
+        with self.transaction() as conn:
+            conn.execute("UPDATE shards SET done_at = ? WHERE crawl_id = ? AND shard = ? AND done_at IS NULL",
+                         (now, crawl_id, shard))
+            if not self._outstanding(conn, crawl_id, now):
+                conn.execute("UPDATE crawls SET finished_at = ? WHERE id = ? AND finished_at IS NULL", (now, crawl_id))
+
+    def release(self, crawl_id, shard):
+        # Gives a shard back early, e.g. after the worker hit an error
+        with self.transaction() as conn:
+            conn.execute("UPDATE shards SET lease_expires = 0 WHERE crawl_id = ? AND shard = ? AND done_at IS NULL",
+                         (crawl_id, shard))
+
+    def _outstanding(self, conn, crawl_id, now):
+        # Shards still to be done: not abandoned, or abandoned but still leased; none once the crawl is finished
+        return conn.execute("""
+            SELECT COUNT(*) FROM shards
+            WHERE crawl_id = ? AND done_at IS NULL AND (attempts < ? OR lease_expires >= ?)
+              AND crawl_id IN (SELECT id FROM crawls WHERE finished_at IS NULL)
+        """, (crawl_id, MAX_ATTEMPTS, now)).fetchone()[0]
+
+    def finished(self, crawl_id, now=None):
+        now = now if now is not None else time.time()
+        return self._outstanding(self.connection(), crawl_id, now) == 0
+
+    def latest(self):
+        # Id of the most recently queued crawl, or None
+        row = self.connection().execute("SELECT MAX(id) FROM crawls").fetchone()
+        return row[0]
+
+    def progress(self, crawl_id, now=None):
+        # Shard counts for one crawl by state; a superseded crawl's unfinished shards count as superseded
+        now = now if now is not None else time.time()
+        rows = self.connection().execute("""
+            SELECT CASE
+                WHEN done_at IS NOT NULL THEN 'done'
+                WHEN attempts >= ? AND (lease_expires IS NULL OR lease_expires < ?) THEN 'abandoned'
+                WHEN crawls.finished_at IS NOT NULL THEN 'superseded'
+                WHEN lease_expires >= ? THEN 'leased'
+                ELSE 'pending'
+            END AS state, COUNT(*) FROM shards JOIN crawls ON crawls.id = shards.crawl_id
+            WHERE crawl_id = ? GROUP BY state
+        """, (MAX_ATTEMPTS, now, now, crawl_id)).fetchall()
+        progress = {'done': 0, 'leased': 0, 'pending': 0, 'abandoned': 0, 'superseded': 0}
+        progress.update(dict(rows))
+        return progress
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def work(queue, crawl_shard, crawl_id=None, follow=False, lease=LEASE_SECONDS, worker=None):
+    """
+    Claims and crawls shards until none are free; returns how many it crawled.
+
+    `crawl_shard(resorts)` must fetch and store one shard. With `follow`,
+    keeps waiting for new crawls instead of returning.
+    """
+    worker = worker or worker_id()
+    crawled = 0
+    while True:
+        claimed = queue.claim(worker, crawl_id, lease)
+        if claimed is None:
+            if not follow:
+                return crawled
+            time.sleep(POLL_INTERVAL)
+            continue
+        claimed_crawl, shard, resorts = claimed
+        print(f"Worker {worker} crawling shard {shard} of crawl {claimed_crawl} ({len(resorts)} resorts)...")
+        try:
+            crawl_shard(resorts)
+        except Exception:
+            queue.release(claimed_crawl, shard)
+            raise
+        queue.complete(claimed_crawl, shard)
+        crawled += 1
+
+
+def run_crawl(queue, resorts, crawl_shard, shard_size=SHARD_SIZE, lease=LEASE_SECONDS):
+    # Queues a crawl, works on it alongside any other workers and returns once every shard is done
+    crawl_id = queue.create(resorts, shard_size)
+    print(f"Queued crawl {crawl_id} of {len(resorts)} resorts.")
+    while not queue.finished(crawl_id):
+        if not work(queue, crawl_shard, crawl_id, lease=lease):
+            time.sleep(POLL_INTERVAL)  # The remaining shards are leased by other workers
+    print(f"Crawl {crawl_id} finished: {queue.progress(crawl_id)}")
+    return crawl_id
+
+
+def wait_for(queue, crawl_id):
+    while not queue.finished(crawl_id):
+        time.sleep(POLL_INTERVAL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded resort crawl over a shared work queue")
+    parser.add_argument("--queue", default=os.environ.get("CRAWL_QUEUE", QUEUE_PATH), help="Queue database path")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    plan = subparsers.add_parser("plan", help="Queue a crawl of the resorts due for a refresh")
+    plan.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    plan.add_argument("--all", action="store_true", help="Queue every resort, not just those due")
+
+    work_parser = subparsers.add_parser("work", help="Crawl queued shards")
+    work_parser.add_argument("--crawl", type=int, help="Only work on this crawl")
+    work_parser.add_argument("--follow", action="store_true", help="Keep waiting for new crawls")
+    work_parser.add_argument("--lease", type=float, default=LEASE_SECONDS)
+
+    merge = subparsers.add_parser("merge", help="Wait for a crawl to finish, then rescore and save the ranking")
+    merge.add_argument("--crawl", type=int, help="Crawl to wait for (default: the latest)")
+
+    status = subparsers.add_parser("status", help="Show a crawl's progress")
+    status.add_argument("--crawl", type=int, help="Crawl to show (default: the latest)")
+
+    args = parser.parse_args()
+    queue = CrawlQueue(args.queue)
+    # The pipeline is only needed by commands that fetch or score
+    if args.command == "plan":
+        import app
+        resorts = app.resorts if args.all else app.plan_refresh()
+        crawl_id = queue.create(resorts, args.shard_size)
+        print(f"Queued crawl {crawl_id} of {len(resorts)} resorts.")
+    elif args.command == "work":
+        import app
+        crawled = work(queue, app.crawl_queued_shard, args.crawl, args.follow, args.lease)
+        print(f"Crawled {crawled} shards.")
+    elif args.command == "merge":
+        import app
+        crawl_id = args.crawl or queue.latest()
+        if crawl_id is not None:
+            wait_for(queue, crawl_id)
+        with app.refresh_scheduler.lock_file:
+            result = app.rescore_resort_data()
+        print("Merged crawl into the ranking." if result is not None else "Failed to merge crawl.")
+    else:
+        crawl_id = args.crawl or queue.latest()
+        print(f"Crawl {crawl_id}: {queue.progress(crawl_id)}" if crawl_id is not None else "No crawls queued.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from locking import FileLock, atomic_write
+from scoring import METRICS
+
+# Default location of the history file; resort names live in a sidecar file
+HISTORY_PATH = 'history.bin'
+SECONDS_PER_DAY = 86400
+
+# One fixed-width, 18-byte record per resort per refresh
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<u4'),
+    ('resort', '<u2'),
+    ('topSnowDepth', '<f4'),
+    ('botSnowDepth', '<f4'),
+    ('freshSnowfall', '<f4'),
+])
+
+
+class HistoryStore:
+    """
+    Append-only time series of snow conditions, one record per resort per refresh.
+
+    Records are appended to a flat binary file and read back through a
+    memory map, so a window query is a vectorized mask over the file rather
+    than a parse. Resort names are interned to 16-bit ids in a JSON sidecar.
+    A full season of hourly refreshes for every resort is a few tens of MB.
+    """
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        self.names_path = os.path.splitext(path)[0] + '_names.json'
+        self.lock = threading.Lock()
+        self.file_lock = FileLock(path + '.lock')  # Crawl workers in other processes append too
+        self.names = self._load_names()
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.mapped = None
+        self.mapped_size = 0
+
+    def _load_names(self):
+        try:
+            with open(self.names_path, 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return []
+
+    def _intern(self, name):
+        resort_id = self.ids.get(name)
+        if resort_id is None:
+            resort_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return resort_id
+
+    def append(self, conditions_by_resort, timestamp=None):
+        # Appends one record per resort from {name: {metric: inches, ...}}
+        timestamp = int(timestamp if timestamp is not None else time.time())
+        with self.lock, self.file_lock:
+            # Another process may have interned names since this one last looked
+            self._reload_names()
+            known = len(self.names)
+            records = np.zeros(len(conditions_by_resort), dtype=RECORD_DTYPE)
+            for i, (name, conditions) in enumerate(conditions_by_resort.items()):
+                records[i]['timestamp'] = timestamp
+                records[i]['resort'] = self._intern(name)
+                for metric in METRICS:
+                    records[i][metric] = conditions.get(metric, 0)
+            if len(self.names) != known:
+                # Names are written first so every id in the file can be resolved
+                with atomic_write(self.names_path) as file:
+                    json.dump(self.names, file)
+            with open(self.path, 'ab') as file:
+                file.write(records.tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+        return len(records)
+
+    def records(self):
+        # Memory-maps the file, remapping only when it has grown
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        size -= size % RECORD_DTYPE.itemsize  # Ignore a torn trailing record
+        if size == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        if self.mapped is None or size != self.mapped_size:
+            self.mapped = np.memmap(self.path, dtype=RECORD_DTYPE, mode='r', shape=(size // RECORD_DTYPE.itemsize,))
+            self.mapped_size = size
+        return self.mapped
+
+    def _reload_names(self):
+        # Picks up names interned by other processes
+        self.names = self._load_names()
+        self.ids = {resort: i for i, resort in enumerate(self.names)}
+
+    def window(self, name, days=7, now=None):
+        # Returns this resort's records from the last `days` days, oldest first
+        if name not in self.ids:
+            self._reload_names()
+        resort_id = self.ids.get(name)
+        if resort_id is None:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        records = self.records()
+        since = (now if now is not None else time.time()) - days * SECONDS_PER_DAY
+        return np.array(records[(records['resort'] == resort_id) & (records['timestamp'] >= since)])
+
+    def count_since(self, since):
+        # Number of records appended since a timestamp, i.e. successful fetches
+        return int(np.count_nonzero(self.records()['timestamp'] >= since))
+
+    def volatility(self, days=7, now=None):
+        # Standard deviation of each resort's freshSnowfall over the last `days` days, {name: inches}
+        records = self.records()
+        since = (now if now is not None else time.time()) - days * SECONDS_PER_DAY
+        recent = records[records['timestamp'] >= since]
+        if not len(recent):
+            return {}
+        ids = recent['resort']
+        snowfall = recent['freshSnowfall'].astype(np.float64)
+        counts = np.bincount(ids)
+        if len(counts) > len(self.names):
+            self._reload_names()
+        present = np.flatnonzero(counts)
+        means = np.bincount(ids, snowfall)[present] / counts[present]
+        variances = np.bincount(ids, snowfall * snowfall)[present] / counts[present] - means * means
+        return {self.names[i]: float(std) for i, std in zip(present, np.sqrt(np.maximum(variances, 0)))}
+
+    def summary(self, name, days=7, now=None, include_points=True):
+        """
+        Summarizes one resort's conditions over the last `days` days.
+
+        Each metric reports min, max, mean, last and change (last minus first).
+        `snowfall` adds up each calendar day's highest freshSnowfall reading.
+        """
+        window = self.window(name, days, now)
+        result = {'resort': name, 'days': days, 'samples': int(len(window))}
+        if include_points:
+            result['points'] = [
+                {'timestamp': int(record['timestamp']), **{metric: round(float(record[metric]), 2) for metric in METRICS}}
+                for record in window
+            ]
+        if not len(window):
+            result['metrics'] = {}
+            result['snowfall'] = 0.0
+            return result
+        result['metrics'] = {
+            metric: {
+                'min': round(float(window[metric].min()), 2),
+                'max': round(float(window[metric].max()), 2),
+                'mean': round(float(window[metric].mean()), 2),
+                'last': round(float(window[metric][-1]), 2),
+                'change': round(float(window[metric][-1] - window[metric][0]), 2),
+            }
+            for metric in METRICS
+        }
+        day_numbers = window['timestamp'] // SECONDS_PER_DAY
+        _, day_starts = np.unique(day_numbers, return_index=True)
+        result['snowfall'] = round(float(np.maximum.reduceat(window['freshSnowfall'], day_starts).sum()), 2)
+        return result
@@ -0,0 +1,62 @@
+import json
+import os
+import threading
+
+# Default location of the crawl checkpoint journal
+JOURNAL_PATH = 'crawl.journal'
+
+
+class CrawlJournal:
+    """
+    Append-only checkpoint of the payloads a crawl has fetched so far.
+
+    Each result is written as one JSON line and fsynced as soon as it
+    arrives, so a crawl killed partway through keeps everything it already
+    fetched. The journal is removed once the crawl's results are stored;
+    anything still in it at startup came from an interrupted crawl.
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.fd = None
+
+    def append(self, resort, payload):
+        line = json.dumps({'resort': resort, 'payload': payload}, separators=(',', ':')) + '\n'
+        with self.lock:
+            if self.fd is None:
+                self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            os.write(self.fd, line.encode('utf-8'))
+            os.fsync(self.fd)
+
+    def entries(self):
+        # Returns {resort: payload} in the order they were fetched
+        entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # A torn final line from the crash; everything before it is intact
+                    entries[entry['resort']] = entry['payload']
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def last_written(self):
+        # When the last entry was appended, or None if there is no journal
+        try:
+            return os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return None
+
+    def clear(self):
+        with self.lock:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
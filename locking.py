@@ -0,0 +1,85 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl  # POSIX only; elsewhere locks only exclude threads of one process
+except ImportError:
+    fcntl = None
+
+# Seconds between attempts while another process holds a lock
+POLL_INTERVAL = 0.1
+
+
+class FileLock:
+    """
+    Exclusive lock shared by every process that opens the same path.
+
+    Uses flock(2), so the OS drops the lock when the holder exits or dies
+    and a crashed crawl can never wedge the other workers. One FileLock
+    instance is also safe to share between threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.thread_lock = threading.Lock()  # flock is per open file, not per thread
+
+    def acquire(self, blocking=True, timeout=None):
+        # Returns True once the lock is held, or False if it did not free up in time
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self.thread_lock.acquire(blocking, -1 if timeout is None or not blocking else timeout):
+            return False
+        if fcntl is None:
+            return True
+        file = open(self.path, 'a')
+        while True:
+            try:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self.file = file
+                return True
+            except BlockingIOError:
+                if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                    file.close()
+                    self.thread_lock.release()
+                    return False
+                time.sleep(POLL_INTERVAL)
+
+    def release(self):
+        if self.file is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+        self.thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+@contextmanager
+def atomic_write(path, mode='w'):
+    """
+    Yields a temporary file that replaces `path` only once fully written.
+
+    The data is fsynced and then renamed over the old file, so readers in
+    any process see either the old contents or the new, never a mix. If
+    the block raises, the old file is left untouched.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp_path, 0o644)  # mkstemp creates files readable only by the owner
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
@@ -1,6 +1,70 @@
 document.addEventListener('DOMContentLoaded', function() {
-    // Fetch top resorts data immediately on page load
-    fetchResortData('/api/resorts', true); // Endpoint assumed to return all resorts
+    // Only the top 5 resorts are shown on load
+    const TOP_RESORTS = 5;
+
+    // The top resorts, kept up to date by the live stream
+    let ranking = null;
+
+    // Subscribe to live updates of the top resorts, or fetch them once where EventSource is missing
+    if (window.EventSource) {
+        subscribeToRankings();
+    } else {
+        fetchResortData(`/api/resorts?limit=${TOP_RESORTS}`, true);
+    }
+
+    // Function to receive the top resorts once, then a compact diff whenever they change
+    function subscribeToRankings() {
+        var source = new EventSource(`/api/resorts/stream?limit=${TOP_RESORTS}`);
+        source.addEventListener('snapshot', function(event) {
+            ranking = JSON.parse(event.data);
+            showRanking();
+        });
+        source.addEventListener('diff', function(event) {
+            var next = applyRankingDiff(ranking, JSON.parse(event.data));
+            if (next === null) {
+                // Out of step with the server: start over from the current top resorts
+                source.close();
+                subscribeToRankings();
+                return;
+            }
+            ranking = next;
+            showRanking();
+        });
+        // On errors EventSource reconnects by itself and resumes from the last event it saw
+    }
+
+    // Function to patch a ranking with a diff; returns null if the diff does not fit it
+    function applyRankingDiff(current, diff) {
+        if (!current) {
+            return null;
+        }
+        var next = new Array(diff.total);
+        var moved = new Set(diff.removed);
+        diff.changed.forEach(([name, rank, score, region]) => {
+            next[rank] = { name: name, score: score, region: region };
+            moved.add(name);
+        });
+        // Resorts not in the diff kept their rank, which is their index in the list
+        current.forEach((resort, index) => {
+            if (!moved.has(resort.name)) {
+                next[index] = resort;
+            }
+        });
+        for (var i = 0; i < next.length; i++) {
+            if (!next[i]) {
+                return null;
+            }
+        }
+        return next;
+    }
+
+    // Function to show the latest top resorts and, if it is open, revalidate the full table
+    function showRanking() {
+        updateTopResortsList(ranking);
+        if (document.getElementById('showAllModal').style.display === 'block') {
+            fetchResortData('/api/resorts'); // The stream only carries the top resorts
+        }
+    }
 
     // Event listener for the search button
     document.getElementById('resortSearchButton').addEventListener('click', function() {
@@ -12,6 +76,12 @@ document.addEventListener('DOMContentLoaded', function() {
             fetch(`/api/search?resort=${formattedResortName}`)
                 .then(response => response.json())
                 .then(data => {
+                    if (data.error) {
+                        // Unknown resort: offer the closest names instead
+                        console.error(data.error);
+                        updateSuggestions(data.suggestions || []);
+                        return;
+                    }
                     // Display individual resort data
                     individualResortData(data);
                     // Open modal to show the data
@@ -21,6 +91,34 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
+    // Autocomplete: ask the server for matching names as the user types
+    let suggestTimer = null;
+    document.getElementById('resortSearchBox').addEventListener('input', function() {
+        var query = this.value.trim();
+        clearTimeout(suggestTimer);
+        if (query.length < 2) {
+            return;
+        }
+        // Debounce so fast typing sends one request
+        suggestTimer = setTimeout(function() {
+            fetch(`/api/suggest?q=${encodeURIComponent(query)}&limit=8`)
+                .then(response => response.json())
+                .then(updateSuggestions)
+                .catch(error => console.error('Error fetching suggestions:', error));
+        }, 150);
+    });
+
+    // Function to fill the search box's suggestion list
+    function updateSuggestions(names) {
+        var datalist = document.getElementById('resortSuggestions');
+        datalist.innerHTML = '';
+        names.forEach(name => {
+            var option = document.createElement('option');
+            option.value = name;
+            datalist.appendChild(option);
+        });
+    }
+
     // Event listener for pressing Enter in the search input field
     document.getElementById('resortSearchBox').addEventListener('keypress', function(event) {
         if (event.key === 'Enter') {
@@ -31,13 +129,14 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Event listener for the "Show All Resorts" button
     document.getElementById('thebutton').addEventListener('click', function() {
-        // Fetch and display all resorts data
+        // Fetch and display all resorts data; the stream only holds the top resorts
         fetchResortData('/api/resorts');
     });
 
     // Function to fetch and display resort data
     function fetchResortData(url, updateTopResortsImmediately = false) {
-        fetch(url)
+        // Revalidate with the server so unchanged rankings come back as a cheap 304
+        fetch(url, { cache: 'no-cache' })
             .then(response => response.json())
             .then(data => {
                 // Log the retrieved data
@@ -136,8 +235,10 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         };
 
-        // Attach click event to all th elements
-        document.querySelectorAll('#showAllTable th').forEach(th => th.addEventListener('click', (() => {
+        // Attach click event to all th elements, once each since the table is redrawn on every update
+        const unwired = document.querySelectorAll('#showAllTable th:not([data-sortable])');
+        unwired.forEach(th => th.dataset.sortable = 'true');
+        unwired.forEach(th => th.addEventListener('click', (() => {
             const table = th.closest('table');
             const tbody = table.querySelector('tbody');
             const isNumeric = !isNaN(parseFloat(tbody.rows[0].cells[th.cellIndex].textContent)); // Check if the first row in the column is numeric
@@ -1,31 +1,114 @@
 # Import necessary modules
 import os
 import time
-import requests
+import threading
 from dotenv import load_dotenv
 from resorts import resorts
+from scoring import METRICS, ScoreTable, parse_weights
+from upstream import UpstreamError, get_client
 import concurrent.futures
 
-# Load environment variables
-load_dotenv(dotenv_path='rapid.env')
-print("Environment variables loaded.")
+# Constants; MAX_WORKERS and REQUESTS_PER_SECOND are defaults the environment can override
+DELAY_BETWEEN_REQUESTS = 1
+MAX_WORKERS = 8
+REQUESTS_PER_SECOND = 20
+# Quota windows up to this many seconds refill quickly, so the crawl paces itself to them
+SHORT_QUOTA_WINDOW = 60
 
-# Access the API_KEY environment variable
-api_key = os.getenv("API_KEY")
-print("API key accessed.")
+# Crawler settings, read from the environment on first use so importing this module does no I/O
+_settings = None
+_settings_lock = threading.Lock()
 
-# Initialize a session for connection reuse
-session = requests.Session()
-session.headers.update({
-    "X-RapidAPI-Key": api_key,
-    "X-RapidAPI-Host": "ski-resort-forecast.p.rapidapi.com"
-})
-print("Session initialized with headers.")
+def get_settings():
+    # Loads rapid.env once and returns the crawler settings
+    global _settings
+    with _settings_lock:
+        if _settings is None:
+            load_dotenv(dotenv_path='rapid.env')
+            print("Environment variables loaded.")
+            _settings = {
+                "max_workers": int(os.getenv("MAX_WORKERS", MAX_WORKERS)),
+                "requests_per_second": float(os.getenv("REQUESTS_PER_SECOND", REQUESTS_PER_SECOND)),
+                "score_weights": parse_weights(os.getenv("SCORE_WEIGHTS")),  # e.g. "topSnowDepth=1,botSnowDepth=1,freshSnowfall=2"
+            }
+            print("Constants set.")
+        return _settings
 
-# Constants
-BASE_URL = "https://ski-resort-forecast.p.rapidapi.com/{}/snowConditions"
-DELAY_BETWEEN_REQUESTS = 1
-print("Constants set.")
+class RateLimiter:
+    """
+    Token bucket shared by all crawler threads.
+
+    Tokens refill at `rate` per second up to `burst`. The rate follows the
+    RapidAPI quota headers: it is spread over the quota window when that
+    window is short, or when fewer requests remain in it than the crawl
+    still has to make (`outstanding`). A daily or monthly quota with room
+    for the whole crawl leaves the rate alone. A 429 or exhausted quota
+    pauses every thread until the upstream says requests may resume.
+    """
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, burst=None, outstanding=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.outstanding = outstanding
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        # Block until a token is available, then consume it
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        if self.outstanding:
+                            self.outstanding -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        # Stop handing out tokens for the given number of seconds
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+    def update_from_response(self, response):
+        # Adjust the rate to the quota reported by the upstream
+        headers = response.headers
+        if response.status_code == 429:
+            self.pause(_header_seconds(headers.get("Retry-After"), default=1))
+            return
+        remaining = _header_seconds(headers.get("X-RateLimit-Requests-Remaining"))
+        reset = _header_seconds(headers.get("X-RateLimit-Requests-Reset"))
+        if remaining is None or reset is None:
+            return
+        if remaining <= 0:
+            self.pause(reset)
+        elif reset > 0:
+            with self.lock:
+                if reset <= SHORT_QUOTA_WINDOW or (self.outstanding is not None and remaining < self.outstanding):
+                    self.rate = max(0.1, min(self.max_rate, remaining / reset))
+                else:
+                    self.rate = self.max_rate
+
+def _header_seconds(value, default=None):
+    # Parses a numeric header value, returning the default if it is missing or malformed
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
 
 def parse_depth(measurement):
     # Parses the snow depth measurement and converts it to inches if necessary.
@@ -41,19 +124,38 @@ def parse_depth(measurement):
         return 0
     print("Snow depth measurement parsed.")
 
-def fetch_single_resort_data(resort):
+def fetch_single_resort_data(resort, rate_limiter=None, trace=None):
     print(f"Fetching data for {resort}...")  # Print each resort as they are being iterated
-    time.sleep(DELAY_BETWEEN_REQUESTS)  # Add a delay between requests
+    if rate_limiter is None:
+        time.sleep(DELAY_BETWEEN_REQUESTS)  # Add a delay between requests
+
+    def before_request():
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        if trace is not None:
+            trace.mark(resort, 'sent')
+
+    def after_response(response):
+        if rate_limiter is not None:
+            rate_limiter.update_from_response(response)
+        if trace is not None:
+            trace.mark(resort, 'received', status=response.status_code)
+
     try:
-        formatted_resort_name = resort.replace(" ", "%20")
-        url = BASE_URL.format(formatted_resort_name)
-        response = session.get(url, timeout=5)  # Use session for requests
-        if response.status_code == 200:
-            data = response.json()
-            return {resort: data}
-        else:
-            return {resort: None}
-    except requests.exceptions.RequestException as e:
+        # The shared client pools connections and retries transient failures
+        data = get_client().snow_conditions(
+            resort,
+            before_request=before_request,
+            after_response=after_response,
+            queue_timeout=None,  # The crawl waits for a concurrency slot rather than being shed
+            deadline=None,  # and retries for as long as the backoff allows
+        )
+        if trace is not None:
+            trace.mark(resort, 'parsed')
+        return {resort: data}
+    except UpstreamError as e:
+        if trace is not None:
+            trace.mark(resort, 'failed', error=str(e))
         return {resort: None}  # Handle errors by setting data to None
 
 def fetch_resort_data_sequentially(resorts):
@@ -64,44 +166,67 @@ def fetch_resort_data_sequentially(resorts):
     print("Resort data fetched sequentially.")
     return resort_data
 
+def fetch_resort_data_concurrently(resorts, max_workers=None, requests_per_second=None, trace=None, on_result=None):
+    # Fetches all resorts in parallel while a shared token bucket enforces the upstream quota;
+    # on_result(resort, data) is called with each successful fetch as it completes
+    settings = get_settings()
+    max_workers = max_workers or settings["max_workers"]
+    requests_per_second = requests_per_second or settings["requests_per_second"]
+    rate_limiter = RateLimiter(requests_per_second, outstanding=len(resorts))
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for resort in resorts:
+            if trace is not None:
+                trace.mark(resort, 'queued')
+            futures[executor.submit(fetch_single_resort_data, resort, rate_limiter, trace)] = resort
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            results.update(result)
+            if on_result is not None:
+                for resort, data in result.items():
+                    if data is not None:
+                        on_result(resort, data)
+    # Keep the same ordering as the sequential path
+    resort_data = {resort: results[resort] for resort in resorts}
+    print("Resort data fetched concurrently.")
+    return resort_data
+
+def parse_conditions(data):
+    # Extracts snow depths in inches and the region from one raw API payload
+    if data is None or 'imperial' not in data:
+        return None
+    imperial_data = data['imperial']
+    conditions = {metric: parse_depth(imperial_data.get(metric, '0in')) for metric in METRICS}
+    # Safely access nested 'region' value
+    conditions['region'] = imperial_data.get('basicInfo', {}).get('region', 'N/A')
+    return conditions
+
 def process_resort_data(resort_data):
+    # Parses raw API payloads into a columnar ScoreTable of snow conditions
     if not resort_data:
         return None
-    processed_data = {}
+    names = []
+    regions = []
+    values = []
     for resort, data in resort_data.items():
-        if data is None or 'imperial' not in data:
+        conditions = parse_conditions(data)
+        if conditions is None:
             continue
-        imperial_data = data['imperial']
-        # Safely access nested 'region' value
-        region = imperial_data.get('basicInfo', {}).get('region', 'N/A')
-        processed_data[resort] = {
-            'topSnowDepth': parse_depth(imperial_data.get('topSnowDepth', '0in')),
-            'botSnowDepth': parse_depth(imperial_data.get('botSnowDepth', '0in')),
-            'freshSnowfall': parse_depth(imperial_data.get('freshSnowfall', '0in')),
-            'region': region  # Safely extracted region
-        }
-
-    # Calculate percentile scores for each snow condition
-    for key in ['topSnowDepth', 'botSnowDepth', 'freshSnowfall']:
-        values = [float(processed_data[resort][key]) for resort in processed_data if key in processed_data[resort]]
-        if values:
-            max_value = max(values)
-            percentile_scores = {resort: f"{round((value / max_value) * 100, 3)}%" for resort, value in zip(processed_data.keys(), values)}
-            for resort in processed_data:
-                if key in processed_data[resort]:
-                    processed_data[resort][key] = percentile_scores[resort]
+        names.append(resort)
+        regions.append(conditions['region'])
+        values.append([conditions[metric] for metric in METRICS])
 
+    # Percentile scores for each snow condition are computed column-wise by the table
+    processed_data = ScoreTable(names, regions, values)
     print("Resort data processed.")
     return processed_data
 
-def sort_resorts(processed_data):
-    # Ranks resorts based on normalized snow condition scores.
+def sort_resorts(processed_data, weights=None, k=None):
+    # Ranks resorts based on normalized snow condition scores, optionally only the top k
     if not processed_data:
         return []
 
-    total_scores = {resort: sum([float(resort_data[key].rstrip('%')) for key in resort_data if key != 'region']) for resort, resort_data in processed_data.items()}
-    max_score = max(total_scores.values())
-    normalized_scores = {resort: (score / max_score) * 100 for resort, score in total_scores.items()}
-    sorted_resorts = sorted(normalized_scores.items(), key=lambda x: x[1], reverse=True)
+    sorted_resorts = processed_data.top(weights or get_settings()["score_weights"], k)
     print("Resorts sorted based on normalized snow condition scores.")
     return sorted_resorts
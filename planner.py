@@ -0,0 +1,150 @@
+import collections
+import math
+import threading
+import time
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+# Longest a resort goes without a refresh while the budget allows it
+MAX_INTERVAL = 2 * SECONDS_PER_DAY
+# Days of history and searches the planner looks back over
+PLANNING_DAYS = 7
+# How much a resort's weight grows with snowfall volatility and with search popularity, on top of 1
+VOLATILITY_WEIGHT = 4.0
+POPULARITY_WEIGHT = 2.0
+# Seconds between writes of the in-memory search counts to the store
+SEARCH_FLUSH_INTERVAL = 60
+
+
+class RefreshPlanner:
+    """
+    Spreads a daily upstream budget over the resorts by how much their data moves.
+
+    Every resort gets a weight of 1, plus up to VOLATILITY_WEIGHT for how
+    much its freshSnowfall has varied over the last few days and up to
+    POPULARITY_WEIGHT for how often it was searched. Weights are scaled
+    into fetches per day that add up to the budget, each between one per
+    `max_interval` and one per `min_interval`, and become per-resort
+    freshness budgets in the PayloadStore. A resort getting fresh snow is
+    then refetched every refresh while a closed one waits days.
+
+    Each refresh also stops at what is left of the budget after every
+    upstream call, retries and searches included, made over the last 24
+    hours, fetching the most overdue resorts (age over interval) first.
+    """
+
+    def __init__(self, daily_budget, min_interval=3600, max_interval=MAX_INTERVAL, days=PLANNING_DAYS):
+        self.daily_budget = daily_budget
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.days = days
+
+    def weights(self, resorts, volatility, popularity):
+        # One weight per resort, from {name: freshSnowfall std dev} and {name: searches}
+        volatility = np.array([volatility.get(resort, 0.0) for resort in resorts], dtype=np.float64)
+        popularity = np.log1p([popularity.get(resort, 0) for resort in resorts])  # Damp the most-searched few
+        weights = np.ones(len(resorts))
+        if volatility.max(initial=0) > 0:
+            weights += VOLATILITY_WEIGHT * volatility / volatility.max()
+        if popularity.max(initial=0) > 0:
+            weights += POPULARITY_WEIGHT * popularity / popularity.max()
+        return weights
+
+    def intervals(self, resorts, volatility, popularity):
+        """
+        Returns {resort: refresh interval in seconds} within the daily budget.
+
+        Fetches per day are proportional to each resort's weight, clamped to
+        [1/max_interval, 1/min_interval]; the scale is found by bisection so
+        the clamped rates add up to the budget. A budget too small for one
+        fetch per max_interval is shared equally instead.
+        """
+        resorts = list(dict.fromkeys(resorts))
+        if not resorts:
+            return {}
+        weights = self.weights(resorts, volatility, popularity)
+        lowest = SECONDS_PER_DAY / self.max_interval
+        highest = SECONDS_PER_DAY / self.min_interval
+        if self.daily_budget <= lowest * len(resorts):
+            rates = np.full(len(resorts), self.daily_budget / len(resorts))
+        elif self.daily_budget >= highest * len(resorts):
+            rates = np.full(len(resorts), highest)
+        else:
+            low, high = 0.0, highest / weights.min()
+            for _ in range(60):
+                scale = (low + high) / 2
+                if np.clip(scale * weights, lowest, highest).sum() > self.daily_budget:
+                    high = scale
+                else:
+                    low = scale
+            rates = np.clip(low * weights, lowest, highest)
+        return {resort: float(SECONDS_PER_DAY / rate) for resort, rate in zip(resorts, rates)}
+
+    def plan(self, resorts, store, history, now=None):
+        # Sets each resort's freshness budget and returns the resorts to fetch now, most overdue first
+        now = now if now is not None else time.time()
+        intervals = self.intervals(
+            resorts,
+            history.volatility(self.days, now),
+            store.search_counts(math.ceil(self.days), now),
+        )
+        store.set_budgets(intervals)
+
+        fetched_at = store.fetched_at()
+        stale = store.stale(resorts, now=now)
+        stale.sort(key=lambda resort: (now - fetched_at[resort]) / intervals[resort]
+                   if resort in fetched_at else math.inf, reverse=True)
+        remaining = max(0, int(self.daily_budget) - store.api_calls_since(now - SECONDS_PER_DAY))
+        print(f"Refresh plan: {len(stale)} resorts due, {remaining} of {int(self.daily_budget)} daily API calls left.")
+        return stale[:remaining]
+
+
+class SearchCounter:
+    """
+    Counts searches per resort in memory and hands them to `flush` in batches.
+
+    Counting is a dict increment under a lock, so it is cheap enough for
+    every request and for an event loop; at most once every `interval`
+    seconds a background thread writes the counts out, so no request waits
+    on the store. `flush()` writes them synchronously, e.g. before planning
+    a refresh.
+    """
+
+    def __init__(self, flush, interval=SEARCH_FLUSH_INTERVAL):
+        self.flush_to = flush
+        self.interval = interval
+        self.counts = collections.Counter()
+        self.flushed_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def record(self, resort):
+        with self.lock:
+            self.counts[resort] += 1
+            if time.monotonic() - self.flushed_at < self.interval:
+                return
+            # Push the next flush out now, so only one thread is started per interval
+            self.flushed_at = time.monotonic()
+        threading.Thread(target=self.flush, name="counter-flush", daemon=True).start()
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, collections.Counter()
+            self.flushed_at = time.monotonic()
+        if not counts:
+            return
+        try:
+            self.flush_to(counts)
+        except Exception as e:
+            # The counts only steer the planner, so losing one batch is better than retrying forever
+            print("Error saving search counts:", e)
+
+
+class CallCounter(SearchCounter):
+    # Counts upstream calls the same way, handing `flush` the number made since the last flush
+
+    def __init__(self, flush, interval=SEARCH_FLUSH_INTERVAL):
+        super().__init__(lambda counts: flush(counts['calls']), interval)
+
+    def record(self):
+        super().record('calls')
@@ -0,0 +1,202 @@
+import cProfile
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Profiling is off unless one of these is set
+PROFILE_DIR = 'profiles'
+PROFILE_REQUEST_RATE = 0.0
+SAMPLE_INTERVAL = 0.005
+
+# cProfile can only be active for one profile at a time per thread, and newer
+# interpreters allow only one in the whole process
+_profile_lock = threading.Lock()
+
+
+def profile_dir():
+    return os.environ.get("PROFILE_DIR", PROFILE_DIR)
+
+
+def request_rate():
+    return float(os.environ.get("PROFILE_REQUEST_RATE", PROFILE_REQUEST_RATE))
+
+
+def refresh_profiling_enabled():
+    return os.environ.get("PROFILE_REFRESH", "") not in ("", "0")
+
+
+def _output_path(kind, label, extension):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r"[^0-9A-Za-z]+", "-", label).strip("-") or "root"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(directory, f"{kind}-{slug}-{stamp}-{os.getpid()}-{random.randrange(16**4):04x}.{extension}")
+
+
+class RequestProfiler:
+    # A cProfile run covering one request, or None if another profile is active
+
+    @staticmethod
+    def maybe_start():
+        # Starts a profile for a sampled fraction of requests
+        rate = request_rate()
+        if rate <= 0 or random.random() >= rate:
+            return None
+        if not _profile_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            _profile_lock.release()
+            return None
+        return profiler
+
+    @staticmethod
+    def finish(profiler, label):
+        # Stops the profile and dumps it as a .pstats file; returns the path
+        try:
+            profiler.disable()
+        finally:
+            _profile_lock.release()
+        path = _output_path("request", label, "pstats")
+        profiler.dump_stats(path)
+        return path
+
+
+class StackSampler:
+    """
+    Samples the stacks of every thread at a fixed interval.
+
+    Unlike cProfile, which only sees the thread it was enabled on, this
+    also covers the crawler's worker threads. Output is in the collapsed
+    "frame;frame;frame count" format read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self.stopped.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+class CrawlTrace:
+    """
+    Per-resort timeline of a crawl: queued, sent, received and parsed.
+
+    `sent` and `received` repeat when a request is retried. The trace is
+    written in Chrome trace event format (chrome://tracing or Perfetto),
+    with one row per worker thread, so stragglers stand out.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.events = []
+        self.lock = threading.Lock()
+
+    def mark(self, resort, phase, **details):
+        event = (time.perf_counter() - self.started, threading.get_ident(), resort, phase, details)
+        with self.lock:
+            self.events.append(event)
+
+    def durations(self):
+        # Returns {resort: seconds from queued to parsed (or last event)}
+        first, last = {}, {}
+        for offset, _, resort, phase, _ in self.events:
+            if phase == 'queued':
+                first.setdefault(resort, offset)
+            last[resort] = offset
+        return {resort: last[resort] - first.get(resort, last[resort]) for resort in last}
+
+    def slowest(self, count=10):
+        return sorted(self.durations().items(), key=lambda item: -item[1])[:count]
+
+    def to_chrome_trace(self):
+        trace = []
+        open_requests = {}
+        for offset, thread_id, resort, phase, details in self.events:
+            timestamp = offset * 1e6
+            trace.append({"name": phase, "cat": "crawl", "ph": "i", "s": "t", "ts": timestamp,
+                          "pid": os.getpid(), "tid": thread_id, "args": {"resort": resort, **details}})
+            if phase == 'sent':
+                open_requests[(resort, thread_id)] = timestamp
+            elif phase == 'received' and (resort, thread_id) in open_requests:
+                start = open_requests.pop((resort, thread_id))
+                trace.append({"name": resort, "cat": "upstream", "ph": "X", "ts": start, "dur": timestamp - start,
+                              "pid": os.getpid(), "tid": thread_id, "args": details})
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def dump(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.to_chrome_trace(), file)
+
+
+@contextmanager
+def profile_refresh(label="refresh"):
+    """
+    Profiles one refresh run when PROFILE_REFRESH is set.
+
+    Yields a CrawlTrace to pass to the crawler (or None when disabled) and
+    writes a .pstats file, a collapsed-stack file and a crawl trace.
+    """
+    if not refresh_profiling_enabled():
+        yield None
+        return
+    trace = CrawlTrace()
+    sampler = StackSampler().start()
+    profiler = None
+    if _profile_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            profiler = None
+            _profile_lock.release()
+    try:
+        yield trace
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+            profiler.dump_stats(_output_path(label, "main", "pstats"))
+        sampler.stop()
+        sampler.dump(_output_path(label, "stacks", "collapsed"))
+        trace.dump(_output_path(label, "crawl", "trace.json"))
+        for resort, seconds in trace.slowest(5):
+            print(f"Slowest crawl: {resort} took {seconds:.2f}s")
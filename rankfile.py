@@ -0,0 +1,243 @@
+# Binary ranking snapshot: the ranking as one versioned file that every worker
+# process memory-maps instead of parsing.
+#
+# Layout (little-endian, sections 8-byte aligned):
+#   header        magic, format version, counts, created_at, body hash, section offsets
+#   records       one fixed-width record per resort in rank order (RECORD_DTYPE)
+#   name index    record numbers sorted by resort name, for binary search
+#   string table  offsets into a UTF-8 blob of interned names and regions
+#   body          the ranking as compact JSON, exactly as /api/resorts serves it
+#
+# Usage:
+#   python rankfile.py show [--limit 10]
+#   python rankfile.py lookup "Jackson Hole"
+#   python rankfile.py export > ranking.json
+import argparse
+import hashlib
+import json
+import mmap
+import struct
+import sys
+import time
+
+import numpy as np
+
+from locking import atomic_write
+
+# Default location of the binary snapshot; resort_data.json is kept as a JSON export
+SNAPSHOT_PATH = 'resort_data.bin'
+MAGIC = b'SKRK'
+# Bumped whenever the layout changes; readers refuse versions they do not know
+FORMAT_VERSION = 1
+
+# magic, version, resorts, strings, created_at, body hash, then the offsets of
+# the records, name index, string offsets, string blob and body, and the body length
+HEADER = struct.Struct('<4sHxxIId32sQQQQQQ')
+
+# One fixed-width, 24-byte record per resort
+RECORD_DTYPE = np.dtype([
+    ('score', '<f8'),
+    ('name', '<u4'),       # string id
+    ('region', '<u4'),     # string id
+    ('row_start', '<u4'),  # this resort's JSON object within the body
+    ('row_end', '<u4'),
+])
+
+
+def encode_ranking(resort_data, created_at=None):
+    # Serializes a ranking ([{'name', 'score', 'region'}, ...] in rank order) to snapshot bytes
+    created_at = created_at if created_at is not None else time.time()
+    strings = {}
+    records = np.zeros(len(resort_data), dtype=RECORD_DTYPE)
+    rows = []
+    position = 1  # Past the opening bracket
+    for i, resort in enumerate(resort_data):
+        row = json.dumps(resort, separators=(',', ':')).encode('utf-8')
+        records[i] = (
+            resort['score'],
+            strings.setdefault(resort['name'], len(strings)),
+            strings.setdefault(resort.get('region') or 'N/A', len(strings)),
+            position,
+            position + len(row),
+        )
+        rows.append(row)
+        position += len(row) + 1
+    body = b'[' + b','.join(rows) + b']'
+
+    encoded = [string.encode('utf-8') for string in strings]  # In id order
+    name_index = np.array(sorted(range(len(records)), key=lambda i: encoded[records[i]['name']]), dtype='<u4')
+    string_offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+    string_offsets[1:] = np.cumsum([len(string) for string in encoded])
+
+    sections = [records.tobytes(), name_index.tobytes(), string_offsets.tobytes(), b''.join(encoded), body]
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position = _aligned(position + len(section))
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(records), len(encoded), created_at,
+                         hashlib.sha256(body).hexdigest()[:32].encode('ascii'), *offsets, len(body))
+    data = bytearray(header)
+    for offset, section in zip(offsets, sections):
+        data += b'\0' * (offset - len(data))
+        data += section
+    return bytes(data)
+
+
+def _aligned(position):
+    return (position + 7) & ~7
+
+
+def write_ranking(resort_data, path=SNAPSHOT_PATH, created_at=None):
+    # Writes the snapshot atomically; processes that still map the old file keep reading it unchanged
+    data = encode_ranking(resort_data, created_at)
+    with atomic_write(path, 'wb') as file:
+        file.write(data)
+
+
+class RankingFile:
+    """
+    Read-only view of a binary ranking snapshot.
+
+    Opened from disk the file is memory-mapped, so every worker process
+    shares the same page-cache copy and loading costs one header parse.
+    The record table is a NumPy view straight onto the mapping; a lookup by
+    rank reads one record and its strings, a lookup by name binary-searches
+    the name index. Nothing is parsed into Python objects up front.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer)
+        if len(self.buffer) < HEADER.size:
+            raise ValueError("truncated ranking snapshot")
+        (magic, version, count, string_count, self.created_at, body_hash, records_at, index_at,
+         offsets_at, self.strings_at, self.body_at, body_length) = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError("not a ranking snapshot")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"unsupported ranking snapshot version {version}")
+        self.version = version
+        self.hash = body_hash.decode('ascii')
+        self.body_end = self.body_at + body_length
+        if self.body_end > len(self.buffer):
+            raise ValueError("truncated ranking snapshot")
+        self.records = np.frombuffer(self.buffer, dtype=RECORD_DTYPE, count=count, offset=records_at)
+        # The index and string offsets are read one element at a time, where a memoryview beats NumPy
+        self.name_index = self._u4_array(index_at, count)
+        self.string_offsets = self._u4_array(offsets_at, string_count + 1)
+        self.name_ids = self.records['name']
+
+    def _u4_array(self, offset, count):
+        if offset + 4 * count > len(self.buffer):
+            raise ValueError("truncated ranking snapshot")
+        # Native byte order; the format is little-endian, as are the hosts this runs on
+        return self.buffer[offset:offset + 4 * count].cast('I')
+
+    @classmethod
+    def open(cls, path=SNAPSHOT_PATH):
+        with open(path, 'rb') as file:
+            return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def from_ranking(cls, resort_data, created_at=None):
+        # An in-memory snapshot, for a ranking that has not been written to disk
+        return cls(encode_ranking(resort_data, created_at))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, rank):
+        return self.record(rank)
+
+    def __iter__(self):
+        return (self.record(rank) for rank in range(len(self)))
+
+    @property
+    def scores(self):
+        return self.records['score']
+
+    @property
+    def region_ids(self):
+        return self.records['region']
+
+    def _string_bytes(self, string_id):
+        return self.buffer[self.strings_at + self.string_offsets[string_id]:
+                           self.strings_at + self.string_offsets[string_id + 1]].tobytes()
+
+    def string(self, string_id):
+        return self._string_bytes(string_id).decode('utf-8')
+
+    def regions(self):
+        # {string id: region} for every region in the ranking
+        return {int(region_id): self.string(region_id) for region_id in np.unique(self.region_ids)}
+
+    def record(self, rank):
+        # The resort at a 0-based rank as {'name', 'score', 'region'}
+        record = self.records[rank]
+        return {'name': self.string(record['name']), 'score': float(record['score']),
+                'region': self.string(record['region'])}
+
+    def row(self, rank):
+        # The resort's serialized JSON object, as a view onto the file
+        record = self.records[rank]
+        return self.buffer[self.body_at + int(record['row_start']):self.body_at + int(record['row_end'])]
+
+    def body(self):
+        # The whole ranking as a JSON array, as a view onto the file
+        return self.buffer[self.body_at:self.body_end]
+
+    def rank_of(self, name):
+        # 0-based rank of a resort by exact name, or None
+        target = name.encode('utf-8')
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._string_bytes(self.name_ids[self.name_index[middle]]) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self):
+            rank = self.name_index[low]
+            if self._string_bytes(self.name_ids[rank]) == target:
+                return rank
+        return None
+
+    def lookup(self, name):
+        rank = self.rank_of(name)
+        return self.record(rank) if rank is not None else None
+
+    def to_list(self):
+        # The ranking as plain dicts, as in the JSON export
+        return json.loads(bytes(self.body()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a binary ranking snapshot")
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH, help="Snapshot path")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    show = subparsers.add_parser("show", help="Print the top of the ranking")
+    show.add_argument("--limit", type=int, default=10)
+    lookup = subparsers.add_parser("lookup", help="Print one resort's rank and score")
+    lookup.add_argument("name")
+    subparsers.add_parser("export", help="Write the ranking as JSON to stdout")
+
+    args = parser.parse_args()
+    ranking = RankingFile.open(args.snapshot)
+    if args.command == "show":
+        print(f"Format version {ranking.version}, {len(ranking)} resorts, created {time.ctime(ranking.created_at)}")
+        for rank in range(min(args.limit, len(ranking))):
+            resort = ranking.record(rank)
+            print(f"{rank + 1:4d}. {resort['name']} ({resort['region']}): {resort['score']:.2f}")
+    elif args.command == "lookup":
+        rank = ranking.rank_of(args.name)
+        if rank is None:
+            sys.exit(f"No resort named '{args.name}' in the snapshot")
+        resort = ranking.record(rank)
+        print(f"{rank + 1}. {resort['name']} ({resort['region']}): {resort['score']:.2f}")
+    else:
+        json.dump(ranking.to_list(), sys.stdout, indent=4)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import bisect
+import itertools
+import threading
+
+from scoring import DEFAULT_WEIGHTS, METRICS, TOTAL_DECIMALS
+
+
+def _np_round(value, decimals):
+    # Rounds like np.round (scale, round half to even, scale back), which can differ from round(value, decimals)
+    scale = 10 ** decimals
+    return round(value * scale) / scale
+
+
+class IncrementalRanking:
+    """
+    Resort ranking that absorbs per-resort updates without a full re-sort.
+
+    Each metric is scored as a percentage of the best resort for that metric,
+    so the per-metric maxima (and how many resorts hold them) are tracked.
+    An update that leaves every maximum unchanged costs one removal and one
+    insertion in the ordered index. Only when a maximum moves are all totals
+    rescaled. The final 0-100 normalization against the best total is a
+    monotonic rescale, so it is applied when reading rather than stored.
+
+    Scores and order match `ScoreTable.top` for the same data and weights:
+    percentages are rounded as NumPy rounds them and totals to
+    TOTAL_DECIMALS, so ties break on catalog order in both. Pass the
+    catalog so resorts first seen mid-crawl still take their catalog place.
+    """
+
+    def __init__(self, weights=None, catalog=()):
+        self.weights = [float((weights or DEFAULT_WEIGHTS).get(metric, 0.0)) for metric in METRICS]
+        self.values = {}   # name -> tuple of inches per metric
+        self.regions = {}
+        self.sequence = {name: i for i, name in enumerate(catalog)}  # name -> catalog or first-seen position, for ties
+        self.totals = {}
+        self.order = []    # sorted (-total, sequence, name)
+        self.maxima = [0.0] * len(METRICS)
+        self.max_counts = [0] * len(METRICS)
+        self.counter = itertools.count(len(self.sequence))
+        self.rescales = 0
+        self.lock = threading.RLock()
+
+    @classmethod
+    def from_conditions(cls, conditions_by_resort, weights=None, catalog=()):
+        # Builds a ranking from {name: conditions} in one pass
+        ranking = cls(weights, catalog)
+        with ranking.lock:
+            for name, conditions in conditions_by_resort.items():
+                ranking._store(name, conditions)
+            ranking._recompute_maxima()
+            ranking._rescale()
+        return ranking
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def update(self, name, conditions):
+        """
+        Applies one resort's new conditions ({metric: inches, 'region': ...}).
+
+        Returns True if a metric maximum changed and all scores were rescaled.
+        """
+        with self.lock:
+            old = self.values.get(name)
+            if old is not None:
+                self._unindex(name)
+            new = self._store(name, conditions)
+            if self._maxima_changed(old, new):
+                self._rescale()
+                return True
+            self._index(name)
+            return False
+
+    def remove(self, name):
+        # Drops a resort, e.g. when it stops reporting conditions
+        with self.lock:
+            old = self.values.pop(name, None)
+            if old is None:
+                return False
+            self._unindex(name)
+            self.regions.pop(name, None)
+            if self._maxima_changed(old, None):
+                self._rescale()
+            return True
+
+    def top(self, k=None):
+        # Returns [(name, score)] best first, scores normalized so the best is 100
+        with self.lock:
+            entries = self.order if k is None else self.order[:k]
+            best = -self.order[0][0] if self.order else 0.0
+            if best <= 0:
+                return [(name, 0.0) for _, _, name in entries]
+            return [(name, -neg_total / best * 100) for neg_total, _, name in entries]
+
+    def to_list(self, k=None):
+        # Same shape as the list saved to resort_data.json
+        return [{'name': name, 'score': score, 'region': self.regions[name]} for name, score in self.top(k)]
+
+    def _store(self, name, conditions):
+        values = tuple(float(conditions.get(metric, 0)) for metric in METRICS)
+        self.values[name] = values
+        self.regions[name] = conditions.get('region', 'N/A')
+        if name not in self.sequence:
+            self.sequence[name] = next(self.counter)
+        return values
+
+    def _maxima_changed(self, old, new):
+        # Updates per-metric maxima for one resort's change; True if any maximum moved
+        changed = False
+        for j in range(len(METRICS)):
+            old_value = old[j] if old is not None else None
+            new_value = new[j] if new is not None else None
+            if new_value is not None and new_value > self.maxima[j]:
+                self.maxima[j] = new_value
+                self.max_counts[j] = 1
+                changed = True
+                continue
+            if new_value is not None and new_value == self.maxima[j] and old_value != new_value:
+                self.max_counts[j] += 1
+            if old_value is not None and old_value == self.maxima[j] and new_value != old_value:
+                self.max_counts[j] -= 1
+                if self.max_counts[j] <= 0:
+                    self._recompute_maximum(j)
+                    changed = True
+        return changed
+
+    def _recompute_maximum(self, j):
+        column = [values[j] for values in self.values.values()]
+        self.maxima[j] = max(column, default=0.0)
+        self.max_counts[j] = column.count(self.maxima[j]) if column else 0
+
+    def _recompute_maxima(self):
+        for j in range(len(METRICS)):
+            self._recompute_maximum(j)
+
+    def _total(self, values):
+        total = 0.0
+        for j, value in enumerate(values):
+            maximum = self.maxima[j]
+            if maximum > 0:
+                total += self.weights[j] * _np_round(value / maximum * 100, 3)
+        return _np_round(total, TOTAL_DECIMALS)
+
+    def _key(self, name):
+        return (-self.totals[name], self.sequence[name], name)
+
+    def _index(self, name):
+        self.totals[name] = self._total(self.values[name])
+        bisect.insort(self.order, self._key(name))
+
+    def _unindex(self, name):
+        key = self._key(name)
+        position = bisect.bisect_left(self.order, key)
+        del self.order[position]
+        del self.totals[name]
+
+    def _rescale(self):
+        self.rescales += 1
+        self.totals = {name: self._total(values) for name, values in self.values.items()}
+        self.order = sorted(self._key(name) for name in self.values)
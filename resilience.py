@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+# Circuit breaker defaults
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30
+# Adaptive concurrency defaults
+INITIAL_LIMIT = 8
+MIN_LIMIT = 1
+MAX_LIMIT = 32
+BACKOFF_RATIO = 0.5
+LATENCY_TARGET = 2.0
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Stops calling the upstream after repeated failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    every call is refused immediately. Once `reset_timeout` seconds have
+    passed, a single probe is let through (half-open): success closes the
+    circuit, failure opens it again for another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        # True if a call may go ahead now
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def retry_after(self):
+        # Seconds until the next probe may be attempted
+        with self.lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self.lock:
+            if self.state != CLOSED:
+                print("Upstream circuit closed.")
+            self.state = CLOSED
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print("Upstream circuit opened.")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    def release_probe(self):
+        # Frees the half-open probe slot when a call ends without an outcome
+        with self.lock:
+            self.probing = False
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on concurrent upstream calls.
+
+    Each call that succeeds within `latency_target` raises the limit by
+    1/limit, so it grows by about one per round trip of the whole window.
+    A throttle, timeout or server error, or a slow success, multiplies it by
+    `backoff_ratio`. Callers that cannot get a slot within their timeout are
+    shed instead of queueing behind a struggling upstream.
+    """
+
+    def __init__(self, initial=INITIAL_LIMIT, min_limit=MIN_LIMIT, max_limit=MAX_LIMIT,
+                 backoff_ratio=BACKOFF_RATIO, latency_target=LATENCY_TARGET):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, timeout=None):
+        # Takes a slot; returns False if none freed up within `timeout` seconds
+        with self.condition:
+            return self.condition.wait_for(lambda: self.in_flight < int(self.limit), timeout) and self._take()
+
+    def _take(self):
+        self.in_flight += 1
+        return True
+
+    def release(self, ok, latency=None):
+        # Frees a slot and adjusts the limit from the call's outcome
+        with self.condition:
+            self.in_flight -= 1
+            if ok and (latency is None or latency <= self.latency_target):
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif ok is not None:
+                self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+            self.condition.notify_all()
+
+
+class AsyncAdaptiveLimiter(AdaptiveLimiter):
+    """
+    AdaptiveLimiter for coroutines on a single event loop.
+
+    Callers waiting for a slot park on a future instead of a thread, so
+    thousands of them cost only memory. Slots are handed to waiters in
+    arrival order as calls finish; the AIMD rules are unchanged.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiters = deque()
+
+    async def acquire(self, timeout=None):
+        # Takes a slot; returns False if none freed up within `timeout` seconds
+        if self.in_flight < int(self.limit) and not self.waiters:
+            return self._take()
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    def release(self, ok, latency=None):
+        super().release(ok, latency)
+        # A slot passes straight to the next waiter that has not timed out
+        while self.waiters and self.in_flight < int(self.limit):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(self._take())
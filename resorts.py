@@ -444,3 +444,28 @@ resorts = [
     "Yawgoo Valley",
     "Yosemite-Badger Pass Ski Area"
 ]
+
+# Common alternate names, mapped to their entry in the resorts list
+aliases = {
+    "A-Basin": "Arapahoe Basin",
+    "Squaw Valley": "Palisades Tahoe",
+    "Olympic Valley": "Palisades Tahoe",
+    "Alpine Meadows": "Palisades Tahoe - Alpine Meadows",
+    "Mammoth": "Mammoth Mountain",
+    "JHMR": "Jackson Hole",
+    "Jackson Hole Mountain Resort": "Jackson Hole",
+    "Whiteface": "Whiteface Mountain (Lake Placid)",
+    "Steamboat Springs": "Steamboat",
+    "Beech Mountain": "Ski Beech Mountain Resort",
+    "Canyons": "The Canyons",
+    "Bachelor": "Mt Bachelor",
+    "Smugglers Notch": "Smuggler's Notch",
+    "Taos Ski Valley": "Taos",
+    "Heavenly Mountain Resort": "Heavenly",
+    "Northstar": "Northstar at Tahoe",
+    "Kirkwood Mountain Resort": "Kirkwood",
+    "Crested Butte Mountain Resort": "Crested Butte",
+    "Big Sky Resort": "Big Sky",
+    "Killington Resort": "Killington",
+    "Stowe Mountain Resort": "Stowe",
+}
@@ -1,6 +1,12 @@
 import json
 
-def save_resort_data(resort_data):
-    with open('resort_data.json', 'w') as file:
+from locking import atomic_write
+from rankfile import SNAPSHOT_PATH, write_ranking
+
+def save_resort_data(resort_data, path='resort_data.json', snapshot_path=SNAPSHOT_PATH):
+    # Replaces the files atomically so other processes never read a half-written ranking
+    with atomic_write(path) as file:
         json.dump(resort_data, file, indent=4)
+    # The binary snapshot is what the servers load; it is written last so the JSON export is never behind it
+    write_ranking(resort_data, snapshot_path)
     print("Resort data saved successfully.")
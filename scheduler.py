@@ -0,0 +1,152 @@
+import threading
+import time
+
+from locking import FileLock
+from metrics import STAGE_DURATION
+from rankfile import SNAPSHOT_PATH, RankingFile
+from snapshot import Snapshot
+
+# Seconds between background refreshes of the resort ranking
+REFRESH_INTERVAL = 3600
+# Seconds to wait before retrying a failed refresh
+RETRY_INTERVAL = 60
+# Lock file that lets only one process crawl at a time
+REFRESH_LOCK_PATH = 'resort_data.lock'
+# Seconds to wait for another process's crawl before trying again later
+LOCK_WAIT = 300
+
+
+class RefreshScheduler:
+    """
+    Keeps the last good resort ranking Snapshot in memory and refreshes it in the background.
+
+    `refresh` is called on a daemon thread every `interval` seconds and must
+    return the new ranking, or None on failure. Readers always get the last
+    good snapshot immediately; a new one replaces it only once it is fully
+    computed, by swapping a single reference, after which `on_publish` is
+    called with it.
+
+    When several worker processes each run a scheduler, a file lock makes
+    the refresh single-flight: one process crawls while the others keep
+    serving their snapshot, wait for it to finish, and load the ranking it
+    saved instead of crawling again.
+    """
+
+    def __init__(self, refresh, interval=REFRESH_INTERVAL, snapshot_path=SNAPSHOT_PATH,
+                 retry_interval=RETRY_INTERVAL, lock_path=REFRESH_LOCK_PATH, lock_wait=LOCK_WAIT, on_publish=None):
+        self.refresh = refresh
+        self.on_publish = on_publish
+        self.lock_file = FileLock(lock_path)
+        self.lock_wait = lock_wait
+        self.interval = interval
+        self.retry_interval = min(retry_interval, interval)
+        self.snapshot_path = snapshot_path
+        self.snapshot = None
+        self.version = 0
+        self.refreshing = False
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        # Starts the background thread once; safe to call on every request
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is not None:
+                return
+            self._load_saved_snapshot()
+            self.thread = threading.Thread(target=self._run, name="resort-refresh", daemon=True)
+            self.thread.start()
+
+    def current(self):
+        # Returns the last good Snapshot, or None if no refresh has completed yet
+        return self.snapshot
+
+    def age(self):
+        # Seconds since the current snapshot was computed, or None
+        snapshot = self.snapshot
+        return time.time() - snapshot.created_at if snapshot else None
+
+    def _publish(self, resort_data, created_at=None):
+        # Builds the new snapshot fully before swapping the reference
+        self.version += 1
+        with STAGE_DURATION.time(stage='serialize'):
+            snapshot = Snapshot(resort_data, self.version, created_at)
+        self.snapshot = snapshot
+        if self.on_publish is not None:
+            try:
+                self.on_publish(snapshot)
+            except Exception as e:
+                print("Error announcing the new snapshot:", e)
+
+    def trigger(self):
+        # Asks the background thread to refresh now
+        self.wakeup.set()
+
+    def _load_saved_snapshot(self, newer_than=None):
+        # Seeds the scheduler with the ranking saved by a previous run, mapped rather than parsed;
+        # with newer_than, only a ranking created after that time is loaded
+        try:
+            ranking = RankingFile.open(self.snapshot_path)
+        except (FileNotFoundError, ValueError):
+            return None
+        if newer_than is not None and ranking.created_at <= newer_than:
+            return None
+        self._publish(ranking, ranking.created_at)
+        print("Resort data loaded from file.")
+        return ranking
+
+    def _load_fresh_saved_snapshot(self):
+        # Loads the saved ranking if another process refreshed it within the interval
+        newer_than = time.time() - self.interval
+        if self.snapshot is not None:
+            newer_than = max(newer_than, self.snapshot.created_at)
+        return self._load_saved_snapshot(newer_than)
+
+    def _next_delay(self):
+        age = self.age()
+        if age is None:
+            return 0
+        return max(0, self.interval - age)
+
+    def _run(self):
+        while True:
+            delay = self._next_delay()
+            if delay:
+                self.wakeup.wait(delay)
+            self.wakeup.clear()
+            if self._refresh_once() is None:
+                self.wakeup.wait(self.retry_interval)
+                self.wakeup.clear()
+
+    def _refresh_once(self):
+        if not self.lock_file.acquire(blocking=False):
+            # Another process is crawling; keep serving this snapshot and pick up its result
+            print("Another process is refreshing resort data; waiting for it...")
+            if not self.lock_file.acquire(timeout=self.lock_wait):
+                return None
+        try:
+            resort_data = self._load_fresh_saved_snapshot()
+            if resort_data:
+                return resort_data
+            return self._refresh_locked()
+        finally:
+            self.lock_file.release()
+
+    def _refresh_locked(self):
+        self.refreshing = True
+        print("Refreshing resort data in the background...")
+        try:
+            resort_data = self.refresh()
+        except Exception as e:
+            print("Error refreshing resort data:", e)
+            resort_data = None
+        finally:
+            self.refreshing = False
+        if resort_data:
+            self._publish(resort_data)
+            print("Resort data refreshed.")
+        else:
+            print("Resort data refresh failed; keeping the previous snapshot.")
+        return resort_data or None
@@ -0,0 +1,118 @@
+import numpy as np
+
+# Snow condition metrics that contribute to a resort's score, in column order
+METRICS = ('topSnowDepth', 'botSnowDepth', 'freshSnowfall')
+DEFAULT_WEIGHTS = {metric: 1.0 for metric in METRICS}
+# Weighted totals are rounded to this many decimals, so resorts whose totals differ only by
+# floating-point summation order tie (and keep catalog order) however the sum was computed
+TOTAL_DECIMALS = 6
+
+
+def parse_weights(spec):
+    """
+    Parses per-metric weights such as "topSnowDepth=1,freshSnowfall=2".
+
+    Metrics that are not mentioned keep their default weight of 1.
+    """
+    weights = dict(DEFAULT_WEIGHTS)
+    if not spec:
+        return weights
+    for item in spec.split(','):
+        metric, _, value = item.partition('=')
+        metric = metric.strip()
+        if metric not in weights:
+            raise ValueError(f"Unknown scoring metric: {metric}")
+        weights[metric] = float(value)
+    return weights
+
+
+def weight_vector(weights):
+    weights = weights or DEFAULT_WEIGHTS
+    return np.array([weights.get(metric, 0.0) for metric in METRICS], dtype=np.float64)
+
+
+def _scale_to_max(values):
+    # Scales each column so its maximum is 100; all-zero columns stay zero
+    maxima = values.max(axis=0) if len(values) else np.zeros(values.shape[1:])
+    safe = np.where(maxima > 0, maxima, 1.0)
+    return values / safe * 100
+
+
+class ScoreTable:
+    """
+    Columnar snow conditions for a set of resorts.
+
+    `values` is an (n, len(METRICS)) array of depths in inches. Percentile
+    columns are computed once, so re-scoring with different weights or
+    selecting the top k resorts is a handful of vectorized operations.
+
+    Indexing by resort name returns the same shape of record that
+    `process_resort_data` used to build: each metric as a percentage of
+    the best resort, plus the region.
+    """
+
+    def __init__(self, names, regions, values):
+        self.names = list(names)
+        self.regions = list(regions)
+        self.values = np.asarray(values, dtype=np.float64).reshape(len(self.names), len(METRICS))
+        self.index = {name: i for i, name in enumerate(self.names)}
+        # Percentages are rounded to 3 decimals, matching the original string scores
+        self.percentiles = np.round(_scale_to_max(self.values), 3)
+
+    @classmethod
+    def from_records(cls, records):
+        # Builds a table from {name: {metric: inches, ..., 'region': region}}
+        names = list(records)
+        regions = [records[name].get('region', 'N/A') for name in names]
+        values = [[float(records[name].get(metric, 0)) for metric in METRICS] for name in names]
+        return cls(names, regions, np.array(values, dtype=np.float64).reshape(len(names), len(METRICS)))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def keys(self):
+        return list(self.names)
+
+    def __getitem__(self, name):
+        i = self.index[name]
+        record = {metric: float(self.percentiles[i, j]) for j, metric in enumerate(METRICS)}
+        record['region'] = self.regions[i]
+        return record
+
+    def scores(self, weights=None):
+        # Weighted total per resort, normalized so the best resort scores 100
+        totals = np.round(self.percentiles @ weight_vector(weights), TOTAL_DECIMALS)
+        if not len(totals):
+            return totals
+        best = totals.max()
+        return totals / best * 100 if best > 0 else np.zeros_like(totals)
+
+    def ranking(self, weights=None, k=None):
+        """
+        Returns row indices ordered by descending score.
+
+        Ties keep catalog order. With `k`, only the top k rows are selected
+        (via a partial partition) and sorted.
+        """
+        scores = self.scores(weights)
+        n = len(scores)
+        if k is None or k >= n:
+            return np.lexsort((np.arange(n), -scores)), scores
+        if k <= 0:
+            return np.array([], dtype=np.intp), scores
+        kth = scores[np.argpartition(-scores, k - 1)[:k]].min()
+        above = np.flatnonzero(scores > kth)
+        tied = np.flatnonzero(scores == kth)[:k - len(above)]
+        rows = np.concatenate([above, tied])
+        return rows[np.lexsort((rows, -scores[rows]))], scores
+
+    def top(self, weights=None, k=None):
+        # Returns [(name, score)] for the best k resorts (all when k is None)
+        rows, scores = self.ranking(weights, k)
+        return [(self.names[i], float(scores[i])) for i in rows]
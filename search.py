@@ -1,13 +1,4 @@
-import requests
-from urllib.parse import quote_plus
-import os
-from dotenv import load_dotenv
-
-# Load environment variables from a .env file for secure access to sensitive data
-load_dotenv(dotenv_path='rapid.env')
-
-# Retrieve the API key from environment variables for authentication
-api_key = os.getenv("API_KEY")
+from upstream import UpstreamError, get_client
 
 def search_resort(resort_name):
     """
@@ -25,25 +16,11 @@ def search_resort(resort_name):
             print("Error: Resort name cannot be empty.")
             return None
 
-        # Prepare the resort name for inclusion in the URL by encoding special characters
-        encoded_resort_name = quote_plus(resort_name)
-        url = f"https://ski-resort-forecast.p.rapidapi.com/{encoded_resort_name}/snowConditions"
-
-        # Set up the request headers with the necessary API credentials
-        headers = {
-            "X-RapidAPI-Key": api_key,  # Authentication key
-            "X-RapidAPI-Host": "ski-resort-forecast.p.rapidapi.com"  # API host
-        }
+        # The shared upstream client encodes the name, authenticates, pools
+        # connections and retries transient failures
+        return get_client().snow_conditions(resort_name)
 
-        # Execute the GET request to retrieve snow conditions data from the API
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Ensure a successful response (2XX status code)
-
-        # Convert the JSON response into a Python dictionary and return it
-        data = response.json()
-        return data
-
-    except requests.exceptions.RequestException as e:
+    except UpstreamError as e:
         # Log any errors encountered during the request to the console
         print("Error fetching data:", e)
         return None
@@ -60,4 +37,3 @@ if __name__ == "__main__":
     else:
         # Data retrieval failed or no data available
         print("No data found for the specified resort.")
-
@@ -0,0 +1,241 @@
+# Local stand-in for the ski-resort-forecast RapidAPI service.
+#
+# Serves recorded or synthetic snowConditions payloads with configurable
+# latency, error rate and quota behaviour so the fetch pipeline can be
+# exercised and benchmarked without touching the real API.
+#
+# Usage:
+#   python simulator.py serve --port 8089 --latency 0.15 --error-rate 0.02 --quota 20
+#   python simulator.py record recordings.json
+#   UPSTREAM_URL=http://127.0.0.1:8089 python app.py fetch_data
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote_plus, urlsplit
+
+from resorts import resorts
+
+REGIONS = ["Colorado", "Utah", "Wyoming", "Montana", "Idaho", "California", "Oregon",
+           "Washington", "Alaska", "Vermont", "New Hampshire", "Maine", "New York",
+           "Michigan", "Minnesota", "Wisconsin", "Pennsylvania", "West Virginia", "New Mexico"]
+
+
+def synthetic_payload(resort):
+    # Builds a deterministic payload for a resort, seeded by its name
+    rng = random.Random(resort)
+    top = rng.randint(0, 140)
+    bot = rng.randint(0, top) if top else 0
+    fresh = rng.choice([0, 0, 0, rng.randint(1, 24)])
+    region = rng.choice(REGIONS)
+    last_snow = (date.today() - timedelta(days=rng.randint(0, 20))).strftime("%d %b %Y")
+
+    def unit_payload(unit):
+        def depth(value):
+            if unit == "cm":
+                return f"{round(value / 0.393701)}cm"
+            return f"{value}in"
+        return {
+            "basicInfo": {"name": resort, "region": region, "url": ""},
+            "topSnowDepth": depth(top),
+            "botSnowDepth": depth(bot),
+            "freshSnowfall": depth(fresh) if fresh else None,
+            "lastSnowfallDate": last_snow,
+        }
+
+    return {"imperial": unit_payload("in"), "metric": unit_payload("cm")}
+
+
+class QuotaWindow:
+    # Fixed one-second window quota that mirrors RapidAPI's rate limit headers
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.window_start = time.monotonic()
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def take(self):
+        # Returns (allowed, remaining, seconds until reset)
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.window_start = now
+                self.used = 0
+            reset = max(0.0, 1 - (now - self.window_start))
+            if self.used >= self.limit:
+                return False, 0, reset
+            self.used += 1
+            return True, self.limit - self.used, reset
+
+
+class Simulator:
+    """
+    Upstream behaviour shared by all handler threads.
+
+    `latency` is the mean response delay in seconds (with +/- `jitter`),
+    `error_rate` the fraction of requests answered with a 500, and
+    `throttle_rate` the fraction answered with a 429. `quota` enforces a
+    requests-per-second limit and reports it via X-RateLimit headers.
+    """
+
+    def __init__(self, recordings=None, latency=0.0, jitter=0.0, error_rate=0.0,
+                 throttle_rate=0.0, quota=None, retry_after=1, seed=None):
+        self.recordings = recordings or {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.quota = QuotaWindow(quota) if quota else None
+        self.retry_after = retry_after
+        self.known = set(resorts) | set(self.recordings)
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.requests_served = 0
+
+    def _roll(self):
+        with self.rng_lock:
+            return self.rng.random(), self.rng.uniform(-self.jitter, self.jitter)
+
+    def respond(self, resort, units):
+        # Returns (status, headers, body) for a snowConditions request
+        self.requests_served += 1
+        roll, jitter = self._roll()
+        headers = {}
+        if self.quota is not None:
+            allowed, remaining, reset = self.quota.take()
+            headers["X-RateLimit-Requests-Limit"] = str(self.quota.limit)
+            headers["X-RateLimit-Requests-Remaining"] = str(remaining)
+            headers["X-RateLimit-Requests-Reset"] = f"{reset:.3f}"
+            if not allowed:
+                headers["Retry-After"] = str(self.retry_after)
+                return 429, headers, {"message": "Too many requests"}
+
+        delay = max(0.0, self.latency + jitter)
+        if delay:
+            time.sleep(delay)
+
+        if roll < self.throttle_rate:
+            headers["Retry-After"] = str(self.retry_after)
+            return 429, headers, {"message": "Too many requests"}
+        if roll < self.throttle_rate + self.error_rate:
+            return 500, headers, {"message": "Simulated upstream error"}
+        if resort not in self.known:
+            return 404, headers, {"message": f"Resort {resort} not found"}
+
+        payload = self.recordings.get(resort) or synthetic_payload(resort)
+        if units == "i" and "imperial" in payload:
+            payload = payload["imperial"]
+        elif units == "m" and "metric" in payload:
+            payload = payload["metric"]
+        return 200, headers, payload
+
+
+def make_handler(simulator):
+    class SimulatorHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+        # Headers and body go out in separate writes; with Nagle on, each response
+        # on a kept-alive connection stalls ~40ms waiting for a delayed ACK
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            segments = [segment for segment in parts.path.split("/") if segment]
+            if len(segments) != 2 or segments[1] != "snowConditions":
+                status, headers, body = 404, {}, {"message": "Endpoint not found"}
+            else:
+                units = parse_qs(parts.query).get("units", [None])[0]
+                status, headers, body = simulator.respond(unquote_plus(segments[0]), units)
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output readable
+
+    return SimulatorHandler
+
+
+class SimulatorServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # Avoid SYN retries when benchmarks open many connections at once
+
+
+def start_simulator(host="127.0.0.1", port=0, **config):
+    """
+    Starts the simulator on a background thread.
+
+    Returns the running server; its base URL is available as `server.url`
+    and it is stopped with `server.shutdown()`.
+    """
+    simulator = Simulator(**config)
+    server = SimulatorServer((host, port), make_handler(simulator))
+    server.simulator = simulator
+    server.url = f"http://{host}:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def load_recordings(path):
+    if not path:
+        return {}
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def record(path, resort_names):
+    # Captures real upstream payloads so they can be replayed offline
+    from main import fetch_resort_data_concurrently
+    resort_data = fetch_resort_data_concurrently(resort_names)
+    recordings = {name: data for name, data in resort_data.items() if data is not None}
+    with open(path, 'w') as file:
+        json.dump(recordings, file, indent=4)
+    print(f"Recorded {len(recordings)} of {len(resort_names)} resorts to {path}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local ski-resort-forecast API simulator")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="Serve recorded or synthetic payloads")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8089)
+    serve.add_argument("--recordings", help="JSON file written by the record command")
+    serve.add_argument("--latency", type=float, default=0.0, help="Mean response delay in seconds")
+    serve.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- delay jitter in seconds")
+    serve.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    serve.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    serve.add_argument("--quota", type=int, help="Requests allowed per second before answering 429")
+    serve.add_argument("--seed", type=int)
+
+    rec = subparsers.add_parser("record", help="Record real upstream payloads for replay")
+    rec.add_argument("path")
+    rec.add_argument("--limit", type=int, help="Only record the first N resorts")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.path, resorts[:args.limit] if args.limit else resorts)
+        return
+
+    server = start_simulator(args.host, args.port, recordings=load_recordings(args.recordings),
+                             latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                             throttle_rate=args.throttle_rate, quota=args.quota, seed=args.seed)
+    print(f"Simulator listening on {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import calendar
+import gzip
+import hashlib
+from email.utils import formatdate
+
+import numpy as np
+
+from cache import TTLCache
+from rankfile import RankingFile
+
+try:
+    import brotli  # In requirements.txt; without it only gzip is offered
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+# Number of distinct page queries kept per snapshot
+PAGE_CACHE_SIZE = 256
+
+
+def encode_variants(body):
+    # Precompresses a response body; returns {content_encoding: bytes}
+    encoded = {}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        encoded['gzip'] = gzip.compress(body, compresslevel=9)
+        if brotli is not None:
+            encoded['br'] = brotli.compress(body)
+    return encoded
+
+
+class Body:
+    # A serialized response with its compressed variants and validator
+
+    def __init__(self, body, etag, compress=True):
+        self.body = body
+        self.encoded = encode_variants(body) if compress else {}  # Images and the like are already compressed
+        self.etag = etag
+
+    def body_for(self, accept_encoding):
+        # Picks the smallest variant the client accepts; returns (body, content_encoding)
+        accepted = {token.split(';')[0].strip().lower() for token in (accept_encoding or '').split(',')}
+        for encoding in ('br', 'gzip'):
+            if encoding in accepted and encoding in self.encoded:
+                return self.encoded[encoding], encoding
+        return self.body, None
+
+
+class Snapshot:
+    """
+    Immutable, versioned resort ranking with its response bodies precomputed.
+
+    The ranking itself is a RankingFile, normally memory-mapped from the
+    binary snapshot so worker processes share it rather than each holding a
+    parsed copy. The full JSON body and its compressed variants are built
+    once per refresh so serving /api/resorts costs no parsing or
+    serialization per request. Every entry's JSON already sits in the file,
+    and per-region rank lists are built up front from the record table, so
+    pages, region views and score cut-offs are answered by slicing and
+    joining bytes rather than scanning the ranking.
+    """
+
+    def __init__(self, ranking, version, created_at=None):
+        if not isinstance(ranking, RankingFile):
+            ranking = RankingFile.from_ranking(ranking, created_at)
+        self.data = ranking
+        self.version = version
+        self.created_at = created_at if created_at is not None else ranking.created_at
+        self.hash = ranking.hash
+        self.full = Body(bytes(ranking.body()), '"' + self.hash + '"')
+
+        # Rank-ordered row indexes per region, with negated scores for bisecting
+        region_ids = ranking.region_ids
+        keys = {}
+        for region_id, region in ranking.regions().items():
+            keys.setdefault(region_key(region), []).append(region_id)
+        self.region_rows = {key: np.flatnonzero(np.isin(region_ids, ids)) for key, ids in keys.items()}
+        self.all_rows = np.arange(len(ranking))
+        self.neg_scores = {None: -ranking.scores}
+        for region, rows in self.region_rows.items():
+            self.neg_scores[region] = -ranking.scores[rows]
+        self.pages = TTLCache(maxsize=PAGE_CACHE_SIZE, ttl=float('inf'), name='snapshot_page')
+
+        # HTTP dates have one-second resolution
+        self.last_modified_ts = int(self.created_at)
+        self.last_modified = formatdate(self.last_modified_ts, usegmt=True)
+
+    @property
+    def body(self):
+        return self.full.body
+
+    def page(self, limit=None, offset=0, region=None, min_score=None):
+        """
+        Returns (Body, total) for a slice of the ranking.
+
+        `region` filters case-insensitively, `min_score` keeps resorts scoring
+        at least that much, and `offset`/`limit` select a window of what is
+        left. `total` is the number of matches before paging.
+        """
+        if limit is None and not offset and region is None and min_score is None:
+            return self.full, len(self.data)
+        key = (limit, offset, region_key(region) if region is not None else None, min_score)
+        return self.pages.get_or_load(key, lambda: self._build_page(*key))
+
+    def _build_page(self, limit, offset, region, min_score):
+        rows = self.all_rows if region is None else self.region_rows.get(region, self.all_rows[:0])
+        total = len(rows)
+        if min_score is not None and total:
+            total = int(np.searchsorted(self.neg_scores[region], -min_score, side='right'))
+        end = total if limit is None else min(total, offset + limit)
+        body = b'[' + b','.join(self.data.row(i) for i in rows[offset:end]) + b']'
+        query = repr((limit, offset, region, min_score)).encode('utf-8')
+        etag = '"' + self.hash + '-' + hashlib.sha256(query).hexdigest()[:8] + '"'
+        return Body(body, etag), total
+
+    def not_modified(self, etag, if_none_match, if_modified_since):
+        # True when the client's cached copy is still current
+        if if_none_match:
+            return if_none_match.contains_weak(etag.strip('"'))
+        if if_modified_since is not None:
+            return calendar.timegm(if_modified_since.utctimetuple()) >= self.last_modified_ts
+        return False
+
+
+def region_key(region):
+    return (region or 'N/A').casefold()
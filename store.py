@@ -0,0 +1,140 @@
+import json
+import sqlite3
+import threading
+import time
+
+# Default location of the raw payload database
+STORE_PATH = 'resort_payloads.db'
+# Seconds a stored payload stays fresh unless a resort has its own budget
+FRESHNESS_BUDGET = 3000
+# Days of per-resort search counts kept for refresh planning
+SEARCH_HISTORY_DAYS = 30
+SECONDS_PER_DAY = 86400
+# Days of per-minute upstream call counts kept for the daily API budget
+API_CALL_HISTORY_DAYS = 2
+
+
+class PayloadStore:
+    """
+    SQLite store of raw snowConditions payloads, one row per resort.
+
+    The database runs in WAL mode so readers are never blocked by the
+    refresh writing new payloads. Each row records when it was fetched and
+    an optional per-resort freshness budget; `stale` uses them to decide
+    what a refresh needs to refetch. Failed fetches are never written, so
+    the last good payload is kept. Daily search counts per resort are kept
+    alongside so the refresh planner can favour resorts people look up, as
+    are per-minute counts of upstream calls so it can stay within the daily
+    API budget.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.local = threading.local()
+        with self.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS payloads (
+                    resort TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    max_age REAL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS searches (
+                    resort TEXT NOT NULL,
+                    day INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (resort, day)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS api_calls (
+                    minute INTEGER PRIMARY KEY,
+                    count INTEGER NOT NULL
+                )
+            """)
+
+    def connection(self):
+        # One connection per thread; sqlite3 connections are not shareable
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def put(self, resort, payload, fetched_at=None):
+        self.put_many({resort: payload}, fetched_at)
+
+    def put_many(self, payloads, fetched_at=None):
+        # Stores {resort: payload}, skipping failed (None) fetches
+        fetched_at = fetched_at if fetched_at is not None else time.time()
+        rows = [(resort, json.dumps(payload), fetched_at) for resort, payload in payloads.items() if payload is not None]
+        with self.connection() as conn:
+            conn.executemany("""
+                INSERT INTO payloads (resort, payload, fetched_at) VALUES (?, ?, ?)
+                ON CONFLICT(resort) DO UPDATE SET payload = excluded.payload, fetched_at = excluded.fetched_at
+            """, rows)
+        return len(rows)
+
+    def get(self, resort):
+        row = self.connection().execute("SELECT payload FROM payloads WHERE resort = ?", (resort,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_all(self, resorts=None):
+        # Returns {resort: payload} in catalog order, None for resorts never fetched
+        rows = self.connection().execute("SELECT resort, payload FROM payloads").fetchall()
+        payloads = {resort: json.loads(payload) for resort, payload in rows}
+        if resorts is None:
+            return payloads
+        return {resort: payloads.get(resort) for resort in resorts}
+
+    def fetched_at(self):
+        # Returns {resort: fetch timestamp}
+        return dict(self.connection().execute("SELECT resort, fetched_at FROM payloads").fetchall())
+
+    def set_budgets(self, budgets):
+        # Sets per-resort freshness budgets in seconds ({resort: seconds or None})
+        with self.connection() as conn:
+            conn.executemany("UPDATE payloads SET max_age = ? WHERE resort = ?",
+                             [(max_age, resort) for resort, max_age in budgets.items()])
+
+    def stale(self, resorts, max_age=FRESHNESS_BUDGET, now=None):
+        # Resorts that are missing or older than their freshness budget, in catalog order
+        now = now if now is not None else time.time()
+        fresh = {resort for (resort,) in self.connection().execute(
+            "SELECT resort FROM payloads WHERE fetched_at > ? - COALESCE(max_age, ?)", (now, max_age))}
+        return [resort for resort in dict.fromkeys(resorts) if resort not in fresh]
+
+    def add_searches(self, counts, now=None):
+        # Adds {resort: searches} to today's counts and drops counts past SEARCH_HISTORY_DAYS
+        day = int((now if now is not None else time.time()) // SECONDS_PER_DAY)
+        with self.connection() as conn:
+            conn.executemany("""
+                INSERT INTO searches (resort, day, count) VALUES (?, ?, ?)
+                ON CONFLICT(resort, day) DO UPDATE SET count = count + excluded.count
+            """, [(resort, day, count) for resort, count in counts.items()])
+            conn.execute("DELETE FROM searches WHERE day <= ?", (day - SEARCH_HISTORY_DAYS,))
+
+    def search_counts(self, days=7, now=None):
+        # Returns {resort: searches over the last `days` days, today included}
+        day = int((now if now is not None else time.time()) // SECONDS_PER_DAY)
+        return dict(self.connection().execute(
+            "SELECT resort, SUM(count) FROM searches WHERE day > ? GROUP BY resort", (day - days,)).fetchall())
+
+    def add_api_calls(self, count, now=None):
+        # Adds upstream calls to the current minute and drops counts past API_CALL_HISTORY_DAYS
+        minute = int((now if now is not None else time.time()) // 60)
+        with self.connection() as conn:
+            conn.execute("""
+                INSERT INTO api_calls (minute, count) VALUES (?, ?)
+                ON CONFLICT(minute) DO UPDATE SET count = count + excluded.count
+            """, (minute, count))
+            conn.execute("DELETE FROM api_calls WHERE minute <= ?", (minute - API_CALL_HISTORY_DAYS * SECONDS_PER_DAY // 60,))
+
+    def api_calls_since(self, since):
+        # Upstream calls made since a timestamp, to the minute, by every process sharing the store
+        row = self.connection().execute("SELECT SUM(count) FROM api_calls WHERE minute >= ?", (int(since // 60),)).fetchone()
+        return row[0] or 0
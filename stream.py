@@ -0,0 +1,171 @@
+import asyncio
+import collections
+import json
+import threading
+from contextlib import contextmanager
+
+# Diffs kept so a reconnecting client can catch up without the whole ranking
+DIFF_HISTORY = 16
+# Seconds between keep-alive comments on an idle stream, under common proxy idle timeouts
+KEEPALIVE_INTERVAL = 25
+# Milliseconds a disconnected EventSource waits before reconnecting
+RETRY_MS = 5000
+
+RETRY_FRAME = f"retry: {RETRY_MS}\n\n".encode('ascii')
+KEEPALIVE_FRAME = b': keep-alive\n\n'
+
+
+def sse_frame(event, data, event_id):
+    # One Server-Sent Events message; `data` must be a single line, as compact JSON is
+    return b'id: ' + event_id.encode('ascii') + b'\nevent: ' + event.encode('ascii') + b'\ndata: ' + data + b'\n\n'
+
+
+def ranking_positions(snapshot):
+    # {name: [rank, score, region]} for every resort in a snapshot, rank 0-based
+    return {resort['name']: [rank, resort['score'], resort['region']] for rank, resort in enumerate(snapshot.data)}
+
+
+def ranking_window(positions, limit):
+    # The top `limit` resorts of a ranking from `ranking_positions`; all of it when `limit` is None
+    if limit is None:
+        return positions
+    return {name: position for name, position in positions.items() if position[0] < limit}
+
+
+def ranking_diff(previous, current):
+    """
+    Compact change set between two rankings from `ranking_positions`.
+
+    `changed` lists [name, rank, score, region] for every resort that is
+    new or whose rank or score moved, `removed` the names that dropped out,
+    and `total` the new length, which is all a client needs to patch its
+    copy of the list.
+    """
+    changed = [[name, *position] for name, position in current.items() if previous.get(name) != position]
+    removed = [name for name in previous if name not in current]
+    return {'changed': changed, 'removed': removed, 'total': len(current)}
+
+
+class RankingStream:
+    """
+    Fans ranking changes out to Server-Sent Events subscribers.
+
+    `publish` is called once per new Snapshot. Subscribers may ask for just
+    the top `limit` resorts, which is all the page shows, and are then sent
+    that window and diffs of it. Each frame is encoded once per window and
+    shared by every subscriber of that window, so waking any number of
+    them costs only the writes. Events carry the snapshot's content hash as
+    their id, which is the same in every worker process, so a client
+    reconnecting with Last-Event-ID to any of them is sent just the diffs
+    it missed, or the current window if those are gone.
+
+    Threaded servers block in `wait`; asyncio servers await `wait_async`,
+    where an idle subscriber is one suspended coroutine and every
+    subscriber on a loop shares one Event.
+    """
+
+    def __init__(self, history=DIFF_HISTORY):
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.snapshot = None
+        self.versions = collections.deque(maxlen=history + 1)  # (hash, positions), oldest first
+        self.frames = {}  # (from hash or None for a full window, to hash, limit) -> frame
+        self.loop_events = {}  # event loop -> asyncio.Event shared by its waiting subscribers
+        self.subscribers = 0
+
+    def publish(self, snapshot):
+        positions = ranking_positions(snapshot)
+        previous = self.snapshot
+        with self.lock:
+            if previous is not None and previous.hash == snapshot.hash:
+                self.snapshot = snapshot
+                return
+            self.snapshot = snapshot
+            self.versions.append((snapshot.hash, positions))
+            # Frames into versions that have left the history can no longer be asked for
+            known = {version for version, _ in self.versions}
+            self.frames = {key: frame for key, frame in self.frames.items() if key[0] in known}
+            self.changed.notify_all()
+            loops = list(self.loop_events)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._wake, loop)
+            except RuntimeError:  # The loop has been closed
+                with self.lock:
+                    self.loop_events.pop(loop, None)
+
+    def _wake(self, loop):
+        # Runs on `loop`; releases every subscriber waiting there
+        with self.lock:
+            event = self.loop_events.pop(loop, None)
+        if event is not None:
+            event.set()
+
+    def _frames_since(self, last_id, limit=None):
+        # Frames that bring a client holding `last_id` up to date; returns (frames, current id)
+        snapshot = self.snapshot
+        if snapshot is None or last_id == snapshot.hash:
+            return [], last_id
+        if limit is not None and limit >= len(snapshot.data):
+            limit = None  # One set of frames for every window that covers the whole ranking
+        hashes = [version for version, _ in self.versions]
+        if last_id in hashes:
+            start = hashes.index(last_id)
+            return [self._diff_frame(i, limit) for i in range(start, len(hashes) - 1)], snapshot.hash
+        return [self._window_frame(snapshot, limit)], snapshot.hash
+
+    def _diff_frame(self, index, limit):
+        # The diff from versions[index] to the next version, restricted to the top `limit`
+        from_hash, previous = self.versions[index]
+        to_hash, current = self.versions[index + 1]
+        key = (from_hash, to_hash, limit)
+        frame = self.frames.get(key)
+        if frame is None:
+            diff = ranking_diff(ranking_window(previous, limit), ranking_window(current, limit))
+            data = json.dumps(diff, separators=(',', ':')).encode('utf-8')
+            frame = self.frames[key] = sse_frame('diff', data, to_hash)
+        return frame
+
+    def _window_frame(self, snapshot, limit):
+        # The top `limit` resorts of the current snapshot, the same bytes /api/resorts?limit= serves
+        key = (None, snapshot.hash, limit)
+        frame = self.frames.get(key)
+        if frame is None:
+            frame = self.frames[key] = sse_frame('snapshot', snapshot.page(limit)[0].body, snapshot.hash)
+        return frame
+
+    def wait(self, last_id, timeout=KEEPALIVE_INTERVAL, limit=None):
+        # Blocks until there is something newer than `last_id` or the timeout passes
+        with self.lock:
+            frames, current = self._frames_since(last_id, limit)
+            if not frames:
+                self.changed.wait(timeout)
+                frames, current = self._frames_since(last_id, limit)
+            return frames, current
+
+    async def wait_async(self, last_id, timeout=KEEPALIVE_INTERVAL, limit=None):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            frames, current = self._frames_since(last_id, limit)
+            if frames:
+                return frames, current
+            event = self.loop_events.get(loop)
+            if event is None:
+                event = self.loop_events[loop] = asyncio.Event()
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self.lock:
+            return self._frames_since(last_id, limit)
+
+    @contextmanager
+    def subscribed(self):
+        # Counts an open stream for the subscriber gauge
+        with self.lock:
+            self.subscribers += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.subscribers -= 1
@@ -0,0 +1,117 @@
+import bisect
+import re
+from collections import defaultdict
+
+# Abbreviations folded to one spelling so "Mt Hood" and "Mount Hood" match
+TOKEN_SYNONYMS = {"mt": "mount", "st": "saint"}
+# Minimum trigram similarity for a fuzzy suggestion and for resolving a query
+SUGGEST_THRESHOLD = 0.3
+RESOLVE_THRESHOLD = 0.55
+RESOLVE_MARGIN = 0.05
+
+
+def normalize_name(name):
+    # Lowercase, drop punctuation and fold abbreviations
+    tokens = re.sub(r"[^0-9a-z]+", " ", name.casefold()).split()
+    return " ".join(TOKEN_SYNONYMS.get(token, token) for token in tokens)
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ResortIndex:
+    """
+    In-memory name index for autocomplete and query resolution.
+
+    Prefix lookups bisect a sorted list of every word-boundary suffix of each
+    name and alias, so "basin" finds "Arapahoe Basin". Fuzzy lookups score
+    candidates sharing trigrams with the query, which tolerates typos.
+    """
+
+    def __init__(self, names, aliases=None):
+        self.names = list(dict.fromkeys(names))
+        self.exact = {}           # normalized name or alias -> canonical name
+        self.terms = []           # sorted (term, full-name match first, canonical)
+        self.grams = defaultdict(set)  # trigram -> normalized keys
+        self.gram_counts = {}
+
+        entries = [(name, name) for name in self.names]
+        entries += [(alias, canonical) for alias, canonical in (aliases or {}).items() if canonical in self.names]
+        terms = set()
+        for label, canonical in entries:
+            key = normalize_name(label)
+            if not key:
+                continue
+            self.exact.setdefault(key, canonical)
+            words = key.split()
+            for i in range(len(words)):
+                terms.add((" ".join(words[i:]), 0 if i == 0 else 1, canonical))
+            grams = trigrams(key)
+            self.gram_counts[key] = len(grams)
+            for gram in grams:
+                self.grams[gram].add(key)
+        self.terms = sorted(terms)
+        self.term_keys = [term for term, _, _ in self.terms]
+
+    def prefix(self, query, limit=10):
+        # Names with a word starting with the query, whole-name prefixes first
+        key = normalize_name(query)
+        if not key:
+            return []
+        start = bisect.bisect_left(self.term_keys, key)
+        full, partial = [], []
+        for term, rank, canonical in self.terms[start:]:
+            if not term.startswith(key):
+                break
+            (full if rank == 0 else partial).append(canonical)
+        return list(dict.fromkeys(full + partial))[:limit]
+
+    def fuzzy(self, query, limit=10, threshold=SUGGEST_THRESHOLD):
+        # Returns [(canonical, similarity)] by Dice coefficient over trigrams
+        key = normalize_name(query)
+        if not key:
+            return []
+        query_grams = trigrams(key)
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for candidate in self.grams.get(gram, ()):
+                shared[candidate] += 1
+        best = {}
+        for candidate, count in shared.items():
+            score = 2 * count / (len(query_grams) + self.gram_counts[candidate])
+            canonical = self.exact[candidate]
+            if score >= threshold and score > best.get(canonical, 0):
+                best[canonical] = score
+        return sorted(best.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def suggest(self, query, limit=10):
+        # Prefix matches first, then close fuzzy matches
+        matches = self.prefix(query, limit)
+        if len(matches) < limit:
+            matches += [name for name, _ in self.fuzzy(query, limit) if name not in matches]
+        return matches[:limit]
+
+    def resolve(self, query):
+        """
+        Maps a user query to a canonical resort name, or None.
+
+        Exact names and aliases win, then a single prefix match. A query that
+        prefixes several names is ambiguous. Otherwise the best fuzzy match is
+        used if it is close enough and clearly ahead of the runner-up.
+        """
+        key = normalize_name(query)
+        if not key:
+            return None
+        if key in self.exact:
+            return self.exact[key]
+        prefixed = self.prefix(query, limit=2)
+        if prefixed:
+            return prefixed[0] if len(prefixed) == 1 else None
+        candidates = self.fuzzy(query, limit=2, threshold=RESOLVE_THRESHOLD)
+        if not candidates:
+            return None
+        if len(candidates) > 1 and candidates[0][1] - candidates[1][1] < RESOLVE_MARGIN:
+            return None
+        return candidates[0][0]
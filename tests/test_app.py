@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+import app
+from cache import TTLCache
+from snapshot import Snapshot
+from upstream import UpstreamUnavailable
+
+RANKING = [
+    {'name': 'Alta', 'score': 100.0, 'region': 'Utah'},
+    {'name': 'Vail', 'score': 91.5, 'region': 'Colorado'},
+    {'name': 'Snowbird', 'score': 88.25, 'region': 'Utah'},
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Serve a fixed snapshot without starting the background refresh
+    monkeypatch.setattr(app.refresh_scheduler, 'start', lambda: None)
+    monkeypatch.setattr(app.refresh_scheduler, 'snapshot', Snapshot(RANKING, version=1, created_at=1700000000))
+    return app.app.test_client()
+
+
+def test_resorts_page_with_total_count(client):
+    response = client.get('/api/resorts?limit=1&offset=1&region=utah')
+    assert response.status_code == 200
+    assert response.get_json() == [RANKING[2]]
+    assert response.headers['X-Total-Count'] == '2'
+
+
+def test_unchanged_page_revalidates_with_304(client):
+    etag = client.get('/api/resorts?limit=2').headers['ETag']
+    response = client.get('/api/resorts?limit=2', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert client.get('/api/resorts?limit=3', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_min_score_filters_the_ranking(client):
+    response = client.get('/api/resorts?min_score=90')
+    assert [resort['name'] for resort in response.get_json()] == ['Alta', 'Vail']
+    assert response.headers['X-Total-Count'] == '2'
+
+
+@pytest.mark.parametrize('query', ['min_score=nan', 'min_score=inf', 'min_score=-1', 'min_score=1e999',
+                                   'limit=-1', 'offset=x', 'limit=2.5'])
+def test_invalid_paging_parameters_are_rejected(client, query):
+    response = client.get('/api/resorts?' + query)
+    assert response.status_code == 400
+    assert 'error' in json.loads(response.data)
+
+
+def test_no_snapshot_yet_asks_clients_to_retry(client, monkeypatch):
+    monkeypatch.setattr(app.refresh_scheduler, 'snapshot', None)
+    response = client.get('/api/resorts')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    # Answers searches from a dict instead of the API, with an empty cache and no search counting
+    conditions = {'Alta': {'resort': 'Alta'}, 'Vail': {'resort': 'Vail'}, 'Jackson Hole': {'resort': 'Jackson Hole'}}
+    calls = []
+
+    def fetch(name):
+        calls.append(name)
+        if name not in conditions:
+            raise UpstreamUnavailable("Upstream returned 500", 500)
+        return conditions[name]
+
+    monkeypatch.setattr(app, 'fetch_resort_conditions', fetch)
+    monkeypatch.setattr(app, 'search_cache', TTLCache(maxsize=16, ttl=60))
+    monkeypatch.setattr(app.search_counter, 'record', lambda name: None)
+    return calls
+
+
+def test_batch_search_resolves_and_dedupes_queries(client, upstream):
+    response = client.get('/api/search/batch?resort=Alta&resorts=vail,ALTA,zzzz')
+    assert response.status_code == 200
+    assert response.get_json() == [
+        {'query': 'Alta', 'resort': 'Alta', 'data': {'resort': 'Alta'}},
+        {'query': 'vail', 'resort': 'Vail', 'data': {'resort': 'Vail'}},
+        {'query': 'ALTA', 'resort': 'Alta', 'data': {'resort': 'Alta'}},
+        {'query': 'zzzz', 'error': "No resort found matching 'zzzz'"},
+    ]
+    assert sorted(upstream) == ['Alta', 'Vail']
+
+
+def test_batch_search_accepts_a_json_body_and_reports_failures(client, upstream):
+    response = client.post('/api/search/batch', json={'resorts': ['jakson hole', 'Mammoth']})
+    assert response.get_json() == [
+        {'query': 'jakson hole', 'resort': 'Jackson Hole', 'data': {'resort': 'Jackson Hole'}},
+        {'query': 'Mammoth', 'resort': 'Mammoth Mountain', 'error': 'Upstream returned 500', 'status': 502},
+    ]
+
+
+def test_batch_search_streams_one_line_per_query(client, upstream):
+    response = client.get('/api/search/batch?resorts=zzzz,Alta,Vail', headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert lines[0] == {'query': 'zzzz', 'error': "No resort found matching 'zzzz'"}
+    assert sorted(line['resort'] for line in lines[1:]) == ['Alta', 'Vail']
+
+
+def test_batch_search_answers_cached_resorts_without_a_lookup(client, upstream):
+    client.get('/api/search/batch?resorts=Alta')
+    client.get('/api/search/batch?resorts=Alta,alta')
+    assert upstream == ['Alta']
+
+
+@pytest.mark.parametrize('body', [None, {}, {'resorts': 'Alta'}, {'resorts': [1, 2]}, {'resorts': [' ']},
+                                  {'resorts': ['Alta'] * (app.BATCH_SEARCH_LIMIT + 1)}])
+def test_invalid_batch_bodies_are_rejected(client, upstream, body):
+    response = client.post('/api/search/batch', json=body) if body is not None else client.post('/api/search/batch', data='{')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert upstream == []
+
+
+def test_batch_search_needs_at_least_one_resort(client, upstream):
+    assert client.get('/api/search/batch').status_code == 400
+    assert client.get('/api/search/batch?resorts=,,').status_code == 400
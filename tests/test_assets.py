@@ -0,0 +1,57 @@
+import gzip
+
+import pytest
+
+from assets import IMMUTABLE_CACHE_CONTROL, PLAIN_CACHE_CONTROL, AssetManifest
+
+FILES = ('logo.png', 'styles.css', 'main.js')
+CSS = 'body { background: url(logo.png); }\n.a { background: url( "missing.png" ); }\n.b { background: url(\'logo.png\'); }\n'
+
+
+def build(directory, png=b'\x89PNG first', js='console.log("snow");\n' * 100):
+    (directory / 'logo.png').write_bytes(png)
+    (directory / 'styles.css').write_text(CSS)
+    (directory / 'main.js').write_text(js)
+    return AssetManifest(str(directory), FILES)
+
+
+def test_names_carry_a_hash_of_the_content(tmp_path):
+    manifest = build(tmp_path)
+    assert manifest.url('main.js').startswith('/static/main.') and manifest.url('main.js').endswith('.js')
+    assert build(tmp_path).url('main.js') == manifest.url('main.js')
+    assert build(tmp_path, js='console.log("powder");\n').url('main.js') != manifest.url('main.js')
+
+
+def test_css_references_point_at_fingerprinted_assets(tmp_path):
+    manifest = build(tmp_path)
+    css = manifest.assets['styles.css'].body.body.decode()
+    logo = manifest.url('logo.png')
+    assert css.count(f'url("{logo}")') == 2
+    assert 'url( "missing.png" )' in css
+
+
+def test_changing_a_referenced_image_changes_the_stylesheet_name(tmp_path):
+    first = build(tmp_path).url('styles.css')
+    assert build(tmp_path, png=b'\x89PNG second').url('styles.css') != first
+
+
+def test_lookup_serves_fingerprinted_names_forever_and_plain_names_revalidated(tmp_path):
+    manifest = build(tmp_path)
+    name = manifest.url('main.js').rsplit('/', 1)[1]
+    assert manifest.lookup(name) == (manifest.assets['main.js'], IMMUTABLE_CACHE_CONTROL)
+    assert manifest.lookup('main.js') == (manifest.assets['main.js'], PLAIN_CACHE_CONTROL)
+    assert manifest.lookup('app.py') == (None, None)
+
+
+def test_text_assets_are_precompressed_and_images_are_not(tmp_path):
+    manifest = build(tmp_path, png=b'\x89PNG' * 1000)
+    script = manifest.assets['main.js'].body
+    body, encoding = script.body_for('gzip')
+    assert encoding == 'gzip' and gzip.decompress(body) == script.body
+    assert manifest.assets['logo.png'].body.body_for('gzip, br') == (b'\x89PNG' * 1000, None)
+
+
+@pytest.mark.parametrize('accept', [None, '', 'identity'])
+def test_clients_without_compression_get_the_plain_body(tmp_path, accept):
+    script = build(tmp_path).assets['main.js'].body
+    assert script.body_for(accept) == (script.body, None)
@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from cache import TTLCache, normalize_key
+
+
+def test_normalize_key():
+    assert normalize_key('  Jackson   HOLE ') == 'jackson hole'
+
+
+def test_entries_expire_but_stay_available_as_stale():
+    cache = TTLCache(maxsize=4, ttl=0.01)
+    cache.set('vail', 1)
+    assert cache.get('vail') == 1
+    time.sleep(0.02)
+    assert cache.get('vail') is None
+    assert cache.get_stale('vail') == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(maxsize=4, ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return 'snow'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('vail', loader))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while not cache.flights:
+        time.sleep(0.001)
+    time.sleep(0.05)  # Let the followers queue up behind the leader
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == ['snow'] * 8
+    assert cache.misses == 8 and cache.get('vail') == 'snow'
+
+
+def test_loader_errors_reach_every_caller_and_are_not_cached():
+    cache = TTLCache(maxsize=4, ttl=60)
+
+    def loader():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load('vail', loader)
+    assert cache.get_or_load('vail', lambda: 'snow') == 'snow'
+
+
+def test_rejected_results_are_returned_but_not_cached():
+    cache = TTLCache(maxsize=4, ttl=60)
+    assert cache.get_or_load('vail', lambda: None) is None
+    assert len(cache) == 0
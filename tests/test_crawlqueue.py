@@ -0,0 +1,100 @@
+import pytest
+
+from crawlqueue import MAX_ATTEMPTS, CrawlQueue
+
+RESORTS = ['Alta', 'Brighton', 'Copper Mountain', 'Deer Valley', 'Eldora']
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return CrawlQueue(str(tmp_path / 'queue.db'))
+
+
+def test_create_splits_resorts_into_shards(queue):
+    crawl_id = queue.create(RESORTS + ['Alta'], shard_size=2, now=0)
+    assert queue.latest() == crawl_id
+    assert queue.progress(crawl_id, now=0) == {'done': 0, 'leased': 0, 'pending': 3, 'abandoned': 0, 'superseded': 0}
+    assert queue.claim('w1', now=0) == (crawl_id, 0, ['Alta', 'Brighton'])
+
+
+def test_empty_crawl_is_finished(queue):
+    crawl_id = queue.create([], now=0)
+    assert queue.finished(crawl_id, now=0)
+    assert queue.claim('w1', now=0) is None
+
+
+def test_leased_shard_is_not_claimed_twice(queue):
+    crawl_id = queue.create(RESORTS[:2], shard_size=2, now=0)
+    assert queue.claim('w1', lease=10, now=0) == (crawl_id, 0, RESORTS[:2])
+    assert queue.claim('w2', lease=10, now=5) is None
+    assert queue.progress(crawl_id, now=5)['leased'] == 1
+    assert not queue.finished(crawl_id, now=5)
+
+
+def test_expired_lease_is_claimed_again(queue):
+    crawl_id = queue.create(RESORTS[:2], shard_size=2, now=0)
+    queue.claim('w1', lease=10, now=0)
+    assert queue.claim('w2', lease=10, now=10) is None  # Expires strictly after the lease
+    assert queue.claim('w2', lease=10, now=11) == (crawl_id, 0, RESORTS[:2])
+
+
+def test_released_shard_is_claimed_again_at_once(queue):
+    crawl_id = queue.create(RESORTS[:2], shard_size=2, now=0)
+    queue.claim('w1', lease=10, now=0)
+    queue.release(crawl_id, 0)
+    assert queue.claim('w2', lease=10, now=1) == (crawl_id, 0, RESORTS[:2])
+
+
+def test_completing_every_shard_finishes_the_crawl(queue):
+    crawl_id = queue.create(RESORTS, shard_size=2, now=0)
+    while True:
+        claimed = queue.claim('w1', now=1)
+        if claimed is None:
+            break
+        queue.complete(claimed[0], claimed[1], now=2)
+    assert queue.finished(crawl_id, now=2)
+    assert queue.progress(crawl_id, now=2)['done'] == 3
+
+
+def test_shard_is_abandoned_after_max_attempts(queue):
+    crawl_id = queue.create(RESORTS[:2], shard_size=2, now=0)
+    now = 0
+    for _ in range(MAX_ATTEMPTS):
+        assert queue.claim('w1', lease=10, now=now) is not None
+        now += 11
+    assert queue.claim('w1', lease=10, now=now) is None
+    assert queue.finished(crawl_id, now=now)
+    assert queue.progress(crawl_id, now=now)['abandoned'] == 1
+
+
+def test_abandoned_shard_holds_the_crawl_open_while_still_leased(queue):
+    crawl_id = queue.create(RESORTS[:2], shard_size=2, now=0)
+    now = 0
+    for _ in range(MAX_ATTEMPTS - 1):
+        queue.claim('w1', lease=10, now=now)
+        now += 11
+    queue.claim('w1', lease=10, now=now)  # The last attempt is still running
+    assert not queue.finished(crawl_id, now=now + 5)
+    queue.complete(crawl_id, 0, now=now + 5)
+    assert queue.finished(crawl_id, now=now + 5)
+    assert queue.progress(crawl_id, now=now + 5)['done'] == 1
+
+
+def test_new_crawl_supersedes_unfinished_ones(queue):
+    old = queue.create(RESORTS, shard_size=2, now=0)
+    queue.claim('w1', lease=10, now=0)
+    new = queue.create(RESORTS[2:], shard_size=2, now=5)
+    assert queue.finished(old, now=5)
+    assert queue.claim('w2', now=6)[0] == new
+    assert queue.progress(old, now=6)['superseded'] == 3
+    # A worker still busy with a superseded shard can complete it
+    queue.complete(old, 0, now=7)
+    assert queue.progress(old, now=7) == {'done': 1, 'leased': 0, 'pending': 0, 'abandoned': 0, 'superseded': 2}
+
+
+def test_claim_can_be_limited_to_one_crawl(queue):
+    first = queue.create(RESORTS[:2], shard_size=2, now=0)
+    queue.complete(first, 0, now=0)
+    second = queue.create(RESORTS[2:], shard_size=2, now=1)
+    assert queue.claim('w1', crawl_id=first, now=2) is None
+    assert queue.claim('w1', crawl_id=second, now=2)[0] == second
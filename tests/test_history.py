@@ -0,0 +1,66 @@
+import pytest
+
+from history import HistoryStore, RECORD_DTYPE, SECONDS_PER_DAY
+
+DAY = SECONDS_PER_DAY
+NOW = 100 * DAY
+
+
+def conditions(top, bottom, fresh):
+    return {'topSnowDepth': top, 'botSnowDepth': bottom, 'freshSnowfall': fresh, 'region': 'Utah'}
+
+
+@pytest.fixture
+def history(tmp_path):
+    return HistoryStore(str(tmp_path / 'history.bin'))
+
+
+def test_appended_records_read_back_per_resort(history):
+    assert history.append({'Alta': conditions(80, 40, 2), 'Vail': conditions(50, 20, 0)}, NOW - DAY) == 2
+    history.append({'Alta': conditions(84, 41, 6.5)}, NOW)
+    window = history.window('Alta', days=7, now=NOW)
+    assert window['timestamp'].tolist() == [NOW - DAY, NOW]
+    assert window['topSnowDepth'].tolist() == [80, 84]
+    assert window['freshSnowfall'].tolist() == [2, 6.5]
+    assert len(history.window('Vail', now=NOW)) == 1
+    assert len(history.window('Snowbird', now=NOW)) == 0
+
+
+def test_window_drops_older_records(history):
+    history.append({'Alta': conditions(60, 30, 0)}, NOW - 10 * DAY)
+    history.append({'Alta': conditions(80, 40, 2)}, NOW)
+    assert history.window('Alta', days=7, now=NOW)['topSnowDepth'].tolist() == [80]
+    assert history.count_since(NOW - DAY) == 1
+
+
+def test_another_store_reads_the_same_file(history):
+    history.append({'Alta': conditions(80, 40, 2)}, NOW)
+    other = HistoryStore(history.path)
+    other.append({'Vail': conditions(50, 20, 1)}, NOW)
+    assert len(history.window('Vail', now=NOW)) == 1
+    assert other.names == ['Alta', 'Vail']
+
+
+def test_a_torn_trailing_record_is_ignored(history):
+    history.append({'Alta': conditions(80, 40, 2)}, NOW)
+    with open(history.path, 'ab') as file:
+        file.write(b'\0' * (RECORD_DTYPE.itemsize // 2))
+    assert len(history.records()) == 1
+
+
+def test_summary_reports_change_and_daily_snowfall(history):
+    history.append({'Alta': conditions(80, 40, 2)}, NOW - DAY)
+    history.append({'Alta': conditions(82, 40, 3)}, NOW - DAY + 3600)
+    history.append({'Alta': conditions(90, 44, 6)}, NOW)
+    summary = history.summary('Alta', days=7, now=NOW)
+    assert summary['samples'] == 3
+    assert summary['metrics']['topSnowDepth'] == {'min': 80, 'max': 90, 'mean': 84, 'last': 90, 'change': 10}
+    # Each day counts its highest freshSnowfall reading once: 3 + 6
+    assert summary['snowfall'] == 9
+    assert len(summary['points']) == 3
+    assert 'points' not in history.summary('Alta', now=NOW, include_points=False)
+
+
+def test_summary_of_a_resort_without_records(history):
+    assert history.summary('Alta', now=NOW) == {'resort': 'Alta', 'days': 7, 'samples': 0, 'points': [],
+                                                'metrics': {}, 'snowfall': 0.0}
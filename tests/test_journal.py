@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+import app
+from journal import CrawlJournal
+
+ALTA = {'imperial': {'basicInfo': {'name': 'Alta', 'region': 'Utah'}, 'topSnowDepth': '80in'}}
+VAIL = {'imperial': {'basicInfo': {'name': 'Vail', 'region': 'Colorado'}, 'topSnowDepth': '40in'}}
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return CrawlJournal(str(tmp_path / 'crawl.journal'))
+
+
+def test_entries_survive_a_new_journal_instance(journal):
+    journal.append('Alta', ALTA)
+    journal.append('Vail', VAIL)
+    assert CrawlJournal(journal.path).entries() == {'Alta': ALTA, 'Vail': VAIL}
+
+
+def test_a_torn_final_line_is_dropped(journal):
+    journal.append('Alta', ALTA)
+    with open(journal.path, 'a') as file:
+        file.write('{"resort":"Vail","payl')
+    assert journal.entries() == {'Alta': ALTA}
+
+
+def test_clear_removes_the_journal(journal):
+    assert journal.entries() == {} and journal.last_written() is None
+    journal.append('Alta', ALTA)
+    journal.clear()
+    assert not os.path.exists(journal.path)
+    journal.clear()
+
+
+def test_an_interrupted_crawl_resumes_with_the_remaining_resorts(tmp_path, monkeypatch):
+    monkeypatch.setenv('PAYLOAD_DB', str(tmp_path / 'payloads.db'))
+    monkeypatch.setenv('HISTORY_PATH', str(tmp_path / 'history.bin'))
+    monkeypatch.setenv('CRAWL_JOURNAL', str(tmp_path / 'crawl.journal'))
+    monkeypatch.setattr(app, 'payload_store', None)
+    monkeypatch.setattr(app, 'history_store', None)
+    monkeypatch.setattr(app, 'resorts', ['Alta', 'Snowbird', 'Vail'])
+
+    # A crawl that died after fetching two resorts
+    interrupted = CrawlJournal(str(tmp_path / 'crawl.journal'))
+    interrupted.append('Alta', ALTA)
+    interrupted.append('Vail', VAIL)
+    written = interrupted.last_written()
+
+    app.recover_crawl_journal()
+    store = app.get_payload_store()
+    assert store.load_all() == {'Alta': ALTA, 'Vail': VAIL}
+    assert store.fetched_at() == {'Alta': written, 'Vail': written}
+    assert app.get_history_store().window('Vail')['topSnowDepth'].tolist() == [40]
+    assert app.stale_resorts() == ['Snowbird']
+    assert not os.path.exists(tmp_path / 'crawl.journal')
@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from history import HistoryStore
+from planner import CallCounter, RefreshPlanner, SearchCounter, SECONDS_PER_DAY
+from store import PayloadStore
+
+NOW = 100 * SECONDS_PER_DAY
+RESORTS = ['Alta', 'Vail', 'Stowe', 'Snowbird']
+
+
+def test_search_counter_flushes_on_a_background_thread():
+    flushed = []
+    done = threading.Event()
+
+    def flush(counts):
+        flushed.append((dict(counts), threading.current_thread()))
+        done.set()
+
+    counter = SearchCounter(flush, interval=0)
+    counter.record('Alta')
+    assert done.wait(5)
+    counts, thread = flushed[0]
+    assert counts == {'Alta': 1}
+    assert thread is not threading.current_thread()
+
+
+def test_explicit_flush_writes_everything_counted():
+    flushed = []
+    counter = SearchCounter(flushed.append, interval=3600)
+    counter.record('Alta')
+    counter.record('Alta')
+    counter.record('Vail')
+    assert flushed == []
+    counter.flush()
+    assert flushed == [{'Alta': 2, 'Vail': 1}]
+    counter.flush()
+    assert len(flushed) == 1
+
+
+def test_call_counter_hands_over_a_total():
+    flushed = []
+    counter = CallCounter(flushed.append, interval=3600)
+    for _ in range(3):
+        counter.record()
+    counter.flush()
+    assert flushed == [3]
+
+
+def daily_fetches(intervals):
+    return sum(SECONDS_PER_DAY / interval for interval in intervals.values())
+
+
+def test_intervals_spend_the_budget_on_volatile_and_searched_resorts():
+    planner = RefreshPlanner(60, min_interval=3600)
+    intervals = planner.intervals(RESORTS, {'Alta': 6.0, 'Vail': 1.0}, {'Stowe': 40})
+    assert daily_fetches(intervals) == pytest.approx(60)
+    assert intervals['Alta'] < intervals['Vail'] < intervals['Snowbird']
+    assert intervals['Stowe'] < intervals['Snowbird']
+    assert all(3600 <= interval <= planner.max_interval for interval in intervals.values())
+
+
+def test_budgets_outside_the_clamps_are_shared_equally():
+    planner = RefreshPlanner(2, min_interval=3600)
+    assert set(planner.intervals(RESORTS, {'Alta': 6.0}, {}).values()) == {2 * SECONDS_PER_DAY}
+    planner = RefreshPlanner(10000, min_interval=3600)
+    assert set(planner.intervals(RESORTS, {'Alta': 6.0}, {}).values()) == {3600}
+
+
+@pytest.fixture
+def stores(tmp_path):
+    return PayloadStore(str(tmp_path / 'payloads.db')), HistoryStore(str(tmp_path / 'history.bin'))
+
+
+def test_plan_fetches_missing_then_most_overdue_resorts(stores):
+    store, history = stores
+    store.put_many({'Alta': {}, 'Vail': {}}, fetched_at=NOW - 3 * SECONDS_PER_DAY)
+    store.put('Stowe', {}, fetched_at=NOW - 60)
+    history.append({'Vail': {'freshSnowfall': 0}}, NOW - SECONDS_PER_DAY)
+    history.append({'Vail': {'freshSnowfall': 12}}, NOW - 3600)
+    planner = RefreshPlanner(40, min_interval=3600)
+    assert planner.plan(RESORTS, store, history, now=NOW) == ['Snowbird', 'Vail', 'Alta']
+    assert store.stale(RESORTS, now=NOW) == ['Alta', 'Vail', 'Snowbird']
+
+
+def test_plan_stops_at_what_is_left_of_the_daily_budget(stores):
+    store, history = stores
+    store.add_api_calls(38, now=NOW - 3600)
+    store.add_api_calls(500, now=NOW - 2 * SECONDS_PER_DAY)  # Outside the last 24 hours
+    planner = RefreshPlanner(40, min_interval=3600)
+    assert planner.plan(RESORTS, store, history, now=NOW) == ['Alta', 'Vail']
@@ -0,0 +1,57 @@
+import pytest
+
+from rankfile import RankingFile, encode_ranking, write_ranking
+
+RANKING = [
+    {'name': 'Alta', 'score': 100.0, 'region': 'Utah'},
+    {'name': 'Mt. Bachelor', 'score': 87.5, 'region': 'Oregon'},
+    {'name': 'Brighton', 'score': 62.25, 'region': 'Utah'},
+    {'name': 'Åre Village', 'score': 0.0, 'region': 'N/A'},
+]
+
+
+def test_round_trip_through_a_file(tmp_path):
+    path = str(tmp_path / 'ranking.bin')
+    write_ranking(RANKING, path, created_at=123.0)
+    ranking = RankingFile.open(path)
+    assert len(ranking) == len(RANKING)
+    assert ranking.created_at == 123.0
+    assert list(ranking) == RANKING
+    assert ranking.to_list() == RANKING
+
+
+def test_lookup_by_name():
+    ranking = RankingFile.from_ranking(RANKING)
+    assert ranking.rank_of('Brighton') == 2
+    assert ranking.lookup('Åre Village') == RANKING[3]
+    assert ranking.rank_of('Vail') is None
+    assert ranking.rank_of('') is None
+
+
+def test_rows_are_the_served_json():
+    ranking = RankingFile.from_ranking(RANKING)
+    body = bytes(ranking.body())
+    assert body.startswith(b'[') and body.endswith(b']')
+    assert b','.join(bytes(ranking.row(rank)) for rank in range(len(ranking))) == body[1:-1]
+    assert sorted(ranking.regions().values()) == ['N/A', 'Oregon', 'Utah']
+
+
+def test_hash_depends_only_on_the_ranking():
+    assert RankingFile.from_ranking(RANKING, 1.0).hash == RankingFile.from_ranking(RANKING, 2.0).hash
+    assert RankingFile.from_ranking(RANKING).hash != RankingFile.from_ranking(RANKING[:3]).hash
+
+
+def test_empty_ranking():
+    ranking = RankingFile.from_ranking([])
+    assert len(ranking) == 0 and ranking.to_list() == []
+
+
+@pytest.mark.parametrize('mangle, message', [
+    (lambda data: data[:10], 'truncated'),
+    (lambda data: b'XXXX' + data[4:], 'not a ranking snapshot'),
+    (lambda data: data[:4] + b'\x09\x00' + data[6:], 'unsupported'),
+    (lambda data: data[:-8], 'truncated'),
+])
+def test_corrupt_snapshots_are_rejected(mangle, message):
+    with pytest.raises(ValueError, match=message):
+        RankingFile(mangle(encode_ranking(RANKING)))
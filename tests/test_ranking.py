@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from ranking import IncrementalRanking
+from scoring import ScoreTable
+
+WEIGHTS = [None, {'topSnowDepth': 1, 'botSnowDepth': 0.7, 'freshSnowfall': 2.3}]
+
+
+def random_conditions(rng):
+    # Depths as parse_depth produces them: whole inches, or centimetres converted and rounded to 2 decimals
+    def depth():
+        return rng.choice([rng.randrange(0, 120), round(rng.randrange(0, 300) * 0.393701, 2)])
+    return {'topSnowDepth': depth(), 'botSnowDepth': depth(), 'freshSnowfall': rng.choice([0, depth() / 4]),
+            'region': rng.choice(['Colorado', 'Utah', 'Vermont'])}
+
+
+@pytest.mark.parametrize('weights', WEIGHTS)
+def test_updates_keep_the_same_order_as_a_full_score(weights):
+    rng = random.Random(7)
+    conditions = {f"Resort {i}": random_conditions(rng) for i in range(2000)}
+    ranking = IncrementalRanking.from_conditions(conditions, weights)
+    for _ in range(300):
+        name = f"Resort {rng.randrange(2000)}"
+        conditions[name] = random_conditions(rng)
+        ranking.update(name, conditions[name])
+    assert ranking.top() == ScoreTable.from_records(conditions).top(weights)
+
+
+def test_ties_keep_catalog_order():
+    conditions = {name: {'topSnowDepth': 10, 'botSnowDepth': 5, 'freshSnowfall': 1, 'region': 'Utah'}
+                  for name in ('Solitude', 'Alta', 'Brighton')}
+    ranking = IncrementalRanking.from_conditions(conditions)
+    ranking.update('Alta', dict(conditions['Alta']))
+    assert [name for name, _ in ranking.top()] == ['Solitude', 'Alta', 'Brighton']
+
+
+def test_new_maximum_rescales_every_score():
+    ranking = IncrementalRanking.from_conditions({
+        'Alta': {'topSnowDepth': 100, 'botSnowDepth': 50, 'freshSnowfall': 10, 'region': 'Utah'},
+        'Vail': {'topSnowDepth': 50, 'botSnowDepth': 25, 'freshSnowfall': 5, 'region': 'Colorado'},
+    })
+    assert ranking.top() == [('Alta', 100.0), ('Vail', 50.0)]
+    assert not ranking.update('Vail', {'topSnowDepth': 60, 'botSnowDepth': 25, 'freshSnowfall': 5, 'region': 'Colorado'})
+    assert ranking.update('Vail', {'topSnowDepth': 200, 'botSnowDepth': 100, 'freshSnowfall': 20, 'region': 'Colorado'})
+    assert ranking.top()[0] == ('Vail', 100.0)
+    assert ranking.remove('Vail')
+    assert ranking.top() == [('Alta', 100.0)]
+
+
+def test_resorts_first_seen_mid_crawl_take_their_catalog_place():
+    conditions = {'topSnowDepth': 10, 'botSnowDepth': 5, 'freshSnowfall': 1, 'region': 'Utah'}
+    ranking = IncrementalRanking(catalog=['Solitude', 'Alta', 'Brighton'])
+    for name in ('Brighton', 'Alta', 'Solitude'):
+        ranking.update(name, dict(conditions))
+    assert ranking.to_list() == [{'name': name, 'score': 100.0, 'region': 'Utah'}
+                                 for name in ('Solitude', 'Alta', 'Brighton')]
@@ -0,0 +1,77 @@
+import pytest
+
+import resilience
+from resilience import CLOSED, HALF_OPEN, OPEN, AdaptiveLimiter, CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # Resets the count
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    clock[0] += 10
+    assert breaker.retry_after() == 20
+
+
+def test_breaker_lets_one_probe_through_after_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # Only one probe at a time
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_failed_probe_reopens_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() == 30
+
+
+def test_released_probe_frees_the_slot(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
+
+
+def test_limiter_grows_additively_and_backs_off_multiplicatively():
+    limiter = AdaptiveLimiter(initial=4, min_limit=1, max_limit=8, latency_target=1.0)
+    for _ in range(4):
+        assert limiter.acquire(0)
+    assert not limiter.acquire(0)
+    for _ in range(4):
+        limiter.release(True, 0.1)
+    assert limiter.limit == pytest.approx(4.9, abs=0.05)
+    assert limiter.acquire(0)
+    limiter.release(False)
+    assert limiter.limit == pytest.approx(2.45, abs=0.05)
+    assert limiter.acquire(0)
+    limiter.release(True, 5.0)  # A slow success also backs off
+    assert limiter.limit == pytest.approx(1.22, abs=0.05)
+    limiter.acquire(0)
+    limiter.release(None)  # No outcome leaves the limit alone
+    assert limiter.limit == pytest.approx(1.22, abs=0.05)
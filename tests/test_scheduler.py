@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+from locking import FileLock
+from rankfile import write_ranking
+from scheduler import RefreshScheduler
+
+RANKING = [
+    {'name': 'Alta', 'score': 100.0, 'region': 'Utah'},
+    {'name': 'Vail', 'score': 91.5, 'region': 'Colorado'},
+]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return {'snapshot_path': str(tmp_path / 'resort_data.bin'), 'lock_path': str(tmp_path / 'resort_data.lock')}
+
+
+def test_file_lock_excludes_other_holders(paths):
+    first, second = FileLock(paths['lock_path']), FileLock(paths['lock_path'])
+    assert first.acquire(blocking=False)
+    assert not second.acquire(blocking=False)
+    assert not second.acquire(timeout=0.2)
+    first.release()
+    assert second.acquire(blocking=False)
+    second.release()
+
+
+def test_only_one_scheduler_crawls_and_the_other_loads_its_ranking(paths):
+    started, release = threading.Event(), threading.Event()
+    crawls = []
+
+    def crawl():
+        crawls.append(threading.current_thread().name)
+        started.set()
+        release.wait(5)
+        write_ranking(RANKING, paths['snapshot_path'])
+        return RANKING
+
+    first = RefreshScheduler(crawl, interval=3600, **paths)
+    second = RefreshScheduler(crawl, interval=3600, **paths)
+    results = {}
+    crawling = threading.Thread(target=lambda: results.update(first=first._refresh_once()), name='first')
+    crawling.start()
+    assert started.wait(5)
+    waiting = threading.Thread(target=lambda: results.update(second=second._refresh_once()), name='second')
+    waiting.start()
+    release.set()
+    crawling.join(5)
+    waiting.join(5)
+
+    assert crawls == ['first']
+    assert results['first'] == RANKING
+    assert second.current().hash == first.current().hash
+
+
+def test_a_failed_refresh_keeps_the_previous_snapshot_and_frees_the_lock(paths):
+    outcomes = iter([RANKING, RuntimeError("upstream down")])
+
+    def refresh():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    published = []
+    scheduler = RefreshScheduler(refresh, interval=0, on_publish=published.append, **paths)
+    assert scheduler._refresh_once() == RANKING
+    snapshot = scheduler.current()
+    assert scheduler._refresh_once() is None
+    assert scheduler.current() is snapshot
+    assert published == [snapshot]
+    lock = FileLock(paths['lock_path'])
+    assert lock.acquire(blocking=False)
+    lock.release()
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from scoring import ScoreTable, parse_weights
+
+
+def legacy_sort(records):
+    # The dict-based scoring ScoreTable replaced: percentages of each metric's best, summed, sorted stably
+    processed = {name: dict(record) for name, record in records.items()}
+    for metric in ('topSnowDepth', 'botSnowDepth', 'freshSnowfall'):
+        best = max(record[metric] for record in processed.values())
+        for record in processed.values():
+            record[metric] = round(record[metric] / best * 100, 3) if best else 0.0
+    totals = {name: sum(value for key, value in record.items() if key != 'region') for name, record in processed.items()}
+    best = max(totals.values())
+    return sorted(((name, total / best * 100) for name, total in totals.items()), key=lambda item: item[1], reverse=True)
+
+
+def tied_records(seed, count=300):
+    # Few distinct depths, chosen so every percentage is exact and many resorts tie
+    rng = random.Random(seed)
+    return {f"Resort {i}": {'topSnowDepth': rng.randrange(6), 'botSnowDepth': rng.randrange(6),
+                            'freshSnowfall': rng.randrange(5), 'region': 'Utah'}
+            for i in range(count)}
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_top_matches_the_legacy_ordering_ties_included(seed):
+    records = tied_records(seed)
+    top = ScoreTable.from_records(records).top()
+    legacy = legacy_sort(records)
+    assert [name for name, _ in top] == [name for name, _ in legacy]
+    assert [score for _, score in top] == pytest.approx([score for _, score in legacy])
+
+
+@pytest.mark.parametrize('k', [0, 1, 5, 17, 300, 1000])
+def test_top_k_is_a_prefix_of_the_full_ranking(k):
+    table = ScoreTable.from_records(tied_records(4))
+    assert table.top(k=k) == table.top()[:k]
+
+
+def test_records_keep_the_legacy_percentage_shape():
+    table = ScoreTable.from_records({
+        'Alta': {'topSnowDepth': 100, 'botSnowDepth': 40, 'freshSnowfall': 0, 'region': 'Utah'},
+        'Vail': {'topSnowDepth': 30, 'botSnowDepth': 80, 'freshSnowfall': 0, 'region': 'Colorado'},
+    })
+    assert table['Vail'] == {'topSnowDepth': 30.0, 'botSnowDepth': 100.0, 'freshSnowfall': 0.0, 'region': 'Colorado'}
+
+
+def test_weights_change_the_order():
+    table = ScoreTable.from_records({
+        'Alta': {'topSnowDepth': 100, 'botSnowDepth': 50, 'freshSnowfall': 5, 'region': 'Utah'},
+        'Vail': {'topSnowDepth': 40, 'botSnowDepth': 50, 'freshSnowfall': 10, 'region': 'Colorado'},
+    })
+    assert table.top()[0][0] == 'Alta'
+    assert table.top(parse_weights('freshSnowfall=5'))[0][0] == 'Vail'
+    with pytest.raises(ValueError):
+        parse_weights('powder=2')
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from snapshot import Snapshot
+
+RANKING = [
+    {'name': 'Alta', 'score': 100.0, 'region': 'Utah'},
+    {'name': 'Vail', 'score': 91.5, 'region': 'Colorado'},
+    {'name': 'Snowbird', 'score': 88.25, 'region': 'Utah'},
+    {'name': 'Aspen', 'score': 70.0, 'region': 'Colorado'},
+    {'name': 'Brighton Resort', 'score': 70.0, 'region': 'Utah'},
+    {'name': 'Stowe', 'score': 12.0, 'region': 'Vermont'},
+]
+
+
+@pytest.fixture
+def snapshot():
+    return Snapshot(RANKING, version=1, created_at=1700000000)
+
+
+def names(body):
+    return [resort['name'] for resort in json.loads(body.body)]
+
+
+def test_full_ranking_is_the_precomputed_body(snapshot):
+    body, total = snapshot.page()
+    assert body is snapshot.full
+    assert total == len(RANKING)
+    assert json.loads(body.body) == RANKING
+
+
+@pytest.mark.parametrize('limit, offset, expected', [
+    (2, 0, ['Alta', 'Vail']),
+    (2, 4, ['Brighton Resort', 'Stowe']),
+    (None, 5, ['Stowe']),
+    (3, 10, []),
+    (0, 0, []),
+])
+def test_limit_and_offset_slice_the_ranking(snapshot, limit, offset, expected):
+    body, total = snapshot.page(limit, offset)
+    assert names(body) == expected
+    assert total == len(RANKING)
+
+
+def test_region_filter_ignores_case_and_counts_matches(snapshot):
+    body, total = snapshot.page(region='utah')
+    assert names(body) == ['Alta', 'Snowbird', 'Brighton Resort']
+    assert total == 3
+    body, total = snapshot.page(limit=1, offset=1, region='UTAH')
+    assert names(body) == ['Snowbird']
+    assert total == 3
+    body, total = snapshot.page(region='Alaska')
+    assert names(body) == [] and total == 0
+
+
+def test_min_score_keeps_resorts_at_or_above_it(snapshot):
+    body, total = snapshot.page(min_score=70.0)
+    assert names(body) == ['Alta', 'Vail', 'Snowbird', 'Aspen', 'Brighton Resort']
+    assert total == 5
+    body, total = snapshot.page(limit=1, region='colorado', min_score=80)
+    assert names(body) == ['Vail']
+    assert total == 1
+
+
+def test_pages_have_their_own_etags_and_are_cached(snapshot):
+    first, _ = snapshot.page(2)
+    assert snapshot.page(2)[0] is first
+    assert first.etag != snapshot.page(3)[0].etag != snapshot.full.etag
+    assert first.etag.startswith('"' + snapshot.hash)
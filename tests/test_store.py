@@ -0,0 +1,52 @@
+import pytest
+
+from store import PayloadStore
+
+ALTA = {'imperial': {'basicInfo': {'name': 'Alta', 'region': 'Utah'}, 'topSnowDepth': '80in'}}
+VAIL = {'imperial': {'basicInfo': {'name': 'Vail', 'region': 'Colorado'}, 'topSnowDepth': '40in'}}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PayloadStore(str(tmp_path / 'payloads.db'))
+
+
+def test_payloads_round_trip(store):
+    store.put_many({'Alta': ALTA, 'Vail': VAIL}, fetched_at=1000.5)
+    assert store.get('Alta') == ALTA
+    assert store.get('Jackson Hole') is None
+    assert store.load_all() == {'Alta': ALTA, 'Vail': VAIL}
+    assert store.fetched_at() == {'Alta': 1000.5, 'Vail': 1000.5}
+
+
+def test_load_all_follows_the_catalog(store):
+    store.put('Vail', VAIL)
+    store.put('Alta', ALTA)
+    assert list(store.load_all(['Alta', 'Snowbird', 'Vail']).items()) == [('Alta', ALTA), ('Snowbird', None), ('Vail', VAIL)]
+
+
+def test_failed_fetches_keep_the_last_good_payload(store):
+    store.put('Alta', ALTA, fetched_at=1000)
+    store.put_many({'Alta': None, 'Vail': VAIL}, fetched_at=2000)
+    assert store.get('Alta') == ALTA
+    assert store.fetched_at() == {'Alta': 1000, 'Vail': 2000}
+
+
+def test_newer_payloads_replace_older_ones(store):
+    store.put('Alta', ALTA, fetched_at=1000)
+    store.put('Alta', VAIL, fetched_at=2000)
+    assert store.get('Alta') == VAIL
+    assert store.fetched_at() == {'Alta': 2000}
+
+
+def test_stale_lists_missing_and_expired_resorts_in_catalog_order(store):
+    store.put('Alta', ALTA, fetched_at=1000)
+    store.put('Vail', VAIL, fetched_at=1900)
+    assert store.stale(['Snowbird', 'Vail', 'Alta'], max_age=500, now=2000) == ['Snowbird', 'Alta']
+    store.set_budgets({'Alta': 5000, 'Vail': 50})
+    assert store.stale(['Snowbird', 'Vail', 'Alta'], max_age=500, now=2000) == ['Snowbird', 'Vail']
+
+
+def test_a_second_store_on_the_same_file_sees_the_payloads(store):
+    store.put('Alta', ALTA)
+    assert PayloadStore(store.path).get('Alta') == ALTA
@@ -0,0 +1,96 @@
+import json
+import random
+
+import pytest
+
+from snapshot import Snapshot
+from stream import RankingStream, ranking_diff, ranking_positions, ranking_window
+
+
+def random_ranking(rng, names):
+    resorts = [{'name': name, 'score': float(rng.randrange(0, 20) * 5), 'region': rng.choice(['Utah', 'Vermont'])}
+               for name in names]
+    return sorted(resorts, key=lambda resort: -resort['score'])
+
+
+def apply_diff(current, diff):
+    # What main.js does with a diff event: changed resorts take their new rank, the rest keep their index
+    moved = set(diff['removed'])
+    patched = [None] * diff['total']
+    for name, rank, score, region in diff['changed']:
+        patched[rank] = {'name': name, 'score': score, 'region': region}
+        moved.add(name)
+    for index, resort in enumerate(current):
+        if resort['name'] not in moved:
+            patched[index] = resort
+    assert None not in patched
+    return patched
+
+
+@pytest.mark.parametrize('limit', [None, 1, 5, 30])
+def test_diffs_patch_the_previous_ranking_into_the_next(limit):
+    rng = random.Random(limit)
+    catalog = [f"Resort {i}" for i in range(60)]
+    previous = Snapshot(random_ranking(rng, catalog[:50]), version=1)
+    for version in range(2, 12):
+        current = Snapshot(random_ranking(rng, rng.sample(catalog, rng.randrange(40, 60))), version)
+        diff = ranking_diff(ranking_window(ranking_positions(previous), limit),
+                            ranking_window(ranking_positions(current), limit))
+        held = list(previous.data)[:limit]
+        assert apply_diff(held, diff) == list(current.data)[:limit]
+        previous = current
+
+
+def events(frames):
+    # Parses SSE frames into [(event, id, data)]
+    parsed = []
+    for frame in b''.join(frames).decode().split('\n\n')[:-1]:
+        fields = dict(line.split(': ', 1) for line in frame.split('\n'))
+        parsed.append((fields['event'], fields['id'], json.loads(fields['data'])))
+    return parsed
+
+
+RANKING = [{'name': f"Resort {i}", 'score': 100.0 - i, 'region': 'Utah'} for i in range(20)]
+
+
+def test_new_subscribers_get_only_their_window():
+    stream = RankingStream()
+    snapshot = Snapshot(RANKING, version=1)
+    stream.publish(snapshot)
+    frames, current = stream.wait(None, timeout=0, limit=5)
+    assert current == snapshot.hash
+    assert events(frames) == [('snapshot', snapshot.hash, RANKING[:5])]
+    assert events(stream.wait(None, timeout=0, limit=500)[0]) == [('snapshot', snapshot.hash, RANKING)]
+    assert stream.wait(snapshot.hash, timeout=0, limit=5) == ([], snapshot.hash)
+
+
+def test_reconnecting_subscribers_catch_up_with_window_diffs():
+    stream = RankingStream(history=2)
+    snapshots = [Snapshot(RANKING, version=1)]
+    for version in (2, 3, 4):
+        ranking = [dict(resort) for resort in RANKING]
+        ranking[version]['score'] = 200.0
+        snapshots.append(Snapshot(sorted(ranking, key=lambda resort: -resort['score']), version))
+    for snapshot in snapshots:
+        stream.publish(snapshot)
+
+    frames, current = stream.wait(snapshots[2].hash, timeout=0, limit=5)
+    assert current == snapshots[3].hash
+    [(event, event_id, diff)] = events(frames)
+    assert (event, event_id) == ('diff', snapshots[3].hash)
+    assert apply_diff(list(snapshots[2].data)[:5], diff) == list(snapshots[3].data)[:5]
+    # Frames are encoded once per window and shared
+    assert stream.wait(snapshots[2].hash, timeout=0, limit=5)[0][0] is frames[0]
+
+    # Two diffs back is still in the history; three is not, so the window is sent again
+    assert [event for event, _, _ in events(stream.wait(snapshots[1].hash, timeout=0, limit=5)[0])] == ['diff', 'diff']
+    assert events(stream.wait(snapshots[0].hash, timeout=0, limit=5)[0]) == [('snapshot', snapshots[3].hash,
+                                                                              list(snapshots[3].data)[:5])]
+
+
+def test_republishing_the_same_ranking_sends_nothing():
+    stream = RankingStream()
+    first = Snapshot(RANKING, version=1)
+    stream.publish(first)
+    stream.publish(Snapshot(RANKING, version=2))
+    assert stream.wait(first.hash, timeout=0, limit=5) == ([], first.hash)
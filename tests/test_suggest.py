@@ -0,0 +1,47 @@
+import pytest
+
+from resorts import aliases, resorts
+from suggest import ResortIndex, normalize_name
+
+NAMES = ['Brighton Resort', 'Mount Brighton', 'Arapahoe Basin', 'Jackson Hole', 'Mt. Hood Meadows', 'Vail']
+ALIASES = {'A-Basin': 'Arapahoe Basin', 'Unknown Alias': 'Not In The Catalog'}
+
+
+@pytest.fixture
+def index():
+    return ResortIndex(NAMES, ALIASES)
+
+
+def test_normalize_name_folds_case_punctuation_and_abbreviations():
+    assert normalize_name('  Mt. Hood  MEADOWS ') == 'mount hood meadows'
+
+
+def test_prefix_matches_any_word_whole_names_first(index):
+    assert index.prefix('basin') == ['Arapahoe Basin']
+    assert index.prefix('bri') == ['Brighton Resort', 'Mount Brighton']
+    assert index.prefix('mount hood') == ['Mt. Hood Meadows']
+    assert index.prefix('') == []
+
+
+def test_fuzzy_tolerates_typos(index):
+    assert index.fuzzy('jakson hole')[0][0] == 'Jackson Hole'
+    assert index.suggest('arapaho basn') == ['Arapahoe Basin']
+
+
+def test_resolve_exact_names_aliases_prefixes_and_typos(index):
+    assert index.resolve('VAIL') == 'Vail'
+    assert index.resolve('a basin') == 'Arapahoe Basin'
+    assert index.resolve('jack') == 'Jackson Hole'
+    assert index.resolve('jakson hole') == 'Jackson Hole'
+    assert index.resolve('zzzz') is None
+
+
+def test_aliases_for_unknown_resorts_are_ignored(index):
+    assert index.resolve('unknown alias') is None
+
+
+def test_ambiguous_queries_resolve_to_nothing(index):
+    # "brighton" prefixes "Brighton Resort" and a word of "Mount Brighton"; searching either would be a guess
+    assert index.resolve('brighton') is None
+    assert ResortIndex(resorts, aliases).resolve('brighton') is None
+    assert index.suggest('brighton') == ['Brighton Resort', 'Mount Brighton']
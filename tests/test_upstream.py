@@ -0,0 +1,40 @@
+import time
+
+import pytest
+
+from upstream import UpstreamThrottled, UpstreamUnavailable, retry_delay
+
+
+def throttled_error(retry_after):
+    return UpstreamThrottled("Upstream is throttling requests", 429, retry_after)
+
+
+def test_without_a_deadline_a_long_retry_after_is_waited_out():
+    started = time.monotonic()
+    assert retry_delay(throttled_error(10), 0, 10, started, None, backoff=0.5, max_backoff=8) == 10
+
+
+def test_with_a_deadline_a_retry_after_past_the_cap_fails_fast():
+    started = time.monotonic()
+    with pytest.raises(UpstreamThrottled) as raised:
+        retry_delay(throttled_error(10), 0, 10, started, 60, backoff=0.5, max_backoff=8)
+    assert raised.value.retry_after == 10
+
+
+def test_a_wait_past_the_deadline_fails_fast_with_retry_after():
+    error = UpstreamUnavailable("Upstream returned 503", 503)
+    started = time.monotonic() - 2.5
+    with pytest.raises(UpstreamThrottled) as raised:
+        retry_delay(error, 0, 1, started, 3, backoff=0.5, max_backoff=8)
+    assert raised.value.retry_after == 1
+
+
+def test_a_wait_past_the_deadline_without_retry_after_raises_the_error_itself():
+    error = UpstreamUnavailable("Upstream returned 503", 503)
+    with pytest.raises(UpstreamUnavailable):
+        retry_delay(error, 0, None, time.monotonic() - 3, 3, backoff=0.5, max_backoff=8)
+
+
+def test_backoff_within_the_deadline_is_returned():
+    delay = retry_delay(throttled_error(1), 1, 1, time.monotonic(), 3, backoff=0.5, max_backoff=8)
+    assert 1 <= delay <= 1.5
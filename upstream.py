@@ -0,0 +1,428 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from metrics import UPSTREAM_LATENCY, UPSTREAM_REQUESTS
+from resilience import AdaptiveLimiter, AsyncAdaptiveLimiter, CircuitBreaker, FAILURE_THRESHOLD, RESET_TIMEOUT
+
+# Imported by the first AsyncUpstreamClient: only the ASGI serving mode needs it,
+# and importing it would add a quarter of a second to every WSGI start
+aiohttp = None
+
+# Defaults for the shared snow conditions API client
+UPSTREAM_URL = "https://ski-resort-forecast.p.rapidapi.com"
+API_HOST = "ski-resort-forecast.p.rapidapi.com"
+POOL_SIZE = 32
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+MAX_RETRIES = 3
+BACKOFF = 0.5
+MAX_BACKOFF = 8
+# Seconds a request-path caller waits for a concurrency slot before being shed
+QUEUE_TIMEOUT = 1.0
+# Seconds a request-path call may spend waiting to retry; the crawl passes None
+DEADLINE = 3.0
+# Connections held by the asyncio client, and the most calls it makes at once
+ASYNC_POOL_SIZE = 256
+
+# Status codes worth retrying; everything else is returned or raised immediately
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """
+    A failed call to the snow conditions API.
+
+    `status` is the upstream HTTP status, or None if no response arrived.
+    `http_status` is what our own endpoints should answer with.
+    """
+    http_status = 502
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class UpstreamNotFound(UpstreamError):
+    http_status = 404
+
+
+class UpstreamThrottled(UpstreamError):
+    http_status = 503
+
+
+class UpstreamUnavailable(UpstreamError):
+    http_status = 502
+
+
+class CircuitOpen(UpstreamError):
+    # Refused locally because the upstream has been failing
+    http_status = 503
+
+
+class UpstreamOverloaded(UpstreamError):
+    # Shed locally because the adaptive concurrency limit is reached
+    http_status = 503
+
+
+def retry_after_seconds(response):
+    # Parses a numeric Retry-After header; HTTP-date values are ignored
+    try:
+        return max(0.0, float(response.headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return None
+
+
+def error_for(response):
+    # Maps a non-2xx response to the matching UpstreamError
+    return error_for_status(response.status_code, response.url, retry_after_seconds(response))
+
+
+def throttled(error, retry_after):
+    # The error to raise instead of waiting out a Retry-After, carrying it for our own clients
+    if retry_after is None or isinstance(error, UpstreamThrottled):
+        return error
+    return UpstreamThrottled(str(error), error.status, retry_after)
+
+
+def retry_delay(error, attempt, retry_after, started, deadline, backoff=BACKOFF, max_backoff=MAX_BACKOFF):
+    """
+    Seconds to sleep before the next attempt, or raises `error` instead.
+
+    With a `deadline`, a Retry-After longer than `max_backoff` is never
+    slept through, and no retry is scheduled to start after `deadline`
+    seconds from `started` (monotonic). Either way the caller gets the
+    error straight away, with Retry-After attached, so a request can serve
+    stale data or a 503. Without one (the crawl) every wait is honoured.
+    """
+    if deadline is not None and retry_after is not None and retry_after > max_backoff:
+        raise throttled(error, retry_after)
+    delay = backoff_delay(attempt, retry_after, backoff, max_backoff)
+    if deadline is not None and time.monotonic() - started + delay > deadline:
+        raise throttled(error, retry_after)
+    return delay
+
+
+def error_for_status(status, url, retry_after=None):
+    message = f"Upstream returned {status} for {url}"
+    if status == 404:
+        return UpstreamNotFound(message, status)
+    if status == 429:
+        return UpstreamThrottled(message, status, retry_after)
+    return UpstreamUnavailable(message, status)
+
+
+class UpstreamClient:
+    """
+    Pooled, retrying HTTP client for the snow conditions API.
+
+    One keep-alive session is shared by every caller, so repeated calls skip
+    the TCP and TLS handshakes. 429s, 5xx responses and connection errors are
+    retried up to `max_retries` times with full-jitter exponential backoff,
+    waiting at least as long as any Retry-After header asks, unless that is
+    longer than `max_backoff` or the caller's deadline. Failures are raised
+    as UpstreamError subclasses.
+
+    A circuit breaker refuses calls outright while the upstream keeps
+    failing, and an AIMD limiter caps concurrent calls so a slow upstream
+    cannot tie up every worker thread.
+    """
+
+    def __init__(self, base_url=UPSTREAM_URL, api_key=None, pool_size=POOL_SIZE,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_retries=MAX_RETRIES,
+                 backoff=BACKOFF, max_backoff=MAX_BACKOFF, breaker=None, limiter=None, on_call=None):
+        self.base_url = base_url.rstrip('/')
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter or AdaptiveLimiter(max_limit=pool_size)
+        # Called once per request sent upstream, so callers can account for their API quota
+        self.on_call = on_call
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "X-RapidAPI-Key": api_key or "",
+            "X-RapidAPI-Host": API_HOST,
+        })
+
+    def snow_conditions(self, resort, units=None, before_request=None, after_response=None,
+                        queue_timeout=QUEUE_TIMEOUT, deadline=DEADLINE):
+        # Returns the parsed snowConditions payload for one resort
+        url = f"{self.base_url}/{quote(resort, safe='')}/snowConditions"
+        params = {"units": units} if units else None
+        response = self.get(url, params, before_request, after_response, queue_timeout, deadline)
+        try:
+            return response.json()
+        except ValueError:
+            raise UpstreamUnavailable(f"Upstream returned invalid JSON for {url}", response.status_code)
+
+    def get(self, url, params=None, before_request=None, after_response=None, queue_timeout=QUEUE_TIMEOUT,
+            deadline=DEADLINE):
+        """
+        GETs `url`, retrying transient failures, and returns a 2xx response.
+
+        `before_request` is called before every attempt (e.g. to take a rate
+        limiter token) and `after_response` with every response received.
+        `queue_timeout` is how long to wait for a concurrency slot and
+        `deadline` how long to keep scheduling retries; None waits
+        indefinitely, which suits the background crawl.
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            outcome, retry_after = self._attempt(url, params, before_request, after_response, queue_timeout)
+            if isinstance(outcome, requests.Response):
+                return outcome
+            error = outcome
+            if isinstance(error, (CircuitOpen, UpstreamOverloaded, UpstreamNotFound)) or attempt >= self.max_retries:
+                raise error
+            if error.status is not None and error.status not in RETRY_STATUSES:
+                raise error
+            time.sleep(retry_delay(error, attempt, retry_after, started, deadline, self.backoff, self.max_backoff))
+            attempt += 1
+
+    def _attempt(self, url, params, before_request, after_response, queue_timeout):
+        # Makes one guarded call; returns (response or error, retry_after)
+        if before_request is not None:
+            # Waiting on the caller's rate limiter happens before taking a concurrency slot,
+            # so paced crawl threads never hold slots that searches could use
+            before_request()
+        if not self.breaker.allow():
+            UPSTREAM_REQUESTS.inc(status='circuit_open')
+            return CircuitOpen("Upstream circuit is open", retry_after=self.breaker.retry_after()), None
+        if not self.limiter.acquire(queue_timeout):
+            self.breaker.release_probe()
+            UPSTREAM_REQUESTS.inc(status='shed')
+            return UpstreamOverloaded("Too many concurrent upstream calls"), None
+        healthy = None
+        status = 'error'
+        start = time.monotonic()
+        try:
+            if self.on_call is not None:
+                self.on_call()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                healthy = False
+                return UpstreamUnavailable(f"Upstream request failed: {e}"), None
+            status = str(response.status_code)
+            if after_response is not None:
+                after_response(response)
+            # A 404 means the upstream is healthy but the resort is unknown
+            healthy = response.status_code < 500 and response.status_code != 429
+            if response.ok:
+                return response, None
+            return error_for(response), retry_after_seconds(response)
+        finally:
+            elapsed = time.monotonic() - start
+            UPSTREAM_LATENCY.observe(elapsed, status=status)
+            UPSTREAM_REQUESTS.inc(status=status)
+            self.limiter.release(healthy, elapsed)
+            if healthy:
+                self.breaker.record_success()
+            elif healthy is False:
+                self.breaker.record_failure()
+            else:
+                self.breaker.release_probe()
+
+def load_aiohttp():
+    # Imports the optional aiohttp package on first use
+    global aiohttp
+    if aiohttp is None:
+        try:
+            import aiohttp as module
+        except ImportError:
+            raise RuntimeError("The ASGI serving mode needs aiohttp: pip install aiohttp uvicorn") from None
+        aiohttp = module
+    return aiohttp
+
+
+def backoff_delay(attempt, retry_after, backoff=BACKOFF, max_backoff=MAX_BACKOFF):
+    # Full-jitter exponential backoff, but never shorter than Retry-After
+    delay = random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class AsyncUpstreamClient:
+    """
+    asyncio counterpart of UpstreamClient, used by the ASGI app.
+
+    Calls are awaited on one aiohttp connection pool instead of each holding
+    a thread, so a single process can keep thousands of searches in flight.
+    Retries, backoff, error mapping and metrics match UpstreamClient, and it
+    can share that client's circuit breaker. Use it from one event loop only.
+    """
+
+    def __init__(self, base_url=UPSTREAM_URL, api_key=None, pool_size=ASYNC_POOL_SIZE,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_retries=MAX_RETRIES,
+                 backoff=BACKOFF, max_backoff=MAX_BACKOFF, breaker=None, limiter=None, on_call=None):
+        load_aiohttp()
+        self.base_url = base_url.rstrip('/')
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter or AsyncAdaptiveLimiter(initial=pool_size, max_limit=pool_size)
+        self.on_call = on_call
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        connect_timeout, read_timeout = timeout
+        # The session binds to the running event loop, so it is opened on first call
+        self.session = None
+        self.session_options = {
+            "headers": {"X-RapidAPI-Key": api_key or "", "X-RapidAPI-Host": API_HOST},
+            "timeout": aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
+        }
+        self.pool_size = pool_size
+
+    async def snow_conditions(self, resort, units=None, queue_timeout=QUEUE_TIMEOUT, deadline=DEADLINE):
+        # Returns the parsed snowConditions payload for one resort
+        url = f"{self.base_url}/{quote(resort, safe='')}/snowConditions"
+        params = {"units": units} if units else None
+        body = await self.get(url, params, queue_timeout, deadline)
+        try:
+            return json.loads(body)
+        except ValueError:
+            raise UpstreamUnavailable(f"Upstream returned invalid JSON for {url}", 200)
+
+    async def get(self, url, params=None, queue_timeout=QUEUE_TIMEOUT, deadline=DEADLINE):
+        # GETs `url`, retrying transient failures, and returns the body of a 2xx response
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            outcome, retry_after = await self._attempt(url, params, queue_timeout)
+            if not isinstance(outcome, UpstreamError):
+                return outcome
+            error = outcome
+            if isinstance(error, (CircuitOpen, UpstreamOverloaded, UpstreamNotFound)) or attempt >= self.max_retries:
+                raise error
+            if error.status is not None and error.status not in RETRY_STATUSES:
+                raise error
+            await asyncio.sleep(retry_delay(error, attempt, retry_after, started, deadline, self.backoff, self.max_backoff))
+            attempt += 1
+
+    async def _attempt(self, url, params, queue_timeout):
+        # Makes one guarded call; returns (body or error, retry_after)
+        if not self.breaker.allow():
+            UPSTREAM_REQUESTS.inc(status='circuit_open')
+            return CircuitOpen("Upstream circuit is open", retry_after=self.breaker.retry_after()), None
+        if self.session is None:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size),
+                                                 **self.session_options)
+        if not await self.limiter.acquire(queue_timeout):
+            self.breaker.release_probe()
+            UPSTREAM_REQUESTS.inc(status='shed')
+            return UpstreamOverloaded("Too many concurrent upstream calls"), None
+        healthy = None
+        status = 'error'
+        start = time.monotonic()
+        try:
+            if self.on_call is not None:
+                self.on_call()
+            try:
+                async with self.session.get(url, params=params) as response:
+                    body = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                healthy = False
+                return UpstreamUnavailable(f"Upstream request failed: {str(e) or type(e).__name__}"), None
+            status = str(response.status)
+            healthy = response.status < 500 and response.status != 429
+            if 200 <= response.status < 300:
+                return body, None
+            retry_after = retry_after_seconds(response)
+            return error_for_status(response.status, url, retry_after), retry_after
+        finally:
+            elapsed = time.monotonic() - start
+            UPSTREAM_LATENCY.observe(elapsed, status=status)
+            UPSTREAM_REQUESTS.inc(status=status)
+            self.limiter.release(healthy, elapsed)
+            if healthy:
+                self.breaker.record_success()
+            elif healthy is False:
+                self.breaker.record_failure()
+            else:
+                self.breaker.release_probe()
+
+    async def aclose(self):
+        if self.session is not None:
+            await self.session.close()
+
+
+# Process-wide client, created on first use
+_client = None
+_client_lock = threading.Lock()
+# Called once per request either shared client sends; set with set_call_hook
+_call_hook = None
+
+
+def set_call_hook(hook):
+    # Registers `hook()` to run for every upstream request, without building the clients now
+    global _call_hook
+    _call_hook = hook
+    for client in (_client, _async_client):
+        if client is not None:
+            client.on_call = hook
+
+
+def get_client():
+    # Returns the shared UpstreamClient, configured from the environment
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                load_dotenv(dotenv_path='rapid.env')
+                _client = UpstreamClient(
+                    base_url=os.getenv("UPSTREAM_URL", UPSTREAM_URL),
+                    api_key=os.getenv("API_KEY"),
+                    pool_size=int(os.getenv("UPSTREAM_POOL_SIZE", POOL_SIZE)),
+                    timeout=(CONNECT_TIMEOUT, float(os.getenv("UPSTREAM_TIMEOUT", READ_TIMEOUT))),
+                    max_retries=int(os.getenv("UPSTREAM_MAX_RETRIES", MAX_RETRIES)),
+                    breaker=CircuitBreaker(
+                        failure_threshold=int(os.getenv("UPSTREAM_FAILURE_THRESHOLD", FAILURE_THRESHOLD)),
+                        reset_timeout=float(os.getenv("UPSTREAM_RESET_TIMEOUT", RESET_TIMEOUT)),
+                    ),
+                    on_call=_call_hook,
+                )
+    return _client
+
+
+# Event-loop client for the ASGI app, created on first use
+_async_client = None
+
+
+def get_async_client():
+    # Returns the shared AsyncUpstreamClient; it trips the same circuit breaker as get_client()
+    global _async_client
+    if _async_client is None:
+        client = get_client()
+        _async_client = AsyncUpstreamClient(
+            base_url=client.base_url,
+            api_key=client.session.headers.get("X-RapidAPI-Key"),
+            pool_size=int(os.getenv("ASYNC_POOL_SIZE", ASYNC_POOL_SIZE)),
+            timeout=client.timeout,
+            max_retries=client.max_retries,
+            breaker=client.breaker,
+            on_call=client.on_call,
+        )
+    return _async_client
+
+
+async def close_async_client():
+    # Closes the asyncio client's connections, e.g. on ASGI shutdown
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None